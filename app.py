@@ -1,4 +1,7 @@
+import importlib
+import pandas as pd
 import streamlit as st
+from utils.render_timing import render_timer
 
 # Set up Streamlit app
 st.set_page_config(
@@ -9,10 +12,13 @@ st.set_page_config(
 
 # Sidebar Navigation
 st.sidebar.title("🔍 AI Debugger Navigation")
-page = st.sidebar.radio(
-    "Go to",
-    ("🏠 Home", "📊 Prediction", "🤖 Chatbot", "📢 Explainability & Bias")
-)
+PAGES = {
+    "🏠 Home": "home",
+    "📊 Prediction": "prediction",
+    "🤖 Chatbot": "chatbot",
+    "📢 Explainability & Bias": "explainability_bias",
+}
+page = st.sidebar.radio("Go to", tuple(PAGES))
 
 # Hide default Streamlit navigation menu
 hide_default_format = """
@@ -22,19 +28,15 @@ hide_default_format = """
        """
 st.markdown(hide_default_format, unsafe_allow_html=True)
 
-# Load the selected page
-if page == "🏠 Home":
-    from pages import home
-    home.show()
-elif page == "📊 Prediction":
-    from pages import prediction
-    prediction.show()
-elif page == "🤖 Chatbot":
-    from pages import chatbot
-    chatbot.show()
-elif page == "📢 Explainability & Bias":
-    from pages import explainability_bias
-    explainability_bias.show()
+# Load the selected page, timing how long it takes to render
+module = importlib.import_module(f"pages.{PAGES[page]}")
+with render_timer.time(page):
+    module.show()
+
+render_ms = render_timer.last_ms(page)
+st.sidebar.caption(f"⏱️ Page rendered in {render_ms:.0f} ms")
+with st.sidebar.expander("Render timings"):
+    st.dataframe(pd.DataFrame(render_timer.stats()), hide_index=True, use_container_width=True)
 
 # Footer
 st.sidebar.markdown("---")
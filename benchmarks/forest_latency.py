@@ -0,0 +1,100 @@
+"""
+Latency benchmark: sklearn RandomForestClassifier.predict_proba vs the flat-array FlatForest engine.
+
+Run from the repository root:
+    python -m benchmarks.forest_latency --iterations 500 --batch-size 1000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.forest_engine import FlatForest
+from utils.model_utils import (approval_class_index, load_pickled_model_and_encoders, predict_loan_status,
+                               preprocess_batch, registry)
+
+DATA_PATH = "assets/data/loan_data.csv"
+
+# Applications checked end to end through predict_loan_status
+DECISION_CHECK_ROWS = 200
+
+
+def time_calls(func, inputs, iterations):
+    """
+    Call func on each input in turn and return per-call latencies in milliseconds.
+    """
+    latencies = np.empty(iterations)
+    for i in range(iterations):
+        sample = inputs[i % len(inputs)]
+        start = time.perf_counter()
+        func(sample)
+        latencies[i] = (time.perf_counter() - start) * 1000
+    return latencies
+
+
+def check_decisions(df, n_rows=DECISION_CHECK_ROWS):
+    """
+    predict_loan_status must report the served forest's decision for every application, i.e. map
+    the predicted class label (not a class index) to Approved / Rejected.
+    """
+    entry = registry.get()
+    sample = df.drop(columns=["loan_id", "loan_status"], errors="ignore").head(n_rows)
+    features = preprocess_batch(sample, entry.label_encoders, feature_names=entry.model.feature_names_in_)
+    approved_label = entry.fast_model.classes_[approval_class_index(entry.fast_model)]
+    expected = np.where(entry.fast_model.predict(features) == approved_label, "✅ Approved", "❌ Rejected")
+    actual = np.array([predict_loan_status(record) for record in sample.to_dict("records")])
+    mismatches = int((actual != expected).sum())
+    if mismatches:
+        raise SystemExit(f"❌ predict_loan_status disagrees with the model on {mismatches} of {len(sample)} applications.")
+
+
+def summarize(name, latencies):
+    p50, p99 = np.percentile(latencies, [50, 99])
+    return {"engine": name, "p50_ms": p50, "p99_ms": p99, "mean_ms": latencies.mean()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500, help="Timed calls per single-row case")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per batch case")
+    parser.add_argument("--batch-iterations", type=int, default=30, help="Timed calls per batch case")
+    args = parser.parse_args()
+
+    model, label_encoders = load_pickled_model_and_encoders()
+    if model is None:
+        raise SystemExit("Model not loaded. Run model_training.py first.")
+
+    build_start = time.perf_counter()
+    flat = FlatForest.from_sklearn(model)
+    build_ms = (time.perf_counter() - build_start) * 1000
+
+    df = pd.read_csv(DATA_PATH)
+    features = preprocess_batch(df, label_encoders, feature_names=model.feature_names_in_)
+    if not np.array_equal(model.predict_proba(features), flat.predict_proba(features)):
+        raise SystemExit("❌ FlatForest.predict_proba does not match sklearn.")
+    check_decisions(df)
+
+    rows = [features[i:i + 1] for i in range(len(features))]
+    repeats = -(-args.batch_size // len(features))
+    batch = np.tile(features, (repeats, 1))[:args.batch_size]
+
+    results = []
+    for case, inputs, iterations in (
+        ("single-row", rows, args.iterations),
+        (f"batch-{args.batch_size}", [batch], args.batch_iterations),
+    ):
+        for name, predict in (("sklearn", model.predict_proba), ("flat", flat.predict_proba)):
+            predict(inputs[0])  # warm-up
+            summary = summarize(name, time_calls(predict, inputs, iterations))
+            summary["case"] = case
+            results.append(summary)
+
+    print(f"Forest: {flat.n_estimators} trees, {flat.n_nodes:,} nodes, {flat.nbytes / 1024:.0f} KiB flat, "
+          f"exported in {build_ms:.1f} ms; outputs match sklearn exactly and predict_loan_status agrees "
+          f"on {DECISION_CHECK_ROWS} applications.\n")
+    print(pd.DataFrame(results)[["case", "engine", "p50_ms", "p99_ms", "mean_ms"]].to_string(index=False, float_format="%.3f"))
+
+
+if __name__ == "__main__":
+    main()
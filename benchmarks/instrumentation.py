@@ -0,0 +1,59 @@
+"""
+Cost of the scoring-path instrumentation: predict_loan_status latency with metrics disabled
+(the default) and enabled, on distinct synthetic applications so every call misses the
+prediction cache.
+
+Run from the repository root:
+    python -m benchmarks.instrumentation --calls 5000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_applications
+from utils.instrumentation import metrics
+from utils.model_utils import predict_loan_status
+from utils.prediction_cache import prediction_cache
+
+
+def latencies_us(records):
+    prediction_cache.clear()
+    latencies = np.empty(len(records))
+    for i, record in enumerate(records):
+        start = time.perf_counter()
+        predict_loan_status(record)
+        latencies[i] = (time.perf_counter() - start) * 1e6
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5000, help="Timed predict_loan_status calls per mode")
+    parser.add_argument("--rounds", type=int, default=3, help="Alternating rounds per mode; the best is kept")
+    args = parser.parse_args()
+
+    records = generate_applications(args.calls, with_target=False).drop(columns=["loan_id"]).to_dict("records")
+    predict_loan_status(records[0])
+
+    best = {}
+    for _ in range(args.rounds):
+        for mode in ("disabled", "enabled"):
+            if mode == "enabled":
+                metrics.enable()
+            else:
+                metrics.disable()
+            latencies = latencies_us(records)
+            p50, p99 = np.percentile(latencies, [50, 99])
+            if mode not in best or p50 < best[mode]["p50_us"]:
+                best[mode] = {"instrumentation": mode, "p50_us": p50, "p99_us": p99}
+    metrics.disable()
+
+    print(pd.DataFrame(best.values()).to_string(index=False, float_format="%.1f"))
+    overhead = best["enabled"]["p50_us"] - best["disabled"]["p50_us"]
+    print(f"\nEnabled instrumentation adds {overhead:.1f} µs per call at p50.")
+
+
+if __name__ == "__main__":
+    main()
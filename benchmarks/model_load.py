@@ -0,0 +1,121 @@
+"""
+Cold-start benchmark: loading the model from pickle vs the memory-mapped artifact.
+
+Each measurement runs in a fresh interpreter, so it includes import time (the pickle
+path has to import sklearn to unpickle). Reports wall time, peak RSS and, on Linux,
+proportional set size (PSS), which charges shared page-cache pages fractionally.
+A second table compares batch throughput of the two loaded models, since batch
+scoring, the parallel scorer and the bias audit all use whichever one the registry loads.
+
+Run from the repository root:
+    python -m benchmarks.model_load --repeats 5
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_applications
+from utils.artifacts import load_model_artifact
+from utils.model_utils import MODEL_ARTIFACT_DIR, load_pickled_model_and_encoders, preprocess_batch
+
+BATCH_SIZES = (1_000, 50_000)
+
+CHILD_TEMPLATE = """
+import json, resource, sys, time
+start = time.perf_counter()
+{load}
+model.predict_proba([[0.0] * model.n_features_in_])
+elapsed = time.perf_counter() - start
+pss_kb = None
+try:
+    with open("/proc/self/smaps_rollup") as smaps:
+        for line in smaps:
+            if line.startswith("Pss:"):
+                pss_kb = int(line.split()[1])
+except OSError:
+    pass
+peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":  # reported in bytes there
+    peak_rss_kb /= 1024
+print(json.dumps({{"seconds": elapsed, "peak_rss_kb": peak_rss_kb, "pss_kb": pss_kb}}))
+"""
+
+LOADERS = {
+    "pickle": "import pickle\n"
+              "with open('assets/data/trained_model.pkl', 'rb') as f:\n    model = pickle.load(f)\n"
+              "with open('assets/data/label_encoders.pkl', 'rb') as f:\n    label_encoders = pickle.load(f)",
+    "artifact (mmap)": "from utils.artifacts import load_model_artifact\n"
+                       "model, label_encoders = load_model_artifact('assets/data/model_artifact')",
+}
+
+BASELINE = "import numpy\nclass _Model:\n    n_features_in_ = 0\n    def predict_proba(self, X): pass\nmodel = _Model()"
+
+
+def run_child(load_code):
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", CHILD_TEMPLATE.format(load=load_code)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def batch_throughput(batch_sizes=BATCH_SIZES, repeats=5):
+    """
+    Median predict_proba time of the pickled model and the artifact's FlatForest per batch size.
+    """
+    pickled, label_encoders = load_pickled_model_and_encoders()
+    artifact, _ = load_model_artifact(MODEL_ARTIFACT_DIR)
+    applications = generate_applications(max(batch_sizes), with_target=False)
+    features = preprocess_batch(applications, label_encoders, feature_names=list(pickled.feature_names_in_))
+
+    rows = []
+    for n_rows in batch_sizes:
+        batch = features[:n_rows]
+        for name, model in (("pickle", pickled), ("artifact (mmap)", artifact)):
+            model.predict_proba(batch)  # Warm-up
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                model.predict_proba(batch)
+                timings.append(time.perf_counter() - start)
+            seconds = float(np.median(timings))
+            rows.append({"model": name, "trees": model.n_estimators,
+                         "rows": n_rows, "ms_p50": seconds * 1000, "rows_per_sec": n_rows / seconds})
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per loader")
+    parser.add_argument("--batch-rows", type=int, nargs="+", default=list(BATCH_SIZES),
+                        help="Batch sizes for the throughput table")
+    args = parser.parse_args()
+
+    baseline_rss = np.median([run_child(BASELINE)["peak_rss_kb"] for _ in range(args.repeats)])
+
+    rows = []
+    for name, load_code in LOADERS.items():
+        runs = [run_child(load_code) for _ in range(args.repeats)]
+        pss = [run["pss_kb"] for run in runs if run["pss_kb"] is not None]
+        rows.append({
+            "loader": name,
+            "load_ms_p50": np.median([run["seconds"] for run in runs]) * 1000,
+            "peak_rss_mib": np.median([run["peak_rss_kb"] for run in runs]) / 1024,
+            "rss_over_numpy_mib": (np.median([run["peak_rss_kb"] for run in runs]) - baseline_rss) / 1024,
+            "pss_mib": np.median(pss) / 1024 if pss else float("nan"),
+        })
+
+    print("Load time includes imports and one prediction; RSS is relative to an interpreter that only imports NumPy.\n")
+    print(pd.DataFrame(rows).to_string(index=False, float_format="%.1f"))
+
+    print("\nBatch predict_proba on synthetic applications (a compressed artifact has fewer trees than the pickle):\n")
+    print(batch_throughput(args.batch_rows, args.repeats).to_string(index=False, float_format="%.1f"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Render time of every page of app.py, measured headless with Streamlit's AppTest.
+
+Each page is selected in the sidebar and rerun --runs times. The first (cold) run includes
+page imports and cache fills; later (warm) runs show what a user pays per interaction.
+The page's own show() time comes from utils.render_timing.
+
+Run from the repository root:
+    python -m benchmarks.page_render --runs 5 --output page_render.json
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+from utils.render_timing import render_timer
+
+# AppTest resolves relative paths against this file, not the working directory
+APP_PATH = os.path.abspath("app.py")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Reruns per page (the first one is cold)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds allowed per script run")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    app = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    app.run()
+    pages = list(app.sidebar.radio[0].options)
+
+    results = []
+    for page in pages:
+        app.sidebar.radio[0].set_value(page)
+        script_ms = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            app.run()
+            script_ms.append((time.perf_counter() - start) * 1000)
+        if app.exception:
+            raise SystemExit(f"❌ {page} raised: {app.exception[0].message}")
+
+        warm = script_ms[1:] or script_ms
+        results.append({
+            "page": page,
+            "cold_ms": script_ms[0],
+            "warm_p50_ms": float(np.percentile(warm, 50)),
+            "warm_max_ms": float(np.max(warm)),
+            "show_p50_ms": next(row["p50_ms"] for row in render_timer.stats() if row["page"] == page),
+        })
+
+    print(pd.DataFrame(results).to_string(index=False, float_format="%.1f"))
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"runs": args.runs, "results": results}, output_file, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Load test for scoring_server.py: throughput and tail latency of POST /predict at increasing concurrency.
+
+Each concurrent client holds one keep-alive connection and sends synthetic applications back
+to back. Clients share one stream of distinct rows, so a server's prediction cache only hits
+once the stream wraps around; the hit rate is reported per level. --spawn starts a server with
+the cache off (--cache-size to turn it on) so the numbers measure the model:
+    python -m benchmarks.scoring_load --spawn --concurrency 1 8 32 128 --duration 5
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import DEFAULT_SEED, generate_applications
+
+
+async def request(reader, writer, host, method, path, body=b""):
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def get_json(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        _, body = await request(reader, writer, host, "GET", path)
+        return json.loads(body)
+    finally:
+        writer.close()
+
+
+async def client(host, port, bodies, positions, stop_at, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    errors = 0
+    try:
+        while time.perf_counter() < stop_at:
+            body = bodies[next(positions) % len(bodies)]
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, host, "POST", "/predict", body)
+            latencies.append(time.perf_counter() - start)
+            errors += status != 200
+    finally:
+        writer.close()
+    return errors
+
+
+def cache_hit_rate(before, after):
+    """
+    Share of prediction cache lookups answered from the cache between two /metrics snapshots,
+    or None if the server runs without a cache.
+    """
+    if before.get("prediction_cache") is None or after.get("prediction_cache") is None:
+        return None
+    hits = after["prediction_cache"]["hits"] - before["prediction_cache"]["hits"]
+    misses = after["prediction_cache"]["misses"] - before["prediction_cache"]["misses"]
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+async def run_level(host, port, bodies, positions, concurrency, duration):
+    before = await get_json(host, port, "/metrics")
+    latencies = []
+    start = time.perf_counter()
+    errors = await asyncio.gather(*[
+        client(host, port, bodies, positions, start + duration, latencies) for _ in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+    after = await get_json(host, port, "/metrics")
+
+    batches = after["batches"] - before["batches"]
+    latencies_ms = np.asarray(latencies) * 1000
+    hit_rate = cache_hit_rate(before, after)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": np.percentile(latencies_ms, 50),
+        "p99_ms": np.percentile(latencies_ms, 99),
+        "mean_batch_size": (after["items"] - before["items"]) / batches if batches else 0.0,
+        "cache_hit_rate": "off" if hit_rate is None else f"{hit_rate:.1%}",
+    }
+
+
+async def wait_until_healthy(host, port, timeout):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            return await get_json(host, port, "/health")
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise SystemExit(f"❌ No scoring server answered on {host}:{port}")
+            await asyncio.sleep(0.2)
+
+
+async def run(args):
+    records = generate_applications(args.rows, seed=args.seed, with_target=False).drop(columns=["loan_id"])
+    bodies = [json.dumps(record).encode() for record in records.to_dict("records")]
+    # Shared by every client and level, so no row is sent twice before the stream wraps around
+    positions = itertools.count()
+
+    health = await wait_until_healthy(args.host, args.port, args.startup_timeout)
+    print(f"Server model version {health['model_version']}, {args.duration:g}s per level, "
+          f"{len(bodies):,} distinct applications\n")
+
+    results = [await run_level(args.host, args.port, bodies, positions, concurrency, args.duration)
+               for concurrency in args.concurrency]
+    print(pd.DataFrame(results).to_string(index=False, float_format="%.2f"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per concurrency level")
+    parser.add_argument("--spawn", action="store_true", help="Start scoring_server.py for the run")
+    parser.add_argument("--max-batch-size", type=int, default=64, help="Passed to the spawned server")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="Passed to the spawned server")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="Passed to the spawned server; 0 (default) scores every request with the model")
+    parser.add_argument("--rows", type=int, default=200_000, help="Distinct synthetic applications to send")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seed of the synthetic applications")
+    parser.add_argument("--startup-timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        server = subprocess.Popen([sys.executable, "scoring_server.py", "--host", args.host, "--port", str(args.port),
+                                   "--max-batch-size", str(args.max_batch_size), "--max-wait-ms", str(args.max_wait_ms),
+                                   "--cache-size", str(args.cache_size)])
+    try:
+        asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
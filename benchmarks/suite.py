@@ -0,0 +1,202 @@
+"""
+Benchmark suite for the hot paths: preprocessing, prediction, explanation, importance,
+bias audit, model load and training, all on seeded synthetic data (benchmarks/synthetic.py).
+
+Results are written as JSON. With --compare, each case's headline metric is checked against
+a stored baseline and the run fails (exit code 1) if any case is worse by more than --tolerance.
+
+Run from the repository root:
+    python -m benchmarks.suite --output benchmarks/baseline.json
+    python -m benchmarks.suite --compare benchmarks/baseline.json --output latest.json
+    python -m benchmarks.suite --compare benchmarks/baseline.json --results latest.json   # no rerun
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from benchmarks.model_load import LOADERS, run_child
+from benchmarks.synthetic import DEFAULT_SEED, generate_applications
+from utils.bias_audit import audit_bias
+from utils.importance import compute_permutation_importance
+from utils.model_utils import predict_batch, predict_loan_status, preprocess_batch, preprocess_input, registry
+from utils.prediction_cache import prediction_cache
+from utils.training import encode_features, train_model
+from utils.tree_shap import get_explainer
+
+# Headline metric of each case and whether lower or higher values are better
+HEADLINE = {
+    "preprocess_single": ("p50_us", "lower"),
+    "preprocess_batch": ("rows_per_sec", "higher"),
+    "predict_loan_status": ("p50_ms", "lower"),
+    "predict_batch": ("rows_per_sec", "higher"),
+    "shap_explain": ("rows_per_sec", "higher"),
+    "permutation_importance": ("seconds", "lower"),
+    "bias_audit": ("seconds", "lower"),
+    "model_load_artifact": ("seconds", "lower"),
+    "model_load_pickle": ("seconds", "lower"),
+    "training_fit": ("seconds", "lower"),
+}
+
+
+def best_seconds(func, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def per_call_latencies(func, inputs):
+    latencies = np.empty(len(inputs))
+    for i, sample in enumerate(inputs):
+        start = time.perf_counter()
+        func(sample)
+        latencies[i] = time.perf_counter() - start
+    return latencies
+
+
+def run_cases(args):
+    entry = registry.get()
+    if entry.model is None:
+        raise SystemExit("Model not loaded. Run model_training.py first.")
+
+    data = generate_applications(args.rows, seed=args.seed)
+    features_only = data.drop(columns=["loan_id", "loan_status"])
+    records = features_only.head(args.single_calls).to_dict("records")
+    feature_names = entry.model.feature_names_in_
+    results = {}
+
+    # Single-row preprocessing through the compiled feature schema
+    preprocess_input(records[0])
+    latencies = per_call_latencies(preprocess_input, records) * 1e6
+    results["preprocess_single"] = {"p50_us": np.percentile(latencies, 50), "p99_us": np.percentile(latencies, 99)}
+
+    seconds = best_seconds(lambda: preprocess_batch(features_only, entry.label_encoders, feature_names))
+    results["preprocess_batch"] = {"rows": len(data), "seconds": seconds, "rows_per_sec": len(data) / seconds}
+
+    # Distinct synthetic rows, so the prediction cache only ever misses
+    prediction_cache.clear()
+    predict_loan_status(records[0])
+    latencies = per_call_latencies(predict_loan_status, records[1:]) * 1000
+    results["predict_loan_status"] = {"p50_ms": np.percentile(latencies, 50), "p99_ms": np.percentile(latencies, 99)}
+
+    seconds = best_seconds(lambda: predict_batch(features_only))
+    results["predict_batch"] = {"rows": len(data), "seconds": seconds, "rows_per_sec": len(data) / seconds}
+
+    explain_rows = preprocess_batch(features_only.head(args.explain_rows), entry.label_encoders, feature_names)
+    start = time.perf_counter()
+    explainer = get_explainer()
+    build_seconds = time.perf_counter() - start
+    seconds = best_seconds(lambda: explainer.shap_values(explain_rows), repeats=2)
+    results["shap_explain"] = {"rows": len(explain_rows), "build_seconds": build_seconds,
+                               "rows_per_sec": len(explain_rows) / seconds}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        holdout_path = os.path.join(tmp, "holdout.csv")
+        data.head(args.holdout_rows).to_csv(holdout_path, index=False)
+        seconds = best_seconds(lambda: compute_permutation_importance(
+            n_repeats=3, max_workers=1, holdout_path=holdout_path), repeats=1)
+    results["permutation_importance"] = {"rows": args.holdout_rows, "repeats": 3, "seconds": seconds}
+
+    seconds = best_seconds(lambda: audit_bias(entry.model, entry.label_encoders, data), repeats=2)
+    results["bias_audit"] = {"rows": len(data), "seconds": seconds}
+
+    for case, loader in (("model_load_artifact", "artifact (mmap)"), ("model_load_pickle", "pickle")):
+        runs = [run_child(LOADERS[loader]) for _ in range(args.load_repeats)]
+        results[case] = {"seconds": float(np.median([run["seconds"] for run in runs]))}
+
+    # Same fit as model_training.py (all cores, seeded) on synthetic training rows
+    X, y, _ = encode_features(data.head(args.train_rows).drop(columns=["loan_id"]))
+    seconds = best_seconds(lambda: train_model(X, y), repeats=1)
+    results["training_fit"] = {"rows": len(X), "seconds": seconds}
+
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "model_version": entry.fingerprint,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "sklearn": sklearn.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "rows": args.rows,
+            "train_rows": args.train_rows,
+        },
+        "results": {case: {key: float(value) for key, value in metrics.items()} for case, metrics in results.items()},
+    }
+
+
+def compare(baseline, current, tolerance):
+    """
+    One row per case found in both runs; a case regresses when its headline metric is
+    worse than the baseline by more than `tolerance` (a fraction).
+    """
+    rows = []
+    for case, (metric, better) in HEADLINE.items():
+        if case not in baseline["results"] or case not in current["results"]:
+            continue
+        before = baseline["results"][case][metric]
+        after = current["results"][case][metric]
+        change = after / before - 1 if before else 0.0
+        worse = change > tolerance if better == "lower" else change < -tolerance
+        improved = change < -tolerance if better == "lower" else change > tolerance
+        rows.append({"case": case, "metric": metric, "baseline": before, "current": after,
+                     "change_pct": change * 100,
+                     "status": "REGRESSION" if worse else "improved" if improved else "ok"})
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="Synthetic rows for batch cases")
+    parser.add_argument("--single-calls", type=int, default=2000, help="Calls timed in single-row cases")
+    parser.add_argument("--explain-rows", type=int, default=1000, help="Rows explained with TreeSHAP")
+    parser.add_argument("--holdout-rows", type=int, default=2000, help="Rows used for permutation importance")
+    parser.add_argument("--train-rows", type=int, default=20_000, help="Rows used for the training fit")
+    parser.add_argument("--load-repeats", type=int, default=3, help="Fresh interpreters per model loader")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", help="Write this run's results to a JSON file")
+    parser.add_argument("--compare", help="Baseline results JSON to check for regressions")
+    parser.add_argument("--results", help="Compare this stored results JSON instead of running the suite")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown before flagging (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    if args.results:
+        with open(args.results) as results_file:
+            current = json.load(results_file)
+    else:
+        current = run_cases(args)
+        summary = pd.DataFrame([{"case": case, **metrics} for case, metrics in current["results"].items()])
+        print(summary.to_string(index=False, float_format="%.3f", na_rep=""))
+        if args.output:
+            with open(args.output, "w") as output_file:
+                json.dump(current, output_file, indent=2)
+            print(f"\n✅ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        if any(baseline["meta"].get(key) != current["meta"].get(key) for key in ("platform", "cpu_count")):
+            print("⚠️ Warning: Baseline was recorded on a different platform or CPU count; timings may not be comparable.")
+        report = compare(baseline, current, args.tolerance)
+        print("\n" + report.to_string(index=False, float_format="%.3f"))
+        regressions = report.loc[report["status"] == "REGRESSION", "case"].tolist()
+        if regressions:
+            print(f"\n❌ Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
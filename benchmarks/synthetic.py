@@ -0,0 +1,76 @@
+"""
+Synthetic loan applications generated from the feature schema of assets/data/loan_data.csv.
+
+Numeric features are drawn uniformly over their training range (integers where the schema
+says so), categorical features uniformly over their categories, and loan_status follows a
+fixed rule on cibil_score and loan_term with a small share of labels flipped. The labels
+do not depend on the trained model, and the same seed always gives the same rows, so
+benchmark runs stay comparable across retrains.
+
+Write a CSV with:
+    python -m benchmarks.synthetic 1000000 synthetic_applications.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from utils.model_utils import get_preprocessing_plan
+
+DEFAULT_SEED = 20240601
+
+# Share of labels flipped so training data is not perfectly separable
+LABEL_NOISE = 0.02
+
+# Label rule, close to the bundled data: approved above a CIBIL cutoff that is lower for short loans
+APPROVED, REJECTED = "Approved", "Rejected"
+CIBIL_CUTOFF = 550
+SHORT_TERM_YEARS = 4
+SHORT_TERM_CIBIL_CUTOFF = 450
+
+
+def generate_applications(n_rows, seed=DEFAULT_SEED, with_target=True):
+    """
+    DataFrame of n_rows raw applications with a loan_id column and, optionally, loan_status.
+    """
+    rng = np.random.default_rng(seed)
+    plan = get_preprocessing_plan()
+
+    columns = {"loan_id": np.arange(1, n_rows + 1)}
+    for spec in plan.features:
+        if spec["kind"] == "categorical":
+            columns[spec["name"]] = rng.choice(np.asarray(spec["categories"], dtype=object), size=n_rows)
+        elif spec.get("integer"):
+            columns[spec["name"]] = rng.integers(int(spec["min"]), int(spec["max"]) + 1, size=n_rows)
+        else:
+            columns[spec["name"]] = rng.uniform(spec.get("min", 0.0), spec.get("max", 1.0), size=n_rows)
+    df = pd.DataFrame(columns)
+
+    if with_target:
+        df["loan_status"] = synthetic_labels(df, rng)
+    return df
+
+
+def synthetic_labels(df, rng):
+    """
+    Seeded loan_status for generated applications, independent of the trained model.
+    """
+    cutoff = np.where(df["loan_term"] <= SHORT_TERM_YEARS, SHORT_TERM_CIBIL_CUTOFF, CIBIL_CUTOFF)
+    approved = df["cibil_score"].to_numpy() >= cutoff
+    approved ^= rng.random(len(df)) < LABEL_NOISE
+    return np.where(approved, APPROVED, REJECTED)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("rows", type=int, help="Number of applications to generate")
+    parser.add_argument("output", help="Output CSV path")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args()
+
+    generate_applications(args.rows, seed=args.seed).to_csv(args.output, index=False)
+    print(f"✅ Wrote {args.rows:,} synthetic applications to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,69 @@
-import pandas as pd
+import argparse
 import pickle
+import time
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder
+from utils.artifacts import save_model_artifact
+from utils.compression import COMPRESSION_REPORT_PATH, DEFAULT_TOLERANCE, compress_and_save, print_report
+from utils.feature_schema import build_feature_schema, save_feature_schema
+from utils.importance import compute_and_save_importance
+from utils.incremental_training import run_incremental_training, save_manifest, start_manifest
+from utils.training import SEARCH_REPORT_PATH, encode_features, hyperparameter_search, load_training_data, train_model
 
-# Load dataset
-df = pd.read_csv("assets/data/loan_data.csv")
+parser = argparse.ArgumentParser(description="Train the loan approval model.")
+parser.add_argument("--search", action="store_true",
+                    help="Pick hyperparameters with a parallel cross-validated grid search before training")
+parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds for --search")
+parser.add_argument("--workers", type=int, default=None, help="Worker processes for --search (default: all cores)")
+parser.add_argument("--incremental", action="store_true",
+                    help="Add trees for rows not trained on yet instead of retraining on the full history")
+parser.add_argument("--new-data", help="With --incremental, train on this CSV instead of rows appended to loan_data.csv")
+parser.add_argument("--new-trees", type=int, default=None,
+                    help="Trees to add with --incremental (default: in proportion to the new rows)")
+parser.add_argument("--max-trees", type=int, default=None, help="With --incremental, retire the oldest trees beyond this")
+parser.add_argument("--compare-full", action="store_true",
+                    help="With --incremental, also retrain from scratch and compare held-out accuracy")
+parser.add_argument("--compress", action="store_true",
+                    help="Serve a compressed forest: fewer, shallower trees in a compact quantized layout")
+parser.add_argument("--compress-tolerance", type=float, default=DEFAULT_TOLERANCE,
+                    help="With --compress, largest held-out accuracy drop allowed per step and overall")
+args = parser.parse_args()
 
-# Drop non-feature columns if they exist
-if "loan_id" in df.columns:
-    df = df.drop(columns=["loan_id"])
+if args.incremental:
+    run_incremental_training(args.new_data, n_trees=args.new_trees, max_trees=args.max_trees,
+                             compare_full=args.compare_full)
+    raise SystemExit(0)
 
-# Ensure column names are all lowercase for consistency
-df.columns = [col.lower() for col in df.columns]
+# Load dataset (loan_id dropped, column names lowercased)
+df = load_training_data("assets/data/loan_data.csv")
 
 # Encode categorical features
-label_encoders = {}
-categorical_columns = ["gender", "married", "dependents", "education", "self_employed", "property_area"]
-
-for column in categorical_columns:
-    if column in df.columns:
-        le = LabelEncoder()
-        df[column] = le.fit_transform(df[column])
-        label_encoders[column] = le
-
-# Define features and target
-X = df.drop(columns=["loan_status"])
-y = df["loan_status"]
+X, y, label_encoders = encode_features(df)
 
 # Print feature columns for debugging
 print("Feature columns:", X.columns.tolist())
 
+# Feature schema compiled by the serving code into its preprocessing plan
+save_feature_schema(build_feature_schema(X, label_encoders), "assets/data/feature_schema.json")
+
 # Split dataset
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-# Train model
-model = RandomForestClassifier(n_estimators=100, random_state=42)
-model.fit(X_train, y_train)
+# Save the held-out split for evaluation and permutation importance
+df.loc[X_test.index].to_csv("assets/data/holdout.csv", index=False)
+
+# Choose hyperparameters on the training split only
+params = {"n_estimators": 100}
+if args.search:
+    params, report = hyperparameter_search(X_train, y_train, n_folds=args.folds, max_workers=args.workers)
+    report.to_csv(SEARCH_REPORT_PATH, index=False)
+    print(report.to_string(index=False))
+    print(f"Best parameters: {params} (report saved to {SEARCH_REPORT_PATH})")
+
+# Train model on every core
+fit_start = time.perf_counter()
+model = train_model(X_train, y_train, params)
+fit_seconds = time.perf_counter() - fit_start
+print(f"Held-out accuracy: {model.score(X_test, y_test):.4f}")
 
 # Save model and encoders
 with open("assets/data/trained_model.pkl", "wb") as model_file:
@@ -45,4 +72,25 @@ with open("assets/data/trained_model.pkl", "wb") as model_file:
 with open("assets/data/label_encoders.pkl", "wb") as encoder_file:
     pickle.dump(label_encoders, encoder_file)
 
-print("✅ Model training completed & saved successfully!")
\ No newline at end of file
+# Record which rows the trees were fitted on, so --incremental can add trees for new rows only
+manifest = start_manifest("assets/data/loan_data.csv", df, model.n_estimators, params, fit_seconds,
+                          len(X_train), len(X_test))
+# Options the artifact is compressed with, repeated by --incremental runs
+manifest["compression"] = {"tolerance": args.compress_tolerance, "n_trees": None, "max_depth": None} if args.compress else None
+save_manifest(manifest)
+
+# Memory-mappable copy used for fast startup by load_model_and_encoders
+save_model_artifact(model, label_encoders, "assets/data/model_artifact", source_path="assets/data/trained_model.pkl")
+
+# Replace it with the compressed forest, selected on half of the held-out split and scored on the other half;
+# the full forest stays in place if the compressed one loses more than the tolerance there
+if args.compress:
+    report, settings = compress_and_save(model, label_encoders, X_test.to_numpy(dtype=float), y_test.to_numpy(),
+                                         tolerance=args.compress_tolerance)
+    print_report(report, settings)
+    print(f"Compression report saved to {COMPRESSION_REPORT_PATH}")
+
+# Precompute permutation importance on the held-out split for the explainability page
+compute_and_save_importance()
+
+print("✅ Model training completed & saved successfully!")
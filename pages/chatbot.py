@@ -2,64 +2,38 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 import json
+from utils.llm_client import DEFAULT_SETTINGS, describe_api_error, openai_available, stream_chat
+from utils.local_explainer import generate_local_response, get_local_explainer
 
 # Load environment variables from .env
 load_dotenv()
 MODEL_NAME = os.getenv("MODEL_NAME", "meta-llama/Meta-Llama-3.1-70B-Instruct")  # Default model
 
-# Try to import OpenAI client, show clear error if not installed
-try:
-    from openai import OpenAI
-    openai_available = True
-except ImportError:
-    openai_available = False
-
-def get_chatbot_response(user_input, selected_model, api_key):
+def stream_chatbot_response(user_input, selected_model, api_key):
     """
-    Get response from Nebius AI Studio API using the OpenAI client format.
+    Stream the response into the page as tokens arrive. Returns (status, message);
+    on success the message has already been written.
     """
-    # Check if API key is provided
     if not api_key:
         return ("⚠️ API configuration missing", "Please enter your Nebius API Key.")
-    
+
     if not openai_available:
         return ("⚠️ Missing dependency", "The 'openai' package is not installed. Please install it with 'pip install openai'.")
-    
+
     try:
-        # Initialize OpenAI client with Nebius base URL
-        client = OpenAI(
-            base_url="https://api.studio.nebius.com/v1/",
-            api_key=api_key
-        )
-        
-        # Create the chat completion
-        response = client.chat.completions.create(
-            model=selected_model,
-            max_tokens=512,
-            temperature=0.6,
-            top_p=0.9,
-            extra_body={"top_k": 50},
-            messages=[
-                {"role": "system", "content": "You are an AI assistant that explains predictions made by a loan approval model."},
-                {"role": "user", "content": user_input}
-            ]
-        )
-        
-        if response.choices and len(response.choices) > 0:
-            return ("Success", response.choices[0].message.content)
+        chunks = stream_chat(user_input, selected_model, api_key)
+        st.write("### 🤖 Chatbot Response:")
+        if hasattr(st, "write_stream"):
+            response = st.write_stream(chunks)
         else:
-            return ("⚠️ Empty response", "The API returned an empty response.")
-    
+            response = "".join(chunks)
+            st.write(response)
     except Exception as e:
-        error_message = str(e)
-        if "auth" in error_message.lower() or "api key" in error_message.lower():
-            return ("⚠️ Authentication error", "Invalid API key. Please check and re-enter.")
-        elif "not found" in error_message.lower() or "404" in error_message:
-            return ("⚠️ API endpoint error", "Invalid API endpoint. Check the base URL.")
-        elif "connection" in error_message.lower():
-            return ("⚠️ Connection error", f"Could not connect to Nebius AI Studio: {error_message}")
-        else:
-            return ("⚠️ API error", f"An error occurred: {error_message}")
+        return describe_api_error(e)
+
+    if not response:
+        return ("⚠️ Empty response", "The API returned an empty response.")
+    return ("Success", response)
 
 def show():
     """
@@ -98,25 +72,27 @@ def show():
         
         st.write("Current model settings:")
         st.code(f"""Model: {selected_model}
-Max Tokens: 512
-Temperature: 0.6
-Top P: 0.9
-Top K: 50""")
+Max Tokens: {DEFAULT_SETTINGS['max_tokens']}
+Temperature: {DEFAULT_SETTINGS['temperature']}
+Top P: {DEFAULT_SETTINGS['top_p']}
+Top K: {DEFAULT_SETTINGS['top_k']}""")
     
     user_input = st.text_input("💬 Ask something about the AI model...")
     local_mode = st.checkbox("Use local AI explanation (without API)", value=False)
+    if local_mode:
+        # Built once per model version and shared by all sessions; later answers take milliseconds
+        with st.spinner("Preparing local explanation indexes…"):
+            get_local_explainer()
     
     if user_input:
         if local_mode:
-            chatbot_response = generate_local_response(user_input)
+            # Answers about the application last submitted on the prediction page, if any
+            chatbot_response = generate_local_response(user_input, st.session_state.get("last_application"))
             st.write("### 🤖 Chatbot Response (Local Mode):")
             st.write(chatbot_response)
         else:
-            status, chatbot_response = get_chatbot_response(user_input, selected_model, st.session_state.api_key)
-            if status == "Success":
-                st.write("### 🤖 Chatbot Response:")
-                st.write(chatbot_response)
-            else:
+            status, chatbot_response = stream_chatbot_response(user_input, selected_model, st.session_state.api_key)
+            if status != "Success":
                 st.error(f"### {status}")
                 st.write(chatbot_response)
                 st.info("Consider using 'Local AI explanation' mode if you're having API issues.")
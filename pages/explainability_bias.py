@@ -1,74 +1,206 @@
+import io
+import os
 import streamlit as st
 import numpy as np
 import matplotlib.pyplot as plt
 import pandas as pd
-from sklearn.inspection import permutation_importance
-from utils.model_utils import load_model_and_encoders
+from utils.bias_audit import DISPARATE_IMPACT_THRESHOLD, cached_bias_audit, summary_table
+from utils.drift import (DRIFT_STATE_PATH, MIN_WINDOW_ROWS, PSI_ALERT, PSI_WARNING, bin_labels, drift_monitor,
+                         drift_table, load_state, retraining_signal)
+from utils.importance import IMPORTANCE_PATH, load_permutation_importance
+from utils.ui_cache import fragment, get_loaded_model, model_version
 
-# Load model and encoders
-model, label_encoders = load_model_and_encoders()
+def _file_signature(path):
+    """
+    (mtime, size) of a file, or None if it does not exist; part of the cache key of charts read from it.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def importance_chart(version, fingerprint, importance_signature):
+    """
+    Feature importance chart for one model version and importance file, rendered once to PNG.
+    Returns (png_bytes, caption); png_bytes is None if the model has no importances.
+    """
+    model = get_loaded_model(version).model
+
+    # Ensure model has feature names
+    if not hasattr(model, "feature_names_in_"):
+        raise ValueError("Model does not have 'feature_names_in_' attribute.")
+
+    feature_names = model.feature_names_in_
+    errors = None
+
+    # Prefer permutation importance measured on the held-out split by model_training.py
+    permutation_result = load_permutation_importance(version)
+    if permutation_result is not None:
+        feature_names = permutation_result["feature_names"]
+        importances = permutation_result["importances_mean"]
+        errors = permutation_result["importances_std"]
+        caption = (
+            f"Accuracy drop when each feature is shuffled on {permutation_result['holdout_rows']} held-out "
+            f"applications ({permutation_result['n_repeats']} repeats, baseline accuracy "
+            f"{permutation_result['baseline_accuracy']:.1%})."
+        )
+    elif hasattr(model, "feature_importances_"):
+        # Built-in impurity-based importance for tree models
+        importances = model.feature_importances_
+        caption = ("Impurity-based importance from the trained forest. Run `python -m utils.importance` "
+                   "for permutation importance on held-out data.")
+    else:
+        return None, "No importances available yet. Run `python -m utils.importance` to compute them."
+
+    # Create DataFrame for visualization
+    importance_df = pd.DataFrame({"Feature": feature_names, "Importance": importances,
+                                  "Error": errors if errors is not None else np.zeros(len(importances))})
+    importance_df = importance_df.sort_values(by="Importance", ascending=False)
+
+    # Plot the feature importance
+    fig, ax = plt.subplots()
+    ax.barh(importance_df["Feature"], importance_df["Importance"], xerr=importance_df["Error"], color="skyblue")
+    ax.set_xlabel("Importance Score")
+    ax.set_title("Feature Importance")
+    ax.invert_yaxis()  # Flip order for better visualization
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue(), caption
+
+@st.cache_data(max_entries=8, show_spinner="Auditing the model…")
+def bias_report(version, fingerprint):
+    return cached_bias_audit(version)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def drift_report(signature):
+    """
+    Drift state and its per-window drift table, recomputed only when the state file changes.
+    """
+    state = load_state(DRIFT_STATE_PATH)
+    if state is None:
+        return None, None
+    return state, drift_table(state)
 
 def show():
     """
     Display the Explainability & Bias Analysis UI in Streamlit.
     """
+    version = "default"
+
     st.title("📢 Model Explainability & Bias Analysis")
     st.write("Understand how the AI model makes decisions and check for potential biases.")
 
-    # 🔍 Feature Importance (Fast Alternative)
+    # 🔍 Feature Importance (precomputed, never recomputed on render)
     st.subheader("📊 Feature Importance")
 
     try:
-        # Ensure model has feature names
-        if not hasattr(model, "feature_names_in_"):
-            st.error("Model does not have 'feature_names_in_' attribute.")
-            return
-
-        feature_names = model.feature_names_in_
-
-        # Use built-in feature importance if available (for tree-based models)
-        if hasattr(model, "feature_importances_"):
-            importances = model.feature_importances_
+        # Rewritten by `python -m utils.importance` without retraining, so it is part of the key
+        chart, caption = importance_chart(version, model_version(version), _file_signature(IMPORTANCE_PATH))
+        if chart is None:
+            st.info(caption)
         else:
-            # Use permutation importance (works for all models)
-            sample_input = np.random.rand(100, len(feature_names))  # Generate 100 random inputs
-            sample_output = model.predict(sample_input)
-            result = permutation_importance(model, sample_input, sample_output, n_repeats=10, random_state=42)
-            importances = result.importances_mean
-
-        # Create DataFrame for visualization
-        importance_df = pd.DataFrame({"Feature": feature_names, "Importance": importances})
-        importance_df = importance_df.sort_values(by="Importance", ascending=False)
-
-        # Plot the feature importance
-        fig, ax = plt.subplots()
-        ax.barh(importance_df["Feature"], importance_df["Importance"], color="skyblue")
-        ax.set_xlabel("Importance Score")
-        ax.set_title("Feature Importance")
-        plt.gca().invert_yaxis()  # Flip order for better visualization
-        st.pyplot(fig)
+            st.caption(caption)
+            st.image(chart)
 
     except Exception as e:
         st.error(f"Could not calculate feature importance: {e}")
 
+    bias_section(version)
+    drift_section()
+
+@fragment
+def bias_section(version="default"):
+    """
+    Bias analysis; runs as a fragment, so clicking the button does not rerun the whole page.
+    """
     # ⚖️ Bias Detection Section
     st.subheader("⚖️ Bias Detection")
-    st.write("Check if the model has biases in gender, income, or location-based predictions.")
+    st.write("Check if approval rates differ by education, employment, dependents, income or assets.")
 
     if st.button("🔎 Analyze Bias"):
         try:
-            bias_results = detect_bias(model, label_encoders)
-            st.write(bias_results)
+            bias_results = detect_bias(version)
+            summary = summary_table(bias_results)
+            st.dataframe(summary, use_container_width=True)
+
+            flagged = summary.loc[~summary["passes_four_fifths_rule"], "attribute"].tolist()
+            if flagged:
+                st.warning(f"Disparate impact below {DISPARATE_IMPACT_THRESHOLD:.0%} for: {', '.join(flagged)}")
+            else:
+                st.success(f"All audited attributes keep disparate impact at or above {DISPARATE_IMPACT_THRESHOLD:.0%}.")
+
+            for attribute, result in bias_results.items():
+                with st.expander(f"Groups by {attribute}"):
+                    st.dataframe(result["groups"], use_container_width=True)
         except Exception as e:
             st.error(f"Error detecting bias: {e}")
 
-def detect_bias(model, label_encoders):
+def detect_bias(version="default"):
+    """
+    Audit the model over the full training dataset: per-group approval rates, demographic parity,
+    equal opportunity, disparate impact and calibration. Cached per model version.
+    """
+    return bias_report(version, model_version(version))
+
+@fragment
+def drift_section():
     """
-    Dummy function to simulate bias detection.
+    Drift of the scored applications against the training data, per feature and window.
     """
-    bias_report = {
-        "Gender Bias": "No strong gender bias detected.",
-        "Income Bias": "Slight preference for higher incomes in approval.",
-        "Location Bias": "Urban applicants have a higher chance of approval."
-    }
-    return bias_report
\ No newline at end of file
+    st.subheader("📈 Data Drift")
+    st.write("Compare the applications being scored with the data the model was trained on.")
+
+    # Batches scored by this process reach the state file on the monitor's periodic flush;
+    # reruns of this fragment only trigger it once it is due
+    drift_monitor.flush_if_due()
+    pending = drift_monitor.pending_rows()
+    if pending:
+        st.button(f"Include {pending:,} recently scored application(s)", on_click=drift_monitor.flush)
+    state, table = drift_report(_file_signature(DRIFT_STATE_PATH))
+    if state is None or table.empty:
+        st.info("No scored batches recorded yet. Score with `python score_applications.py ... --drift`, "
+                "`python scoring_server.py --drift` or `LOAN_DRIFT=1`.")
+        return
+
+    period, drifted = retraining_signal(table)
+    if drifted:
+        st.warning(f"Window {period}: PSI at or above {PSI_ALERT} for {', '.join(drifted)}. "
+                   "Retraining on recent applications is recommended (`python model_training.py`).")
+    elif period is None:
+        st.info(f"No window has {MIN_WINDOW_ROWS} scored applications yet.")
+    else:
+        st.success(f"Window {period}: every feature stays below PSI {PSI_ALERT}.")
+
+    st.caption(f"Population stability index per day. Below {PSI_WARNING} is stable, {PSI_WARNING} to "
+               f"{PSI_ALERT} a moderate shift, above {PSI_ALERT} a significant one.")
+    st.line_chart(table.pivot(index="period", columns="feature", values="psi"))
+
+    latest_period = table["period"].max()
+    st.dataframe(table[table["period"] == latest_period].drop(columns="period"), hide_index=True,
+                 use_container_width=True)
+
+    features = {feature["name"]: feature for feature in state["reference"]["features"]}
+    name = st.selectbox("Compare distributions", list(features))
+    feature = features[name]
+    window = next((window for window in reversed(state["windows"]) if name in window["features"]), None)
+    if window is None:
+        st.info(f"No scored window has values for {name} yet.")
+        return
+    reference_counts = np.asarray(feature["histogram"]["counts"], dtype=np.float64)
+    window_counts = np.asarray(window["features"][name]["counts"], dtype=np.float64)
+    distributions = pd.DataFrame({
+        "Training data": reference_counts / max(reference_counts.sum(), 1),
+        f"Scored {window['period']}": window_counts / max(window_counts.sum(), 1),
+    }, index=pd.Index(bin_labels(feature), name=name))
+
+    # Side-by-side bars; st.bar_chart stacks them on older Streamlit versions
+    fig, ax = plt.subplots(figsize=(8, 3))
+    distributions.plot.bar(ax=ax, color=["lightgray", "skyblue"], width=0.8)
+    ax.set_ylabel("Share of applications")
+    ax.tick_params(axis="x", labelrotation=60, labelsize=7)
+    st.pyplot(fig)
+    plt.close(fig)
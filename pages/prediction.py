@@ -2,101 +2,140 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import traceback
-from utils.model_utils import preprocess_input, load_model_and_encoders
+from utils.model_utils import get_preprocessing_plan, is_approved, predict_features, preprocess_input
+from utils.prediction_cache import prediction_cache
+from utils.counterfactuals import find_counterfactual
+from utils.instrumentation import metrics
+from utils.tree_shap import explain_features
+from utils.ui_cache import get_loaded_model
 
-# Load the trained model and encoders
-model, label_encoders = load_model_and_encoders()
+def _feature_input(spec):
+    """
+    Streamlit input widget for one feature of the schema.
+    """
+    label = spec["name"].replace("_", " ").title()
+    if spec["kind"] == "categorical":
+        return st.selectbox(label, spec["categories"])
+
+    if "median" not in spec:
+        return st.number_input(label, value=0.0)
+
+    if spec["integer"]:
+        # Coarser steps for large amounts so the +/- buttons stay useful
+        step = max(1, 10 ** (len(str(int(abs(spec["max"])))) - 3))
+        return st.number_input(label, min_value=min(0, int(spec["min"])), value=int(spec["median"]), step=step)
+    return st.number_input(label, min_value=min(0.0, float(spec["min"])), value=float(spec["median"]))
+
+def _debug_sidebar(model, label_encoders):
+    """
+    Sidebar panel with model details and the scoring-path metrics of this process.
+    """
+    if model is not None and hasattr(model, 'feature_names_in_'):
+        st.sidebar.subheader("Model Information")
+        st.sidebar.write(f"Model Type: {type(model).__name__}")
+        st.sidebar.write(f"Expected Features: {', '.join(model.feature_names_in_)}")
+
+        st.sidebar.subheader("Label Encoders")
+        for col, encoder in label_encoders.items():
+            st.sidebar.write(f"{col}: {', '.join(encoder.classes_)}")
+
+    # Instrumentation is process-wide, so it stays on for every session until switched off
+    st.sidebar.subheader("Scoring Metrics")
+    recording = st.sidebar.checkbox("Record stage timings and counters", value=metrics.enabled)
+    if recording and not metrics.enabled:
+        metrics.enable()
+    elif not recording and metrics.enabled:
+        metrics.disable()
+
+    stages = metrics.stage_stats()
+    if stages:
+        st.sidebar.dataframe(pd.DataFrame(stages), hide_index=True, use_container_width=True)
+    else:
+        st.sidebar.caption("No stage timings yet. Turn on recording and make a prediction.")
+    counters = metrics.counters()
+    if counters:
+        st.sidebar.dataframe(pd.DataFrame(counters), hide_index=True, use_container_width=True)
+    st.sidebar.download_button("Download Prometheus metrics", metrics.prometheus_text(),
+                               file_name="loan_metrics.prom", mime="text/plain")
 
 def show():
     """
     Display the Prediction UI in Streamlit.
     """
+    # Shared, lazily loaded model; fast_model is its flat-array copy for single-row prediction
+    loaded = get_loaded_model()
+    model, label_encoders, scoring_model = loaded.model, loaded.label_encoders, loaded.fast_model
+
     st.title("🔮 AI Model Prediction")
     st.write("Enter details below to get a loan prediction.")
 
-    # Debug mode (Commented out for live deployment)
-    # debug_mode = st.sidebar.checkbox("Enable Debug Mode", value=False)
-    
-    # if debug_mode and model is not None and hasattr(model, 'feature_names_in_'):
-    #     st.sidebar.subheader("Model Information")
-    #     st.sidebar.write(f"Model Type: {type(model).__name__}")
-    #     st.sidebar.write(f"Expected Features: {', '.join(model.feature_names_in_)}")
-        
-    #     st.sidebar.subheader("Label Encoders")
-    #     for col, encoder in label_encoders.items():
-    #         st.sidebar.write(f"{col}: {', '.join(encoder.classes_)}")
-
-    # Create input fields in a grid layout
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        gender = st.selectbox("Gender", ["Male", "Female"])
-        married = st.selectbox("Married", ["Yes", "No"])
-    
-    with col2:
-        dependents = st.selectbox("Dependents", ["0", "1", "2", "3+"])
-        education = st.selectbox("Education", ["Graduate", "Not Graduate"])
-    
-    with col3:
-        self_employed = st.selectbox("Self Employed", ["Yes", "No"])
-        applicant_income = st.number_input("Applicant Income", min_value=0, step=500)
-
-    col4, col5 = st.columns(2)
-    
-    with col4:
-        coapplicant_income = st.number_input("Coapplicant Income", min_value=0, step=500)
-    
-    with col5:
-        loan_amount = st.number_input("Loan Amount", min_value=0, step=500)
-
-    loan_term = st.selectbox("Loan Term (Months)", ["12", "24", "36", "48", "60", "120", "180", "240", "360"])
-    credit_history = st.selectbox("Credit History", ["0", "1"])
-    property_area = st.selectbox("Property Area", ["Urban", "Semiurban", "Rural"])
-
-    # Predict button
-    if st.button("🔍 Predict Loan Approval"):
-        user_data = {
-            "gender": gender,
-            "married": married,
-            "dependents": dependents,
-            "education": education,
-            "self_employed": self_employed,
-            "applicant_income": applicant_income,
-            "coapplicant_income": coapplicant_income,
-            "loan_amount": loan_amount,
-            "loan_amount_term": loan_term,
-            "credit_history": credit_history,
-            "property_area": property_area,
-        }
+    # Debug mode: model details and scoring metrics in the sidebar, inputs and tracebacks on the page
+    debug_mode = st.sidebar.checkbox("Enable Debug Mode", value=False)
+
+    # Input fields generated from the feature schema the model was trained with; inside a form,
+    # editing a field does not rerun the page, only submitting does
+    plan = get_preprocessing_plan()
+    with st.form("prediction_form"):
+        columns = st.columns(3)
+        user_data = {}
+        for position, spec in enumerate(plan.features):
+            with columns[position % 3]:
+                user_data[spec["name"]] = _feature_input(spec)
+
+        # Predict button
+        submitted = st.form_submit_button("🔍 Predict Loan Approval")
+
+    if submitted:
+        # Lets the chatbot's local mode answer questions about this application
+        st.session_state.last_application = user_data
 
         try:
-            # Debug mode - show input data (Commented out for live)
-            # if debug_mode:
-            #     st.subheader("Debug: Input Data")
-            #     st.write(user_data)
+            if debug_mode:
+                st.subheader("Debug: Input Data")
+                st.write(user_data)
             
             # Preprocess input
             processed_input = preprocess_input(user_data, label_encoders)
             
-            # Debug mode - show processed data (Commented out for live)
-            # if debug_mode:
-            #     st.subheader("Debug: Processed Input")
-            #     st.write(f"Shape: {processed_input.shape}")
-            #     st.write(processed_input)
+            if debug_mode:
+                st.subheader("Debug: Processed Input")
+                st.write(f"Shape: {processed_input.shape}")
+                st.write(processed_input)
             
-            # Predict using model
-            prediction = model.predict(processed_input)
+            # Predict using model; re-submitted profiles are answered from the prediction cache
+            prediction, _ = predict_features(processed_input, cache=prediction_cache)
 
             # Display the result
             st.subheader("📌 Prediction Result")
-            if prediction[0] == 1:
+            if is_approved(scoring_model, prediction[0]):
                 st.success("✅ Loan Approved!")
             else:
                 st.error("❌ Loan Rejected!")
+
+                # Smallest change to loan amount, loan term or CIBIL score that flips the decision
+                counterfactual = find_counterfactual(user_data)
+                if counterfactual["status"] == "found":
+                    st.subheader("🔁 What Would Flip This Decision")
+                    st.table(pd.DataFrame([
+                        {"Feature": change["feature"], "Current": f"{change['from']:,.0f}", "Needed": f"{change['to']:,.0f}"}
+                        for change in counterfactual["changes"]
+                    ]))
+                    st.caption(f"Approval probability with these changes: {counterfactual['counterfactual_probability']:.0%}")
+
+            # Per-applicant explanation: TreeSHAP contribution of each feature to the approval probability
+            if hasattr(model, "feature_names_in_"):
+                contributions = explain_features(processed_input)[0]
+                explanation = pd.DataFrame({"Feature": model.feature_names_in_, "Contribution": contributions})
+                explanation = explanation.iloc[np.argsort(-np.abs(contributions))].head(5)
+                st.subheader("🧭 Top Factors Behind This Decision")
+                st.bar_chart(explanation.set_index("Feature"))
                 
         except Exception as e:
             st.error(f"Error during prediction: {str(e)}")
-            # Debug mode - show error traceback (Commented out for live)
-            # if debug_mode:
-            #     st.error("Detailed error traceback:")
-            #     st.code(traceback.format_exc())
\ No newline at end of file
+            if debug_mode:
+                st.error("Detailed error traceback:")
+                st.code(traceback.format_exc())
+
+    # Drawn last so the metrics include this run's prediction
+    if debug_mode:
+        _debug_sidebar(model, label_encoders)
\ No newline at end of file
@@ -0,0 +1,194 @@
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+from utils.drift import drift_monitor
+from utils.instrumentation import metrics
+from utils.model_utils import predict_batch
+from utils.parallel_scoring import MIN_ROWS_PER_WORKER, ParallelScorer
+from utils.prediction_cache import PredictionCache
+
+try:
+    import resource
+except ImportError:  # resource is POSIX-only
+    resource = None
+
+DEFAULT_CHUNK_SIZE = 50_000
+ID_COLUMN = "loan_id"
+
+
+class PredictionWriter:
+    """
+    Append prediction chunks to a CSV or Parquet file as they are produced.
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.is_parquet = output_path.lower().endswith((".parquet", ".pq"))
+        self._parquet_writer = None
+        self._csv_header_written = False
+
+    def write(self, chunk):
+        if self.is_parquet:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError as e:
+                raise RuntimeError("Writing Parquet requires 'pyarrow'. Install it with 'pip install pyarrow'.") from e
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.output_path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            chunk.to_csv(
+                self.output_path,
+                mode="a" if self._csv_header_written else "w",
+                header=not self._csv_header_written,
+                index=False,
+            )
+            self._csv_header_written = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+
+def score_chunk(chunk, scorer=predict_batch):
+    """
+    Score one chunk of raw applications and return the prediction frame for it.
+    """
+    chunk.columns = [col.lower() for col in chunk.columns]
+    labels, probabilities = scorer(chunk)
+
+    result = pd.DataFrame({"predicted_status": labels, "approval_probability": probabilities})
+    if ID_COLUMN in chunk.columns:
+        result.insert(0, ID_COLUMN, chunk[ID_COLUMN].to_numpy())
+    return result
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MiB, or None if unavailable.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB on Linux
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def score_csv(input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE, scorer=predict_batch):
+    """
+    Stream an applications CSV through the model in fixed-size chunks.
+    Only one chunk is held in memory at a time, so peak memory does not grow with file size.
+    """
+    writer = PredictionWriter(output_path)
+    total_rows = 0
+    start = time.perf_counter()
+
+    try:
+        for chunk in pd.read_csv(input_path, chunksize=chunk_size, skipinitialspace=True):
+            predictions = score_chunk(chunk, scorer=scorer)
+            writer.write(predictions)
+            total_rows += len(predictions)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": total_rows,
+        "seconds": elapsed,
+        "rows_per_sec": total_rows / elapsed if elapsed > 0 else float("inf"),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV of loan applications in bounded memory.")
+    parser.add_argument("input", help="Applications CSV shaped like assets/data/loan_data.csv")
+    parser.add_argument("output", help="Output path (.csv, .parquet or .pq)")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help=f"Rows read and scored per chunk (default: {DEFAULT_CHUNK_SIZE:,}, or {MIN_ROWS_PER_WORKER:,} "
+             f"per worker with --workers, since a chunk is only split for every {MIN_ROWS_PER_WORKER:,} rows)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes per chunk (0 = one per core, 1 = serial)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=0,
+        help="Cache predictions for up to this many distinct applicant profiles (serial scoring only)",
+    )
+    parser.add_argument(
+        "--metrics",
+        help="Write stage timings and encoding counters to this file in Prometheus text format (serial scoring only)",
+    )
+    parser.add_argument(
+        "--drift",
+        action="store_true",
+        help="Add the scored applications to the drift monitor's histograms (serial scoring only)",
+    )
+    parser.add_argument("--drift-period", help="With --drift, the window to add them to (default: today, UTC)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        parser.error(f"Input file not found: {args.input}")
+    if args.drift and args.workers != 1:
+        parser.error("--drift needs --workers 1; worker processes do not report to the drift monitor")
+    if args.metrics:
+        metrics.enable()
+    if args.drift:
+        drift_monitor.enable()
+        drift_monitor.period = args.drift_period
+
+    # Each worker needs MIN_ROWS_PER_WORKER rows of a chunk, so chunks are sized to keep the whole pool busy
+    pool_size = 1 if args.workers == 1 else min(args.workers or os.cpu_count() or 1, os.cpu_count() or 1)
+    if args.chunk_size is None:
+        args.chunk_size = max(DEFAULT_CHUNK_SIZE, pool_size * MIN_ROWS_PER_WORKER)
+    elif args.chunk_size < pool_size * MIN_ROWS_PER_WORKER:
+        print(f"⚠️ Warning: --chunk-size {args.chunk_size:,} keeps at most "
+              f"{max(1, args.chunk_size // MIN_ROWS_PER_WORKER)} of {pool_size} workers busy; "
+              f"use at least {pool_size * MIN_ROWS_PER_WORKER:,} rows per chunk to use them all")
+
+    cache = None
+    if args.workers == 1 and args.cache_size > 0:
+        cache = PredictionCache(maxsize=args.cache_size, ttl=None)
+        stats = score_csv(args.input, args.output, chunk_size=args.chunk_size,
+                          scorer=lambda chunk: predict_batch(chunk, cache=cache))
+    elif args.workers == 1:
+        stats = score_csv(args.input, args.output, chunk_size=args.chunk_size)
+    else:
+        with ParallelScorer(max_workers=args.workers or None) as scorer:
+            stats = score_csv(args.input, args.output, chunk_size=args.chunk_size, scorer=scorer.predict)
+
+    print(f"✅ Scored {stats['rows']:,} rows in {stats['seconds']:.2f}s ({stats['rows_per_sec']:,.0f} rows/sec)")
+    if stats["peak_rss_mb"] is not None:
+        print(f"📈 Peak RSS: {stats['peak_rss_mb']:.1f} MiB")
+    if cache is not None:
+        cache_stats = cache.stats()
+        print(f"♻️ Prediction cache: {cache_stats['hits']:,} hits, {cache_stats['misses']:,} misses "
+              f"({cache_stats['hit_rate']:.1%} hit rate)")
+    if args.metrics:
+        metrics.dump(args.metrics)
+        print(f"📊 Metrics written to {args.metrics}")
+    if args.drift:
+        drift_monitor.flush()
+        print(f"📈 Drift histograms updated in {drift_monitor.state_path}; check them with python -m utils.drift")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Asyncio HTTP scoring service for the loan approval model.
+
+Endpoints:
+    POST /predict        one application as a JSON object, micro-batched with concurrent requests
+    POST /predict/batch  a JSON list of applications, scored as one batch
+                         (applications missing model features get a 400 listing them)
+    GET  /health         model load status and version
+    GET  /metrics        request, latency, batching and cache counters as JSON (--cache-size 0
+                         turns the prediction cache off, e.g. for load tests)
+    GET  /metrics/prometheus  stage timings, request latency histograms and encoding counters
+                              (Prometheus text format; needs --instrument or LOAN_METRICS=1)
+
+With --drift (or LOAN_DRIFT=1), scored applications are added to the drift monitor's
+histograms (utils/drift.py), which are merged into assets/data/drift_state.json every minute.
+
+Run from the repository root:
+    python scoring_server.py --port 8000 --max-batch-size 64 --max-wait-ms 2 --instrument --drift
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.drift import drift_monitor
+from utils.feature_schema import MissingFeaturesError
+from utils.instrumentation import BATCH_SIZE_BUCKETS, metrics
+from utils.micro_batching import MicroBatcher
+from utils.model_utils import DEFAULT_VERSION, predict_records, registry
+from utils.prediction_cache import prediction_cache
+
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH_RECORDS = 10_000
+
+# Latencies kept for the percentiles reported by /metrics
+LATENCY_WINDOW = 10_000
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, **details):
+        super().__init__(message)
+        self.status = status
+        # Extra fields of the JSON error body
+        self.details = details
+
+
+def score_applications(records, version=DEFAULT_VERSION, cache=prediction_cache):
+    """
+    Score a list of application dicts; returns one result dict per record.
+    Repeated applicant profiles are answered from `cache` (None scores every record).
+    Raises MissingFeaturesError if any record lacks a model feature.
+    """
+    model_version = registry.get(version).fingerprint
+    labels, probabilities = predict_records(records, version, cache=cache, strict=True)
+    return [{"loan_status": str(label), "approval_probability": float(probability), "model_version": model_version}
+            for label, probability in zip(labels, probabilities)]
+
+
+class ScoringServer:
+    """
+    HTTP/1.1 server (keep-alive, Content-Length bodies) built on asyncio streams.
+    Model work runs on a single worker thread so the event loop only parses and batches.
+    """
+
+    def __init__(self, version=DEFAULT_VERSION, max_batch_size=64, max_wait=0.002, cache=prediction_cache):
+        self.version = version
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scoring")
+        self.batcher = MicroBatcher(self._score_batch, max_batch_size=max_batch_size,
+                                    max_wait=max_wait, executor=self.executor)
+        self.started_at = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._server = None
+
+    def _score_batch(self, records):
+        metrics.observe("loan_batch_size", len(records), buckets=BATCH_SIZE_BUCKETS)
+        return score_applications(records, self.version, self.cache)
+
+    async def start(self, host, port):
+        # Load the model and compile the preprocessing plan before accepting traffic
+        await asyncio.get_running_loop().run_in_executor(self.executor, registry.get, self.version)
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+        self.executor.shutdown()
+        drift_monitor.flush()
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line") from None
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length header") from None
+        if length < 0:
+            raise HTTPError(400, "Invalid Content-Length header")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Request body exceeds {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method, target.split("?", 1)[0], headers, body
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                # Until a request has been read in full, an error leaves unread bytes on the
+                # connection that would be parsed as the next request, so it is closed instead
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    status, payload = await self._dispatch(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e), **e.details}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+
+                if status >= 400:
+                    self.errors += 1
+                if isinstance(payload, str):
+                    data, content_type = payload.encode(), "text/plain; version=0.0.4"
+                else:
+                    data, content_type = json.dumps(payload).encode(), "application/json"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        routes = {
+            "/predict": ("POST", self._predict),
+            "/predict/batch": ("POST", self._predict_batch),
+            "/health": ("GET", self._health),
+            "/metrics": ("GET", self._metrics),
+            "/metrics/prometheus": ("GET", self._prometheus),
+        }
+        if path not in routes:
+            raise HTTPError(404, f"No route for {path}")
+        expected_method, handler = routes[path]
+        if method != expected_method:
+            raise HTTPError(405, f"{path} only accepts {expected_method}")
+        return 200, await handler(body)
+
+    @staticmethod
+    def _parse_json(body):
+        try:
+            return json.loads(body)
+        except ValueError:
+            raise HTTPError(400, "Request body is not valid JSON") from None
+
+    async def _predict(self, body):
+        record = self._parse_json(body)
+        if not isinstance(record, dict):
+            raise HTTPError(400, "Expected a JSON object with one application")
+
+        start = time.perf_counter()
+        self.requests += 1
+        try:
+            result = await self.batcher.submit(record)
+        except MissingFeaturesError as e:
+            raise HTTPError(400, "Application is missing required features", missing=e.missing[0]) from None
+        elapsed = time.perf_counter() - start
+        self.latencies.append(elapsed)
+        metrics.observe("loan_request_seconds", elapsed, route="/predict")
+        return result
+
+    async def _predict_batch(self, body):
+        records = self._parse_json(body)
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            raise HTTPError(400, "Expected a JSON list of applications")
+        if len(records) > MAX_BATCH_RECORDS:
+            raise HTTPError(413, f"At most {MAX_BATCH_RECORDS} applications per batch")
+
+        start = time.perf_counter()
+        self.requests += 1
+        loop = asyncio.get_running_loop()
+        try:
+            predictions = await loop.run_in_executor(self.executor, score_applications, records, self.version,
+                                                     self.cache)
+        except MissingFeaturesError as e:
+            # Keyed on each incomplete application's position in the request
+            raise HTTPError(400, "Applications are missing required features", missing=e.missing) from None
+        metrics.observe("loan_request_seconds", time.perf_counter() - start, route="/predict/batch")
+        return {"predictions": predictions}
+
+    async def _health(self, body):
+        # A version check may reload the model, which must not block the event loop
+        entry = await asyncio.get_running_loop().run_in_executor(self.executor, registry.get, self.version)
+        if entry.model is None:
+            raise HTTPError(503, "Model not loaded")
+        return {"status": "ok", "model_version": entry.fingerprint, "uptime_seconds": time.time() - self.started_at}
+
+    async def _metrics(self, body):
+        latencies = np.asarray(self.latencies) * 1000
+        p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (0.0, 0.0)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "predict_latency_p50_ms": float(p50),
+            "predict_latency_p99_ms": float(p99),
+            "max_batch_size": self.batcher.max_batch_size,
+            "max_wait_ms": self.batcher.max_wait * 1000,
+            **self.batcher.stats(),
+            "prediction_cache": self.cache.stats() if self.cache is not None else None,
+            "instrumentation_enabled": metrics.enabled,
+        }
+
+    async def _prometheus(self, body):
+        return metrics.prometheus_text()
+
+
+async def serve(host, port, max_batch_size, max_wait, instrument=False, drift=False, cache_size=None):
+    if instrument:
+        metrics.enable()
+    if drift:
+        drift_monitor.enable()
+    cache = prediction_cache
+    if cache_size == 0:
+        cache = None
+    elif cache_size is not None:
+        prediction_cache.maxsize = cache_size
+    server = ScoringServer(max_batch_size=max_batch_size, max_wait=max_wait, cache=cache)
+    listener = await server.start(host, port)
+    print(f"✅ Scoring server listening on http://{host}:{port} "
+          f"(max batch {max_batch_size}, max wait {max_wait * 1000:g} ms, "
+          f"prediction cache {cache.maxsize if cache is not None else 'off'}, "
+          f"instrumentation {'on' if metrics.enabled else 'off'}, drift monitoring {'on' if drift_monitor.enabled else 'off'})")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=64, help="Most requests scored in one batch")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0,
+                        help="Longest a request waits for others to join its batch")
+    parser.add_argument("--instrument", action="store_true",
+                        help="Record stage timings and encoding counters for /metrics/prometheus")
+    parser.add_argument("--drift", action="store_true", help="Add scored applications to the drift monitor's histograms")
+    parser.add_argument("--cache-size", type=int, default=prediction_cache.maxsize,
+                        help="Cached predictions for repeated applicant profiles (0 disables the cache)")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_batch_size, args.max_wait_ms / 1000, args.instrument,
+                          args.drift, args.cache_size))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
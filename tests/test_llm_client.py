@@ -0,0 +1,109 @@
+"""
+utils.llm_client against a local stub of the OpenAI-compatible /v1/chat/completions endpoint.
+
+The stub streams a fixed answer as server-sent events, one chunk per event, and counts the
+requests it receives.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("openai")
+
+from utils import llm_client
+from utils.llm_client import ResponseCache, get_client, stream_chat
+
+CHUNKS = ["Loans ", "are ", "approved ", "mostly ", "on ", "CIBIL ", "score."]
+MODEL = "stub-model"
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path != "/v1/chat/completions" or not body.get("stream"):
+            self.send_error(404)
+            return
+        self.server.requests.append(body)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for text in CHUNKS:
+            event = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": body["model"],
+                "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+def test_chunks_stream_in_order(stub_server):
+    server, base_url = stub_server
+    chunks = list(stream_chat("Why was I rejected?", MODEL, "test-key", base_url=base_url, cache=None))
+
+    assert chunks == CHUNKS
+    assert len(server.requests) == 1
+    assert server.requests[0]["messages"][-1] == {"role": "user", "content": "Why was I rejected?"}
+
+def test_repeated_question_is_answered_from_cache(stub_server):
+    server, base_url = stub_server
+    cache = ResponseCache()
+
+    first = "".join(stream_chat("Why was I rejected?", MODEL, "test-key", base_url=base_url, cache=cache))
+    # Same question with different spacing and case
+    second = list(stream_chat("why was  I rejected?", MODEL, "test-key", base_url=base_url, cache=cache))
+
+    assert first == "".join(CHUNKS)
+    assert second == [first]
+    assert len(server.requests) == 1
+    assert cache.hits == 1
+
+def test_cached_answer_is_not_shared_across_endpoints(stub_server):
+    server, base_url = stub_server
+    cache = ResponseCache()
+    cache.put(cache.make_key(MODEL, "Why was I rejected?", llm_client.DEFAULT_SETTINGS), "answer from another endpoint")
+
+    answer = "".join(stream_chat("Why was I rejected?", MODEL, "test-key", base_url=base_url, cache=cache))
+
+    assert answer == "".join(CHUNKS)
+    assert len(server.requests) == 1
+
+def test_get_client_is_shared_per_endpoint_and_key(stub_server):
+    _, base_url = stub_server
+
+    client = get_client("test-key", base_url)
+
+    assert get_client("test-key", base_url) is client
+    assert get_client("other-key", base_url) is not client
+    assert get_client("test-key", base_url + "/") is not client
+
+def test_evicted_client_keeps_streaming(stub_server, monkeypatch):
+    server, base_url = stub_server
+    monkeypatch.setattr(llm_client, "MAX_CLIENTS", 2)
+    monkeypatch.setattr(llm_client, "_clients", llm_client.OrderedDict())
+
+    stream = stream_chat("Why was I rejected?", MODEL, "session-1", base_url=base_url, cache=None)
+    first = next(stream)
+    # Two other sessions push the first session's client out of the pool mid-stream
+    get_client("session-2", base_url)
+    get_client("session-3", base_url)
+
+    assert [first, *stream] == CHUNKS
@@ -0,0 +1,203 @@
+"""
+Fast-start model artifact format.
+
+An artifact is a directory holding one raw .npy file per FlatForest array plus a
+manifest.json with the metadata (classes, feature names, encoder classes, dtypes).
+Arrays are opened with np.load(mmap_mode="r"), so loading is just a few mmap calls
+and worker processes serving the same artifact share its pages through the OS page cache.
+The manifest is written last and atomically; it is the file readers and the model
+registry watch for changes.
+
+Convert the current pickles with:
+    python -m utils.artifacts
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from utils.forest_engine import FlatForest, compile_forest
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+ARRAY_NAMES = ("feature", "threshold", "left", "right", "value", "roots", "cover", "missing_left")
+
+class ArtifactLabelEncoder:
+    """
+    Minimal stand-in for sklearn's LabelEncoder, rebuilt from the classes stored in a manifest.
+    Loading it does not import sklearn.
+    """
+
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes, dtype=object)
+        self._codes = {label: code for code, label in enumerate(self.classes_)}
+
+    def transform(self, values):
+        try:
+            return np.array([self._codes[value] for value in values], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f"y contains previously unseen labels: {e.args[0]!r}") from None
+
+    def inverse_transform(self, codes):
+        return self.classes_.take(np.asarray(codes, dtype=np.int64))
+
+def file_sha256(path):
+    """
+    SHA-256 of a file's content, used to tie an artifact to the pickle it was exported from.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_stat(path):
+    """
+    [mtime_ns, size] of a file; a cheap check that it has not been rewritten.
+    """
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def _to_json_list(values):
+    return [value.item() if isinstance(value, np.generic) else value for value in np.asarray(values).tolist()]
+
+def save_model_artifact(model, label_encoders, directory, source_path=None, metadata=None):
+    """
+    Write a forest model and its label encoders as a memory-mappable artifact directory.
+    If `source_path` (the pickled model) is given, its hash, size and mtime are recorded so stale
+    artifacts can be detected without re-reading the pickle.
+    `metadata` (JSON-serializable) is stored in the manifest as is.
+    """
+    forest = compile_forest(model)
+    if not isinstance(forest, FlatForest):
+        raise TypeError(f"Cannot export {type(model).__name__}; only tree forests are supported.")
+
+    os.makedirs(directory, exist_ok=True)
+    # Compact forests derive their left children on load
+    names = [name for name in ARRAY_NAMES if not (forest.compact and name == "left")]
+    arrays = {name: np.ascontiguousarray(getattr(forest, name)) for name in names}
+
+    # Array files are named by content, so a reader holding the previous manifest never
+    # sees arrays from a newer save
+    digest = hashlib.sha256()
+    for name in names:
+        digest.update(arrays[name].tobytes())
+    generation = digest.hexdigest()[:12]
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "model_type": type(model).__name__,
+        "generation": generation,
+        "source_sha256": file_sha256(source_path) if source_path else None,
+        "source_stat": file_stat(source_path) if source_path else None,
+        "max_depth": forest.max_depth,
+        "value_scale": forest.value_scale,
+        "classes": _to_json_list(forest.classes_),
+        "feature_names": _to_json_list(getattr(forest, "feature_names_in_", [])),
+        "feature_importances": _to_json_list(getattr(forest, "feature_importances_", [])),
+        "label_encoders": {col: _to_json_list(encoder.classes_) for col, encoder in label_encoders.items()},
+        "metadata": metadata,
+        "arrays": {},
+    }
+
+    for name, array in arrays.items():
+        filename = f"{name}-{generation}.npy"
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            np.save(path + ".tmp.npy", array)
+            os.replace(path + ".tmp.npy", path)
+        manifest["arrays"][name] = {"file": filename, "dtype": array.dtype.str, "shape": list(array.shape)}
+
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    with open(manifest_path + ".tmp", "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    # Drop arrays from earlier generations; processes that still map them keep their pages
+    current = {entry["file"] for entry in manifest["arrays"].values()}
+    for filename in os.listdir(directory):
+        if filename.endswith(".npy") and filename not in current:
+            os.remove(os.path.join(directory, filename))
+
+    return manifest_path
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST_NAME)) as manifest_file:
+        return json.load(manifest_file)
+
+# Digests of source files hashed by this process, keyed on (path, mtime_ns, size)
+_source_digests = {}
+
+def _hash_source(source_path):
+    key = (source_path, *file_stat(source_path))
+    if key not in _source_digests:
+        _source_digests[key] = file_sha256(source_path)
+    return _source_digests[key]
+
+def _recorded_source_sha256(manifest, source_path):
+    # The digest recorded at export still holds while the file's size and mtime are unchanged
+    if manifest.get("source_sha256") and manifest.get("source_stat") == file_stat(source_path):
+        return manifest["source_sha256"]
+    return None
+
+def source_sha256(directory, source_path):
+    """
+    SHA-256 of `source_path`, taken from the artifact manifest when the file's size and mtime
+    match the ones recorded at export, and hashed from the file otherwise.
+    """
+    try:
+        recorded = _recorded_source_sha256(read_manifest(directory), source_path)
+    except (OSError, ValueError):
+        recorded = None
+    return recorded or _hash_source(source_path)
+
+def is_artifact_current(directory, source_path):
+    """
+    True if the artifact was exported from the current content of `source_path`.
+    Artifacts without a recorded source, or without a source file to compare against, count as current.
+    The source is only re-hashed if its size or mtime changed since export.
+    """
+    manifest = read_manifest(directory)
+    if not manifest.get("source_sha256") or not os.path.exists(source_path):
+        return True
+    if _recorded_source_sha256(manifest, source_path):
+        return True
+    return _hash_source(source_path) == manifest["source_sha256"]
+
+def load_model_artifact(directory, mmap=True):
+    """
+    Load an artifact directory as (FlatForest, label_encoders).
+    With mmap=True the arrays are read-only memory maps backed by the files.
+    """
+    manifest = read_manifest(directory)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format version: {manifest.get('format_version')}")
+
+    arrays = {}
+    for name, entry in manifest["arrays"].items():
+        array = np.load(os.path.join(directory, entry["file"]), mmap_mode="r" if mmap else None)
+        if array.dtype.str != entry["dtype"] or list(array.shape) != entry["shape"]:
+            raise ValueError(f"Artifact array '{name}' does not match its manifest entry.")
+        arrays[name] = array
+
+    arrays.setdefault("left", None)
+    forest = FlatForest(
+        max_depth=manifest["max_depth"],
+        value_scale=manifest.get("value_scale", 1.0),
+        classes=manifest["classes"],
+        feature_names=manifest["feature_names"] or None,
+        feature_importances=manifest["feature_importances"] or None,
+        **arrays,
+    )
+    label_encoders = {col: ArtifactLabelEncoder(classes) for col, classes in manifest["label_encoders"].items()}
+    return forest, label_encoders
+
+if __name__ == "__main__":
+    from utils.model_utils import ENCODER_PATH, MODEL_ARTIFACT_DIR, MODEL_PATH, load_pickled_model_and_encoders
+
+    model, label_encoders = load_pickled_model_and_encoders(MODEL_PATH, ENCODER_PATH)
+    if model is None:
+        raise SystemExit("No pickled model to convert. Run model_training.py first.")
+    save_model_artifact(model, label_encoders, MODEL_ARTIFACT_DIR, source_path=MODEL_PATH)
+    print(f"✅ Model artifact written to {MODEL_ARTIFACT_DIR}")
@@ -0,0 +1,157 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.model_utils import DATA_PATH, _batch_to_frame, approval_class_index, preprocess_batch, registry
+
+# Attributes audited as-is (each distinct value is a group)
+CATEGORICAL_GROUPS = ["education", "self_employed", "no_of_dependents"]
+
+# Continuous attributes audited by quantile bin
+BINNED_GROUPS = [
+    "income_annum",
+    "residential_assets_value",
+    "commercial_assets_value",
+    "luxury_assets_value",
+    "bank_asset_value",
+]
+
+TARGET_COLUMN = "loan_status"
+APPROVED_LABEL = "Approved"
+
+# Disparate impact below this ratio fails the "four-fifths rule"
+DISPARATE_IMPACT_THRESHOLD = 0.8
+
+# Audits kept in memory, keyed on (model fingerprint, dataset signature, settings)
+MAX_CACHED_AUDITS = 8
+_audit_cache = OrderedDict()
+_audit_lock = threading.Lock()
+
+def _group_codes(values, n_bins=None):
+    """
+    Map a column to integer group codes and group labels in one vectorized pass.
+    """
+    if n_bins:
+        numeric = pd.to_numeric(values, errors="coerce")
+        binned = pd.qcut(numeric, q=n_bins, duplicates="drop")
+        codes = binned.cat.codes.to_numpy()
+        labels = [f"{interval.left:,.0f} – {interval.right:,.0f}" for interval in binned.cat.categories]
+        return codes, labels
+
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes, [str(label) for label in uniques]
+
+def _safe_divide(numerator, denominator):
+    result = np.full(len(numerator), np.nan)
+    np.divide(numerator, denominator, out=result, where=np.asarray(denominator) > 0)
+    return result
+
+def _group_metrics(codes, labels, predicted, probability, actual):
+    """
+    Per-group counts and rates via bincount; rows with a missing group code (-1) are ignored.
+    """
+    valid = codes >= 0
+    codes = codes[valid]
+    n_groups = len(labels)
+
+    count = np.bincount(codes, minlength=n_groups)
+    predicted_approvals = np.bincount(codes, weights=predicted[valid], minlength=n_groups)
+    probability_sum = np.bincount(codes, weights=probability[valid], minlength=n_groups)
+
+    metrics = pd.DataFrame({
+        "group": labels,
+        "count": count,
+        "approval_rate": _safe_divide(predicted_approvals, count),
+        "mean_approval_probability": _safe_divide(probability_sum, count),
+    })
+
+    if actual is not None:
+        actual = actual[valid]
+        actual_approvals = np.bincount(codes, weights=actual, minlength=n_groups)
+        true_positives = np.bincount(codes, weights=predicted[valid] * actual, minlength=n_groups)
+        metrics["actual_approval_rate"] = _safe_divide(actual_approvals, count)
+        # Equal opportunity: approval rate among applicants who were actually approved
+        metrics["true_positive_rate"] = _safe_divide(true_positives, actual_approvals)
+        # Calibration: predicted probability minus observed approval rate
+        metrics["calibration_gap"] = metrics["mean_approval_probability"] - metrics["actual_approval_rate"]
+
+    return metrics
+
+def _summarize(metrics):
+    rates = metrics["approval_rate"].dropna()
+    summary = {
+        "demographic_parity_difference": float(rates.max() - rates.min()) if len(rates) else np.nan,
+        "disparate_impact_ratio": float(rates.min() / rates.max()) if len(rates) and rates.max() > 0 else np.nan,
+        "most_favoured_group": metrics.loc[rates.idxmax(), "group"] if len(rates) else None,
+        "least_favoured_group": metrics.loc[rates.idxmin(), "group"] if len(rates) else None,
+    }
+    if "true_positive_rate" in metrics:
+        tpr = metrics["true_positive_rate"].dropna()
+        summary["equal_opportunity_difference"] = float(tpr.max() - tpr.min()) if len(tpr) else np.nan
+        summary["max_calibration_gap"] = float(metrics["calibration_gap"].abs().max())
+    summary["passes_four_fifths_rule"] = bool(summary["disparate_impact_ratio"] >= DISPARATE_IMPACT_THRESHOLD)
+    return summary
+
+def audit_bias(model, label_encoders, data, categorical_groups=CATEGORICAL_GROUPS,
+               binned_groups=BINNED_GROUPS, n_bins=4):
+    """
+    Score the whole dataset once and compute fairness metrics for every audited attribute.
+    Returns {attribute: {"groups": DataFrame of per-group metrics, "summary": dict}}.
+    """
+    df = _batch_to_frame(data)
+
+    features = preprocess_batch(df, label_encoders, feature_names=getattr(model, "feature_names_in_", None))
+    proba = model.predict_proba(features)
+    approval_index = approval_class_index(model)
+    predicted = (proba.argmax(axis=1) == approval_index).astype(np.float64)
+    probability = proba[:, approval_index]
+
+    actual = None
+    if TARGET_COLUMN in df.columns:
+        actual = (df[TARGET_COLUMN].astype(str).str.strip() == APPROVED_LABEL).to_numpy(dtype=np.float64)
+
+    report = {}
+    for column, bins in [(col, None) for col in categorical_groups] + [(col, n_bins) for col in binned_groups]:
+        if column not in df.columns:
+            continue
+        codes, labels = _group_codes(df[column], n_bins=bins)
+        metrics = _group_metrics(codes, labels, predicted, probability, actual)
+        report[column] = {"groups": metrics, "summary": _summarize(metrics)}
+    return report
+
+def summary_table(report):
+    """
+    One row per audited attribute with its headline fairness metrics.
+    """
+    return pd.DataFrame([{"attribute": column, **result["summary"]} for column, result in report.items()])
+
+def _dataset_signature(path):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+def cached_bias_audit(version="default", data_path=DATA_PATH, n_bins=4):
+    """
+    Run audit_bias on a dataset file, cached on the model fingerprint and the file's mtime/size,
+    so repeated requests for the same model and data return immediately.
+    """
+    entry = registry.get(version)
+    if entry.model is None:
+        raise RuntimeError("Model not loaded. Check if the model file exists.")
+
+    key = (entry.fingerprint, _dataset_signature(data_path), n_bins)
+    with _audit_lock:
+        if key in _audit_cache:
+            _audit_cache.move_to_end(key)
+            return _audit_cache[key]
+
+    data = pd.read_csv(data_path, skipinitialspace=True)
+    report = audit_bias(entry.model, entry.label_encoders, data, n_bins=n_bins)
+
+    with _audit_lock:
+        _audit_cache[key] = report
+        while len(_audit_cache) > MAX_CACHED_AUDITS:
+            _audit_cache.popitem(last=False)
+    return report
@@ -0,0 +1,356 @@
+"""
+Post-training compression of the served forest.
+
+Each step is kept only while cross-validated accuracy on a selection set stays within `tolerance`
+of the full forest:
+  1. Tree subset: trees are ordered greedily, each one chosen because it raises the accuracy of
+     the trees before it the most (ordered aggregation). The shortest prefix from which every longer
+     prefix is accurate enough is kept. Orders are fitted on all but one fold and scored on the
+     remaining one, so a prefix is not credited for fitting the rows it is scored on.
+  2. Depth cap: the smallest maximum depth from which every deeper cap is accurate enough. Nodes
+     at the cap become leaves that predict the class distribution of the training samples that
+     reached them.
+  3. Compact layout: nodes are renumbered in depth-first preorder, so an internal node's left
+     child is the next node and only right children are stored. Features are stored as uint8 and
+     thresholds as float32, rounded down, which keeps every float32 split decision. Class
+     probabilities are stored as uint16.
+Trees are selected on one half of the held-out split and the report is scored on the other half.
+The compressed FlatForest replaces the serving artifact only if its accuracy on that other half is
+within `tolerance` of the full forest; the pickled sklearn model is unchanged.
+
+Compress the current model (permutation importance is recomputed for the new artifact) with:
+    python -m utils.compression --tolerance 0.005
+"""
+import argparse
+import json
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+from utils.artifacts import load_model_artifact, save_model_artifact
+from utils.forest_engine import FlatForest, compile_forest
+from utils.importance import IMPORTANCE_PATH, compute_and_save_importance, load_holdout
+from utils.model_utils import (ENCODER_PATH, HOLDOUT_PATH, MODEL_ARTIFACT_DIR, MODEL_PATH,
+                               load_pickled_model_and_encoders)
+
+COMPRESSION_REPORT_PATH = "assets/data/compression_report.json"
+
+# Largest drop in accuracy a compression step may cause, and the compressed forest may show
+# on the evaluation half before it is rejected
+DEFAULT_TOLERANCE = 0.005
+
+# Cross-validation folds of the selection set
+SELECTION_FOLDS = 5
+
+# Fewest trees the search keeps: a handful of trees already matches the forest's accuracy, but
+# probabilities (used for thresholds and counterfactuals) stay coarse below about ten
+MIN_TREES = 10
+
+# Leaf probabilities are stored as multiples of 1 / PROBABILITY_LEVELS
+PROBABILITY_LEVELS = np.iinfo(np.uint16).max
+
+# Rows timed for the single-row latency column of the report
+LATENCY_SAMPLE_ROWS = 500
+
+def round_down_float32(thresholds):
+    """
+    Largest float32 at or below each threshold. For float32 features x, x <= t exactly when
+    x <= round_down_float32(t), so no split decision changes.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    rounded = thresholds.astype(np.float32)
+    too_high = rounded.astype(np.float64) > thresholds
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+def _class_codes(forest, y):
+    codes = pd.Index(forest.classes_).get_indexer(np.asarray(y))
+    if (codes < 0).any():
+        raise ValueError("Labels contain classes the forest does not predict.")
+    return codes
+
+def accuracy(forest, X, y):
+    return float(np.mean(forest.predict(X) == np.asarray(y)))
+
+def order_trees(forest, X, y):
+    """
+    Greedy ordered aggregation. Returns (tree order, accuracy of each prefix of that order).
+    Ties between trees are broken by the probability they add to the true classes.
+    """
+    codes = _class_codes(forest, y)
+    rows = np.arange(len(codes))
+    per_tree = forest.value.take(forest._leaf_indices(X), axis=0) * forest.value_scale
+
+    total = np.zeros(per_tree.shape[1:], dtype=np.float64)
+    remaining = list(range(forest.n_estimators))
+    order, accuracies = [], []
+    while remaining:
+        candidates = total[np.newaxis] + per_tree[remaining]
+        correct = (candidates.argmax(axis=2) == codes).sum(axis=1)
+        margin = candidates[:, rows, codes].sum(axis=1)
+        best = int(np.lexsort((-margin, -correct))[0])
+        tree = remaining.pop(best)
+        total += per_tree[tree]
+        order.append(tree)
+        accuracies.append(correct[best] / len(codes))
+    return order, np.asarray(accuracies)
+
+def prefix_correct(forest, order, X, y):
+    """
+    Number of rows of (X, y) each prefix of the tree order predicts correctly.
+    """
+    codes = _class_codes(forest, y)
+    per_tree = forest.value.take(forest._leaf_indices(X), axis=0) * forest.value_scale
+    totals = np.cumsum(per_tree[order], axis=0)
+    return (totals.argmax(axis=2) == codes).sum(axis=1)
+
+def smallest_stable(accuracies, target):
+    """
+    Smallest 1-based position from which every accuracy reaches `target`. Taking the first
+    position that reaches it would favour a lucky fluctuation on a small selection set.
+    """
+    below = np.flatnonzero(np.asarray(accuracies) < target)
+    return int(below[-1]) + 2 if len(below) else 1
+
+def compact_forest(forest, trees, max_depth=None):
+    """
+    New FlatForest with only `trees` (indices into forest.roots), cut at max_depth, in the
+    compact layout with uint8 features, float32 thresholds and uint16 probabilities.
+    """
+    is_leaf = forest._is_leaf
+    order, leaf, right_of, roots = [], [], {}, []
+    deepest = 0
+    for tree in trees:
+        roots.append(len(order))
+        # (node, depth, new index of the parent if this is a right child)
+        stack = [(int(forest.roots[tree]), 0, None)]
+        while stack:
+            node, depth, parent = stack.pop()
+            position = len(order)
+            order.append(node)
+            if parent is not None:
+                right_of[parent] = position
+            deepest = max(deepest, depth)
+            is_cut = is_leaf[node] or (max_depth is not None and depth >= max_depth)
+            leaf.append(is_cut)
+            if not is_cut:
+                # Pushed last, so the left child is visited next and lands at position + 1
+                stack.append((int(forest.right[node]), depth + 1, position))
+                stack.append((int(forest.left[node]), depth + 1, None))
+
+    order = np.asarray(order, dtype=np.int64)
+    leaf = np.asarray(leaf, dtype=bool)
+    node_ids = np.arange(len(order), dtype=np.int32)
+    right = node_ids.copy()
+    internal = np.flatnonzero(~leaf)
+    right[internal] = [right_of[position] for position in internal]
+
+    n_features = forest.n_features_in_
+    feature_dtype = np.uint8 if n_features <= 256 else np.int32
+    probabilities = forest.value.take(order, axis=0) * forest.value_scale
+    value = np.rint(probabilities * PROBABILITY_LEVELS).astype(np.uint16)
+
+    return FlatForest(
+        feature=np.where(leaf, 0, forest.feature.take(order)).astype(feature_dtype),
+        threshold=np.where(leaf, np.float32(0), round_down_float32(forest.threshold.take(order))),
+        left=None,
+        right=right,
+        value=value,
+        value_scale=1.0 / PROBABILITY_LEVELS,
+        roots=np.asarray(roots, dtype=np.int32),
+        max_depth=deepest,
+        classes=forest.classes_,
+        cover=None if forest.cover is None else forest.cover.take(order).astype(np.float32),
+        missing_left=forest.missing_left.take(order) & ~leaf,
+        feature_names=getattr(forest, "feature_names_in_", None),
+        feature_importances=getattr(forest, "feature_importances_", None),
+    )
+
+def compress_forest(model, X_select, y_select, tolerance=DEFAULT_TOLERANCE, n_trees=None, max_depth=None,
+                    folds=SELECTION_FOLDS, random_state=42):
+    """
+    Compress a forest against a selection set. `n_trees` and `max_depth` override the search.
+    Returns (compact FlatForest, settings dict).
+    """
+    forest = compile_forest(model)
+    if not isinstance(forest, FlatForest):
+        raise TypeError(f"Cannot compress {type(model).__name__}; only tree forests are supported.")
+    X_select = np.asarray(X_select, dtype=np.float64)
+    y_select = np.asarray(y_select)
+    target = accuracy(forest, X_select, y_select) - tolerance
+
+    splitter = StratifiedKFold(folds, shuffle=True, random_state=random_state)
+    fold_orders = [(order_trees(forest, X_select[train], y_select[train])[0], test)
+                   for train, test in splitter.split(X_select, y_select)]
+
+    if n_trees is None:
+        correct = sum(prefix_correct(forest, order, X_select[test], y_select[test]) for order, test in fold_orders)
+        n_trees = min(smallest_stable(correct / len(y_select), target), forest.n_estimators)
+        n_trees = max(n_trees, min(MIN_TREES, forest.n_estimators))
+
+    cv_accuracies = {}
+    def cv_accuracy(depth):
+        if depth not in cv_accuracies:
+            correct = 0
+            for order, test in fold_orders:
+                fold_forest = compact_forest(forest, sorted(order[:n_trees]), depth)
+                correct += int(np.sum(fold_forest.predict(X_select[test]) == y_select[test]))
+            cv_accuracies[depth] = correct / len(y_select)
+        return cv_accuracies[depth]
+
+    if max_depth is None:
+        depths = range(1, forest.max_depth + 1)
+        max_depth = min(smallest_stable([cv_accuracy(depth) for depth in depths], target), forest.max_depth)
+
+    order, _ = order_trees(forest, X_select, y_select)
+    trees = sorted(order[:n_trees])
+    compressed = compact_forest(forest, trees, max_depth)
+
+    settings = {
+        "tolerance": tolerance,
+        "trees": len(trees),
+        "original_trees": forest.n_estimators,
+        "max_depth": compressed.max_depth,
+        "original_max_depth": forest.max_depth,
+        "selection_rows": len(y_select),
+        "selection_folds": folds,
+        "selection_accuracy_original": accuracy(forest, X_select, y_select),
+        "selection_accuracy": cv_accuracy(max_depth),
+    }
+    return compressed, settings
+
+def _directory_bytes(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+def _median_ms(func, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+def _serving_stats(forest, X, y, reference_proba):
+    X = np.asarray(X, dtype=np.float64)
+    timings = []
+    for row in X[:LATENCY_SAMPLE_ROWS]:
+        start = time.perf_counter()
+        forest.predict_proba(row[np.newaxis, :])
+        timings.append(time.perf_counter() - start)
+    batch = np.tile(X, (max(1, 10_000 // len(X)), 1))
+    batch_seconds = _median_ms(lambda: forest.predict_proba(batch), repeats=3) / 1000
+
+    proba = forest.predict_proba(X)
+    return {
+        "single_row_us": float(np.median(timings) * 1e6),
+        "batch_rows_per_sec": len(batch) / batch_seconds,
+        "accuracy": accuracy(forest, X, y),
+        "agreement": float(np.mean(proba.argmax(axis=1) == reference_proba.argmax(axis=1))),
+        "max_proba_change": float(np.abs(proba - reference_proba).max()),
+    }
+
+def compression_report(model, compressed, label_encoders, X_eval, y_eval):
+    """
+    Size, load time, latency and accuracy of the original model and the compressed forest.
+    Artifacts are written to temporary directories to measure their size and load time.
+    Returns a DataFrame with one row per model and a "change" row: relative for sizes and
+    timings, absolute for accuracy, agreement and probability change.
+    """
+    original = compile_forest(model)
+    reference = original.predict_proba(np.asarray(X_eval, dtype=np.float64))
+    pickled = pickle.dumps(model)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, forest in (("original", original), ("compressed", compressed)):
+            directory = os.path.join(tmp, name)
+            save_model_artifact(forest, label_encoders, directory)
+            rows.append({
+                "model": name,
+                "trees": forest.n_estimators,
+                "nodes": forest.n_nodes,
+                "max_depth": forest.max_depth,
+                "artifact_bytes": _directory_bytes(directory),
+                "artifact_load_ms": _median_ms(lambda: load_model_artifact(directory, mmap=False)),
+                **_serving_stats(forest, X_eval, y_eval, reference),
+            })
+    rows[0].update(pickle_bytes=len(pickled), pickle_load_ms=_median_ms(lambda: pickle.loads(pickled)))
+
+    report = pd.DataFrame(rows).set_index("model")
+    original, compressed = report.loc["original"], report.loc["compressed"]
+    change = compressed / original - 1
+    absolute = ["accuracy", "agreement", "max_proba_change"]
+    change[absolute] = compressed[absolute] - original[absolute]
+    report.loc["change"] = change
+    return report.reset_index()
+
+def compress_and_save(model, label_encoders, X_holdout, y_holdout, tolerance=DEFAULT_TOLERANCE, n_trees=None,
+                      max_depth=None, artifact_dir=MODEL_ARTIFACT_DIR, source_path=MODEL_PATH,
+                      report_path=COMPRESSION_REPORT_PATH, random_state=42):
+    """
+    Compress `model` using half of the held-out rows and score it on the other half. It is
+    written as the serving artifact only if it loses at most `tolerance` accuracy there;
+    otherwise the current artifact is kept. Returns (report DataFrame, settings), with
+    settings["saved"] telling which happened.
+    """
+    X_select, X_eval, y_select, y_eval = train_test_split(X_holdout, y_holdout, test_size=0.5,
+                                                          stratify=y_holdout, random_state=random_state)
+    compressed, settings = compress_forest(model, X_select, y_select, tolerance, n_trees, max_depth,
+                                           random_state=random_state)
+    report = compression_report(model, compressed, label_encoders, X_eval, y_eval)
+
+    accuracy_drop = -float(report.set_index("model").loc["change", "accuracy"])
+    settings["evaluation_accuracy_drop"] = accuracy_drop
+    # Small slack so a drop of exactly `tolerance` is not rejected by rounding
+    settings["saved"] = accuracy_drop <= tolerance + 1e-9
+    if settings["saved"]:
+        save_model_artifact(compressed, label_encoders, artifact_dir, source_path=source_path,
+                            metadata={"compression": settings})
+    else:
+        print(f"⚠️ Warning: Compressed forest loses {accuracy_drop:.2%} accuracy on the evaluation half, more than "
+              f"the tolerance of {tolerance:.2%}. Keeping the current artifact in {artifact_dir}.")
+    with open(report_path + ".tmp", "w") as report_file:
+        json.dump({"settings": settings, "report": report.to_dict("records")}, report_file, indent=2)
+    os.replace(report_path + ".tmp", report_path)
+    return report, settings
+
+def print_report(report, settings):
+    print(report.to_string(index=False, float_format="%.4g"))
+    print(f"Kept {settings['trees']} of {settings['original_trees']} trees, max depth {settings['max_depth']} "
+          f"(was {settings['original_max_depth']}); cross-validated selection accuracy "
+          f"{settings['selection_accuracy']:.4f} vs {settings['selection_accuracy_original']:.4f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Largest accuracy drop allowed per step and on the evaluation half")
+    parser.add_argument("--trees", type=int, default=None, help="Keep exactly this many trees")
+    parser.add_argument("--max-depth", type=int, default=None, help="Cut trees at exactly this depth")
+    args = parser.parse_args()
+
+    model, label_encoders = load_pickled_model_and_encoders(MODEL_PATH, ENCODER_PATH)
+    if model is None:
+        raise SystemExit("No pickled model to compress. Run model_training.py first.")
+    X_holdout, y_holdout = load_holdout(label_encoders, list(model.feature_names_in_), HOLDOUT_PATH)
+    options = {"tolerance": args.tolerance, "n_trees": args.trees, "max_depth": args.max_depth}
+    report, settings = compress_and_save(model, label_encoders, X_holdout, y_holdout, **options)
+
+    # Recorded in the training manifest so `model_training.py --incremental` compresses the same way
+    from utils.incremental_training import load_manifest, save_manifest
+    manifest = load_manifest()
+    if manifest is not None:
+        manifest["compression"] = options
+        save_manifest(manifest)
+    print_report(report, settings)
+    if settings["saved"]:
+        # The new artifact changes the model fingerprint, which permutation importance is tagged with
+        compute_and_save_importance()
+        print(f"✅ Compressed artifact written to {MODEL_ARTIFACT_DIR}, report saved to {COMPRESSION_REPORT_PATH}, "
+              f"permutation importance recomputed in {IMPORTANCE_PATH}")
+    else:
+        print(f"Report saved to {COMPRESSION_REPORT_PATH}")
@@ -0,0 +1,270 @@
+"""
+Counterfactual search: the smallest change to actionable features that turns a rejection
+into an approval.
+
+A forest's prediction can only change when a feature crosses one of its split thresholds.
+So for each actionable feature, the thresholds cut its range into regions with identical
+predictions, and the candidate values are the point of each region closest to the
+applicant's current value. Candidates are scored in vectorized predict calls, thousands of
+rows per call, in three stages: one feature changed, then pairs, then triples. Candidate rows
+that cannot beat the best change found so far are dropped before predicting, and the search
+stops at its time budget with the best change found so far.
+
+Cost of a change = sum over changed features of |new - old| / (training range of the feature),
+plus SPARSITY_PENALTY per changed feature, so fewer edits win among similar changes.
+
+Find changes for every rejected application in a CSV with:
+    python -m utils.counterfactuals applications.csv counterfactuals.csv --time-budget 0.5
+"""
+import argparse
+import itertools
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.model_utils import (DEFAULT_VERSION, _batch_to_frame, approval_class_index, get_preprocessing_plan,
+                               preprocess_batch, preprocess_input, registry)
+
+# Features an applicant can act on, and the direction each may move
+MUTABLE_FEATURES = {"loan_amount": "decrease", "loan_term": "any", "cibil_score": "increase"}
+
+SPARSITY_PENALTY = 0.01
+DEFAULT_TIME_BUDGET = 0.5
+
+# Rows scored per predict call
+MAX_ROWS_PER_CALL = 20_000
+
+# Candidate values kept per feature when features are combined (nearest ones plus an even spread)
+COMBINATION_CANDIDATES = {2: 60, 3: 16}
+NEAREST_CANDIDATES = 8
+
+class CounterfactualGenerator:
+    """
+    Counterfactual search over one forest, with split thresholds and cost scales indexed up front.
+    """
+
+    def __init__(self, forest, plan, mutable_features=MUTABLE_FEATURES):
+        self.forest = forest
+        self.plan = plan
+        self.feature_names = plan.feature_names
+        self.approval_index = approval_class_index(forest)
+
+        internal = ~forest._is_leaf
+        split_features = np.asarray(forest.feature)[internal]
+        split_thresholds = np.asarray(forest.threshold)[internal]
+
+        self.mutable = []
+        for name, direction in mutable_features.items():
+            if name not in self.feature_names:
+                continue
+            position = self.feature_names.index(name)
+            spec = plan.features[position]
+            low, high = spec.get("min", -np.inf), spec.get("max", np.inf)
+            span = high - low if np.isfinite(high - low) and high > low else 1.0
+            thresholds = np.unique(split_thresholds[split_features == position])
+            lower_ends, upper_ends = self._region_ends(thresholds, spec.get("integer", False))
+            self.mutable.append({
+                "name": name,
+                "position": position,
+                "direction": direction,
+                "low": low,
+                "high": high,
+                "scale": 1.0 / span,
+                "thresholds": thresholds,
+                "lower_ends": lower_ends,
+                "upper_ends": upper_ends,
+            })
+
+    @staticmethod
+    def _region_ends(thresholds, integer):
+        """
+        Region r holds values in (thresholds[r-1], thresholds[r]]. Returns the smallest and
+        largest value in each region (NaN for empty regions), as seen by float32 comparisons.
+        """
+        bounds = np.concatenate([[-np.inf], thresholds, [np.inf]])
+        if integer:
+            lower = np.floor(bounds[:-1]) + 1
+            upper = np.floor(bounds[1:])
+        else:
+            lower = np.nextafter(bounds[:-1].astype(np.float32), np.float32(np.inf)).astype(np.float64)
+            upper = bounds[1:].astype(np.float32).astype(np.float64)
+            # Rounding to float32 can land on the wrong side of a float64 threshold
+            upper = np.where(upper > bounds[1:], np.nextafter(upper.astype(np.float32), np.float32(-np.inf)), upper)
+        empty = lower > upper
+        return np.where(empty, np.nan, lower), np.where(empty, np.nan, upper)
+
+    def candidate_values(self, feature, value):
+        """
+        Closest value to `value` in every other region of the feature, allowed by its direction
+        and training range, sorted by distance.
+        """
+        region = int(np.searchsorted(feature["thresholds"], value, side="left"))
+        below = feature["upper_ends"][:region] if feature["direction"] != "increase" else np.empty(0)
+        above = feature["lower_ends"][region + 1:] if feature["direction"] != "decrease" else np.empty(0)
+        values = np.concatenate([below, above])
+        values = values[~np.isnan(values) & (values >= feature["low"]) & (values <= feature["high"])]
+        return values[np.argsort(np.abs(values - value), kind="stable")]
+
+    @staticmethod
+    def _thin(values, keep):
+        if len(values) <= keep:
+            return values
+        nearest = values[:NEAREST_CANDIDATES]
+        spread = values[np.linspace(0, len(values) - 1, keep - NEAREST_CANDIDATES).round().astype(int)]
+        return np.unique(np.concatenate([nearest, spread]))
+
+    def _score(self, row, combos, best_cost):
+        """
+        Score candidate blocks [(features, value grid)] and return the cheapest approved
+        (cost, changed row, probability), or None. Returns how many rows were predicted too.
+        """
+        rows, costs = [], []
+        for features, grid in combos:
+            cost = SPARSITY_PENALTY * len(features)
+            for feature, column in zip(features, grid.T):
+                cost = cost + np.abs(column - row[feature["position"]]) * feature["scale"]
+            keep = cost < best_cost
+            if not keep.any():
+                continue
+            block = np.repeat(row[np.newaxis, :], int(keep.sum()), axis=0)
+            for feature, column in zip(features, grid.T):
+                block[:, feature["position"]] = column[keep]
+            rows.append(block)
+            costs.append(cost[keep])
+        if not rows:
+            return None, 0
+
+        rows, costs = np.concatenate(rows), np.concatenate(costs)
+        best = None
+        for start in range(0, len(rows), MAX_ROWS_PER_CALL):
+            chunk = rows[start:start + MAX_ROWS_PER_CALL]
+            proba = self.forest.predict_proba(chunk)
+            approved = np.flatnonzero(proba.argmax(axis=1) == self.approval_index)
+            if len(approved):
+                winner = approved[np.argmin(costs[start + approved])]
+                cost = costs[start + winner]
+                if best is None or cost < best[0]:
+                    best = (float(cost), chunk[winner], float(proba[winner, self.approval_index]))
+        return best, len(rows)
+
+    def search(self, row, time_budget=DEFAULT_TIME_BUDGET):
+        """
+        Cheapest approved change to one encoded row (1-D array).
+        Returns a dict with status ("already_approved", "found" or "not_found"), the changes,
+        approval probabilities before and after, cost, rows evaluated and elapsed seconds.
+        """
+        start = time.perf_counter()
+        row = np.asarray(row, dtype=np.float64)
+        proba = self.forest.predict_proba(row[np.newaxis, :])[0]
+        probability = float(proba[self.approval_index])
+        result = {"status": "already_approved", "approval_probability": probability,
+                  "counterfactual_probability": probability, "changes": [], "cost": 0.0,
+                  "rows_evaluated": 0, "budget_exhausted": False}
+        if proba.argmax() == self.approval_index:
+            result["seconds"] = time.perf_counter() - start
+            return result
+
+        candidates = [(feature, self.candidate_values(feature, row[feature["position"]])) for feature in self.mutable]
+        candidates = [(feature, values) for feature, values in candidates if len(values)]
+        best = None
+        best_cost = np.inf
+
+        for size in range(1, len(candidates) + 1):
+            if time.perf_counter() - start > time_budget:
+                result["budget_exhausted"] = True
+                break
+            combos = []
+            for subset in itertools.combinations(candidates, size):
+                features = [feature for feature, _ in subset]
+                values = [values if size == 1 else self._thin(values, COMBINATION_CANDIDATES.get(size, 8))
+                          for _, values in subset]
+                grid = np.stack(np.meshgrid(*values, indexing="ij"), axis=-1).reshape(-1, size)
+                combos.append((features, grid))
+            found, evaluated = self._score(row, combos, best_cost)
+            result["rows_evaluated"] += evaluated
+            if found is not None:
+                best = found
+                best_cost = found[0]
+
+        if best is None:
+            result["status"] = "not_found"
+        else:
+            cost, changed, changed_probability = best
+            result.update(status="found", cost=cost, counterfactual_probability=changed_probability, changes=[
+                {"feature": self.feature_names[position], "from": float(row[position]), "to": float(changed[position])}
+                for position in np.flatnonzero(changed != row)
+            ])
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+_generators = {}
+_generators_lock = threading.Lock()
+
+def get_counterfactual_generator(version=DEFAULT_VERSION):
+    """
+    CounterfactualGenerator for a registered model version, rebuilt only when the model fingerprint changes.
+    """
+    entry = registry.get(version)
+    with _generators_lock:
+        cached = _generators.get(version)
+        if cached is None or cached[0] != entry.fingerprint:
+            cached = (entry.fingerprint, CounterfactualGenerator(entry.fast_model, get_preprocessing_plan(version)))
+            _generators[version] = cached
+        return cached[1]
+
+def find_counterfactual(application, version=DEFAULT_VERSION, time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Smallest actionable change that gets one application (a dict of raw fields) approved.
+    """
+    features = preprocess_input(application, version=version)
+    return get_counterfactual_generator(version).search(features[0], time_budget=time_budget)
+
+def describe_changes(changes):
+    return "; ".join(f"{change['feature']}: {change['from']:,.0f} → {change['to']:,.0f}" for change in changes)
+
+def find_counterfactuals_batch(data, version=DEFAULT_VERSION, time_budget=DEFAULT_TIME_BUDGET, id_column="loan_id"):
+    """
+    Counterfactuals for every application the model rejects in a batch, each within `time_budget` seconds.
+    Returns one row per rejected application.
+    """
+    entry = registry.get(version)
+    generator = get_counterfactual_generator(version)
+    df = _batch_to_frame(data)
+    features = preprocess_batch(df, entry.label_encoders, feature_names=generator.feature_names)
+    if len(features) == 0:
+        return pd.DataFrame()
+    rejected = np.flatnonzero(generator.forest.predict_proba(features).argmax(axis=1) != generator.approval_index)
+
+    rows = []
+    for index in rejected:
+        result = generator.search(features[index], time_budget=time_budget)
+        changed = {f"new_{change['feature']}": change["to"] for change in result["changes"]}
+        rows.append({
+            **({id_column: df[id_column].iloc[index]} if id_column in df.columns else {"row": int(index)}),
+            "status": result["status"],
+            "approval_probability": result["approval_probability"],
+            "counterfactual_probability": result["counterfactual_probability"],
+            "cost": result["cost"],
+            "changes": describe_changes(result["changes"]),
+            **changed,
+            "rows_evaluated": result["rows_evaluated"],
+            "seconds": result["seconds"],
+            "budget_exhausted": result["budget_exhausted"],
+        })
+    return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the smallest approved change for every rejected application.")
+    parser.add_argument("input", help="Applications CSV shaped like assets/data/loan_data.csv")
+    parser.add_argument("output", help="Output CSV, one row per rejected application")
+    parser.add_argument("--time-budget", type=float, default=DEFAULT_TIME_BUDGET, help="Seconds per application")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = find_counterfactuals_batch(pd.read_csv(args.input, skipinitialspace=True), time_budget=args.time_budget)
+    report.to_csv(args.output, index=False)
+    found = int((report["status"] == "found").sum()) if len(report) else 0
+    print(f"✅ {found:,} of {len(report):,} rejected applications have a counterfactual "
+          f"({time.perf_counter() - start:.1f}s), saved to {args.output}")
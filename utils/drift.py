@@ -0,0 +1,474 @@
+"""
+Data drift monitoring over scored applications.
+
+The reference is the training data (assets/data/loan_data.csv), encoded like serving encodes
+requests. Each feature gets fixed bin edges: 20 training quantiles for numeric features and
+one bin per category for categorical ones. Scored batches are then added to the histograms
+of the current window (one per UTC day), together with count, sum, sum of squares, min and max.
+No rows are stored, and a window costs O(features x bins) however many applications it covers.
+
+Drift of a window against the reference is computed from the bin counts alone, in O(bins) per feature:
+  - PSI (population stability index): below 0.1 is stable, 0.1 to 0.25 is a moderate shift,
+    above 0.25 a significant one.
+  - KS: the largest gap between the two binned CDFs. It is a lower bound of the exact KS statistic
+    on the raw values and is compared with the 5% critical value for the two sample sizes.
+
+Monitoring is off by default. Set LOAN_DRIFT=1 (or call `drift_monitor.enable()`) to record the
+batches scored by this process; windows are merged into assets/data/drift_state.json every minute
+and at exit. Check the latest window, exiting with status 1 when retraining is recommended:
+    python -m utils.drift --check || python model_training.py
+"""
+import argparse
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from utils.artifacts import file_sha256
+
+try:
+    import fcntl
+except ImportError:  # fcntl is POSIX-only; state file updates are then not locked across processes
+    fcntl = None
+
+DRIFT_STATE_PATH = "assets/data/drift_state.json"
+REFERENCE_DATA_PATH = "assets/data/loan_data.csv"
+FEATURE_SCHEMA_PATH = "assets/data/feature_schema.json"
+STATE_VERSION = 1
+
+# Quantile bins per numeric feature
+REFERENCE_BINS = 20
+
+# PSI thresholds: stable below PSI_WARNING, significant shift at or above PSI_ALERT
+PSI_WARNING = 0.1
+PSI_ALERT = 0.25
+
+# Empty bins are counted as this share, so PSI stays finite
+PROPORTION_FLOOR = 1e-4
+
+# c(alpha) of the two-sample KS test at alpha = 0.05
+KS_CRITICAL_COEFFICIENT = 1.358
+
+# Windows smaller than this are shown but do not trigger retraining
+MIN_WINDOW_ROWS = 100
+
+# Most recent windows kept in the state file
+MAX_WINDOWS = 180
+
+# Rows compared against the bin edges at once; bounds the temporary (rows x features x bins) array
+UPDATE_CHUNK_ROWS = 4096
+
+# Seconds between merges of this process's windows into the state file
+DEFAULT_FLUSH_SECONDS = 60
+
+class FeatureSketch:
+    """
+    Histograms over fixed bin edges, plus count, sum, sum of squares, min and max, for every column
+    of an encoded feature matrix (no NaN). Bin i of a feature holds edges[i-1] < x <= edges[i]; the
+    first and last bins are open-ended. A batch is added with a few vectorized calls whatever the
+    number of features, and sketches over the same edges merge by addition.
+    """
+
+    def __init__(self, edges):
+        self.edges = [np.asarray(feature_edges, dtype=np.float64) for feature_edges in edges]
+        width = max((len(feature_edges) for feature_edges in self.edges), default=0)
+        # Padded with +inf, so no value lands past a feature's last bin
+        self._padded = np.full((len(self.edges), width), np.inf)
+        for position, feature_edges in enumerate(self.edges):
+            self._padded[position, :len(feature_edges)] = feature_edges
+        self.counts = np.zeros((len(self.edges), width + 1), dtype=np.int64)
+        self.total = np.zeros(len(self.edges))
+        self.total_sq = np.zeros(len(self.edges))
+        self.low = np.full(len(self.edges), np.inf)
+        self.high = np.full(len(self.edges), -np.inf)
+
+    def update(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        n_features, n_bins = self.counts.shape
+        offsets = np.arange(n_features) * n_bins
+        for start in range(0, len(X), UPDATE_CHUNK_ROWS):
+            chunk = X[start:start + UPDATE_CHUNK_ROWS]
+            bins = (chunk[:, :, np.newaxis] > self._padded).sum(axis=2) + offsets
+            self.counts += np.bincount(bins.ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+        self.total += X.sum(axis=0)
+        self.total_sq += np.einsum("ij,ij->j", X, X)
+        np.minimum(self.low, X.min(axis=0), out=self.low)
+        np.maximum(self.high, X.max(axis=0), out=self.high)
+
+    def merge_feature(self, position, data):
+        """
+        Add one feature's stored histogram (a feature_dict) to this sketch.
+        """
+        self.counts[position, :len(data["counts"])] += np.asarray(data["counts"], dtype=np.int64)
+        self.total[position] += data["sum"]
+        self.total_sq[position] += data["sum_sq"]
+        if data["min"] is not None:
+            self.low[position] = min(self.low[position], data["min"])
+            self.high[position] = max(self.high[position], data["max"])
+
+    def feature_dict(self, position):
+        """
+        JSON form of one feature's histogram and moments. Empty features have no min and max.
+        """
+        empty = not self.counts[position].any()
+        return {
+            "counts": self.counts[position, :len(self.edges[position]) + 1].tolist(),
+            "sum": float(self.total[position]),
+            "sum_sq": float(self.total_sq[position]),
+            "min": None if empty else float(self.low[position]),
+            "max": None if empty else float(self.high[position]),
+        }
+
+def _proportions(counts, floor=0.0):
+    counts = np.asarray(counts, dtype=np.float64)
+    proportions = counts / max(counts.sum(), 1.0)
+    return np.maximum(proportions, floor) if floor else proportions
+
+def population_stability_index(expected_counts, actual_counts):
+    """
+    PSI between two histograms over the same bins: sum of (actual - expected) * ln(actual / expected).
+    """
+    expected = _proportions(expected_counts, PROPORTION_FLOOR)
+    actual = _proportions(actual_counts, PROPORTION_FLOOR)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def ks_statistic(expected_counts, actual_counts):
+    """
+    Largest gap between the CDFs of two histograms over the same bins.
+    """
+    gaps = np.cumsum(_proportions(actual_counts)) - np.cumsum(_proportions(expected_counts))
+    return float(np.abs(gaps).max())
+
+def ks_critical_value(n, m, coefficient=KS_CRITICAL_COEFFICIENT):
+    return coefficient * np.sqrt((n + m) / (n * m)) if n and m else None
+
+def current_period():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+def reference_id(data_path=REFERENCE_DATA_PATH, schema_path=FEATURE_SCHEMA_PATH):
+    """
+    Content hash of the training data and feature schema; the reference is rebuilt when it changes.
+    """
+    hashes = [file_sha256(path) if os.path.exists(path) else "" for path in (data_path, schema_path)]
+    return "-".join(digest[:12] for digest in hashes)
+
+def encode_applications(df):
+    """
+    Encode a DataFrame of raw applications into the model's feature matrix.
+    Returns (features, feature_names).
+    """
+    from utils.model_utils import get_preprocessing_plan, preprocess_batch, registry
+
+    feature_names = get_preprocessing_plan().feature_names
+    return preprocess_batch(df, registry.get().label_encoders, feature_names=feature_names), feature_names
+
+def build_reference(data_path=REFERENCE_DATA_PATH, bins=REFERENCE_BINS):
+    """
+    Histograms of the encoded training data with the bin edges every window is counted against.
+    """
+    from utils.model_utils import get_preprocessing_plan
+    from utils.training import load_training_data
+
+    X, feature_names = encode_applications(load_training_data(data_path))
+    specs = {spec["name"]: spec for spec in get_preprocessing_plan().features}
+
+    features = []
+    for position, name in enumerate(feature_names):
+        spec = specs[name]
+        if spec["kind"] == "categorical":
+            # Codes are 0..k-1, so one bin per category
+            edges = np.arange(len(spec["categories"]) - 1) + 0.5
+            labels = list(spec["categories"])
+        else:
+            edges = np.unique(np.quantile(X[:, position], np.linspace(0, 1, bins + 1)[1:-1]))
+            labels = None
+        features.append({"name": name, "kind": spec["kind"], "edges": edges.tolist(), "labels": labels})
+
+    sketch = FeatureSketch([feature["edges"] for feature in features])
+    sketch.update(X)
+    for position, feature in enumerate(features):
+        feature["histogram"] = sketch.feature_dict(position)
+
+    return {
+        "id": reference_id(data_path),
+        "source": data_path,
+        "rows": len(X),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "features": features,
+    }
+
+def bin_labels(feature):
+    """
+    Display label of each bin of a reference feature.
+    """
+    if feature["labels"]:
+        return feature["labels"]
+    edges = feature["edges"]
+    if not edges:
+        return ["all"]
+    return ([f"≤ {edges[0]:,.6g}"] + [f"{low:,.6g} – {high:,.6g}" for low, high in zip(edges, edges[1:])]
+            + [f"> {edges[-1]:,.6g}"])
+
+def empty_state(reference):
+    return {"state_version": STATE_VERSION, "reference": reference, "windows": []}
+
+def load_state(path=DRIFT_STATE_PATH):
+    """
+    The drift state file, or None if it does not exist or has another format.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as state_file:
+        state = json.load(state_file)
+    return state if state.get("state_version") == STATE_VERSION else None
+
+def save_state(state, path=DRIFT_STATE_PATH):
+    with open(path + ".tmp", "w") as state_file:
+        json.dump(state, state_file)
+    os.replace(path + ".tmp", path)
+
+@contextmanager
+def _state_lock(path):
+    """
+    Serialize read-modify-write cycles on the state file across processes.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class DriftMonitor:
+    """
+    Per-process accumulator of scored batches, merged into the shared state file on flush().
+    All methods are thread-safe.
+    """
+
+    def __init__(self, state_path=DRIFT_STATE_PATH, data_path=REFERENCE_DATA_PATH, enabled=False,
+                 flush_interval=DEFAULT_FLUSH_SECONDS):
+        self.state_path = state_path
+        self.data_path = data_path
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        # Window batches are added to when none is given; None means the current UTC day
+        self.period = None
+        self._reference = None
+        self._edges = None
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reference(self):
+        """
+        The reference profile, read from the state file or rebuilt (clearing the windows) if the
+        training data or feature schema changed since it was built.
+        """
+        with self._lock:
+            if self._reference is None:
+                with _state_lock(self.state_path):
+                    state = load_state(self.state_path)
+                    if state is None or state["reference"]["id"] != reference_id(self.data_path):
+                        if state is not None and state["windows"]:
+                            print(f"⚠️ Warning: Training data changed; drift windows in {self.state_path} were reset.")
+                        state = empty_state(build_reference(self.data_path))
+                        save_state(state, self.state_path)
+                self._reference = state["reference"]
+                self._edges = [feature["edges"] for feature in self._reference["features"]]
+            return self._reference
+
+    def observe(self, features, period=None):
+        """
+        Add a batch of encoded applications (rows in model feature order) to the current window,
+        if monitoring is enabled.
+        """
+        if not self.enabled:
+            return
+        self.add(features, period)
+
+    def add(self, features, period=None):
+        """
+        Add a batch to the window `period`, whether or not monitoring is enabled.
+        """
+        features = np.atleast_2d(features)
+        if len(features) == 0:
+            return
+
+        with self._lock:
+            self.reference()
+            if features.shape[1] != len(self._edges):
+                print(f"⚠️ Warning: Drift reference has {len(self._edges)} features, batch has {features.shape[1]}; "
+                      "batch not recorded.")
+                return
+            period = period or self.period or current_period()
+            window = self._pending.get(period)
+            if window is None:
+                window = self._pending[period] = {"rows": 0, "first_seen": time.time(),
+                                                  "sketch": FeatureSketch(self._edges)}
+            window["rows"] += len(features)
+            window["last_seen"] = time.time()
+            window["sketch"].update(features)
+        self.flush_if_due()
+
+    def pending_rows(self):
+        """
+        Rows added by this process that are not in the state file yet.
+        """
+        with self._lock:
+            return sum(window["rows"] for window in self._pending.values())
+
+    def flush_if_due(self):
+        """
+        Flush if rows are pending and flush_interval has passed since the last flush.
+        """
+        with self._lock:
+            due = (bool(self._pending) and self.flush_interval is not None
+                   and time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Merge this process's windows into the state file. Windows counted against an outdated
+        reference are dropped.
+        """
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            reference_features = self._reference["features"]
+
+            with _state_lock(self.state_path):
+                state = load_state(self.state_path)
+                if (state is None or state["reference"]["id"] != self._reference["id"]
+                        or reference_id(self.data_path) != self._reference["id"]):
+                    print("⚠️ Warning: Training data changed since these batches were recorded; they were dropped.")
+                    self._reference = None
+                    return
+
+                windows = {window["period"]: window for window in state["windows"]}
+                for period, pending_window in pending.items():
+                    window = windows.get(period)
+                    if window is None:
+                        window = windows[period] = {"period": period, "rows": 0,
+                                                    "first_seen": pending_window["first_seen"], "features": {}}
+                    window["rows"] += pending_window["rows"]
+                    window["first_seen"] = min(window["first_seen"], pending_window["first_seen"])
+                    window["last_seen"] = max(window.get("last_seen", 0), pending_window["last_seen"])
+                    sketch = pending_window["sketch"]
+                    for position, feature in enumerate(reference_features):
+                        stored = window["features"].get(feature["name"])
+                        if stored is not None:
+                            sketch.merge_feature(position, stored)
+                        window["features"][feature["name"]] = sketch.feature_dict(position)
+
+                state["windows"] = sorted(windows.values(), key=lambda window: window["period"])[-MAX_WINDOWS:]
+                save_state(state, self.state_path)
+
+drift_monitor = DriftMonitor(enabled=os.getenv("LOAN_DRIFT", "").lower() in ("1", "true", "yes"))
+atexit.register(drift_monitor.flush)
+
+def _status(psi):
+    if psi >= PSI_ALERT:
+        return "drift"
+    if psi >= PSI_WARNING:
+        return "moderate"
+    return "stable"
+
+def drift_table(state):
+    """
+    One row per window and feature: rows, PSI, binned KS and its 5% critical value, window and
+    reference mean, and a status from the PSI thresholds.
+    """
+    reference = state["reference"]
+    rows = []
+    for window in state["windows"]:
+        for feature in reference["features"]:
+            stored = window["features"].get(feature["name"])
+            if stored is None:
+                continue
+            expected = feature["histogram"]
+            n_expected, n_actual = sum(expected["counts"]), sum(stored["counts"])
+            psi = population_stability_index(expected["counts"], stored["counts"])
+            rows.append({
+                "period": window["period"],
+                "feature": feature["name"],
+                "rows": n_actual,
+                "psi": psi,
+                "ks": ks_statistic(expected["counts"], stored["counts"]),
+                "ks_critical": ks_critical_value(n_expected, n_actual),
+                "mean": stored["sum"] / n_actual if n_actual else None,
+                "reference_mean": expected["sum"] / n_expected if n_expected else None,
+                "status": _status(psi),
+            })
+    return pd.DataFrame(rows, columns=["period", "feature", "rows", "psi", "ks", "ks_critical", "mean",
+                                       "reference_mean", "status"])
+
+def retraining_signal(table, min_rows=MIN_WINDOW_ROWS):
+    """
+    (period, drifted features) for the latest window with at least `min_rows` applications, or
+    (None, []) if there is none. Features drift when their PSI reaches PSI_ALERT.
+    """
+    eligible = table[table["rows"] >= min_rows]
+    if eligible.empty:
+        return None, []
+    period = eligible["period"].max()
+    latest = eligible[eligible["period"] == period]
+    return period, latest.loc[latest["psi"] >= PSI_ALERT, "feature"].tolist()
+
+def record_csv(path, period=None, chunk_size=50_000, monitor=drift_monitor):
+    """
+    Add the applications in a CSV to a drift window without scoring them, e.g. to backfill past days.
+    """
+    rows = 0
+    for chunk in pd.read_csv(path, chunksize=chunk_size, skipinitialspace=True):
+        features, _ = encode_applications(chunk)
+        monitor.add(features, period)
+        rows += len(features)
+    monitor.flush()
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", metavar="CSV", help="Add the applications in this CSV to a drift window")
+    parser.add_argument("--period", default=None, help="Window for --record (default: today, UTC)")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit with status 1 if the latest window drifted enough to retrain")
+    args = parser.parse_args()
+
+    if args.record:
+        recorded = record_csv(args.record, args.period)
+        print(f"✅ Recorded {recorded:,} applications in window {args.period or current_period()}")
+
+    state = load_state()
+    if state is None or not state["windows"]:
+        raise SystemExit("No scored batches recorded yet. Score with LOAN_DRIFT=1 or use --record.")
+
+    table = drift_table(state)
+    period, drifted = retraining_signal(table)
+    latest = table[table["period"] == (period or table["period"].max())]
+    print(latest.to_string(index=False, float_format="%.4g"))
+    if drifted:
+        print(f"⚠️ Window {period}: PSI ≥ {PSI_ALERT} for {', '.join(drifted)}. Retraining is recommended.")
+    elif period is None:
+        print(f"No window has {MIN_WINDOW_ROWS} applications yet.")
+    else:
+        print(f"✅ Window {period}: no feature reaches PSI {PSI_ALERT}.")
+    if args.check and drifted:
+        raise SystemExit(1)
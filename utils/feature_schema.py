@@ -0,0 +1,211 @@
+"""
+Declarative feature schema shared by training and serving.
+
+model_training.py writes the schema next to the model: one entry per model feature in
+the model's column order, with its kind (numeric or categorical), the category order used
+by its label encoder, and the training range of numeric features. Serving compiles the
+schema once into a PreprocessingPlan. A request is then encoded with one dict lookup per
+field into a preallocated row, with no DataFrame, column renaming or reindexing.
+"""
+import json
+import logging
+import os
+
+import numpy as np
+
+from utils.instrumentation import metrics
+
+SCHEMA_VERSION = 1
+
+# Per-record encoding problems are counted by `metrics`; the messages are only logged at
+# debug level so bad traffic does not turn into a synchronous stdout write per record
+logger = logging.getLogger(__name__)
+
+class MissingFeaturesError(ValueError):
+    """
+    Raised by a strict PreprocessingPlan when applications lack model features.
+    `missing` maps the position of each incomplete application to the names it lacks.
+    """
+
+    def __init__(self, missing):
+        self.missing = missing
+        names = sorted({name for names in missing.values() for name in names})
+        super().__init__(f"{len(missing)} application(s) missing feature(s): {', '.join(names)}")
+
+def _to_python(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+def build_feature_schema(X, label_encoders, target="loan_status"):
+    """
+    Describe the encoded training matrix X (a DataFrame in model column order).
+    Categories are listed in encoder order, so a category's position is its code.
+    """
+    features = []
+    for column in X.columns:
+        if column in label_encoders:
+            categories = [str(category) for category in label_encoders[column].classes_]
+            features.append({"name": column, "kind": "categorical", "categories": categories})
+            continue
+
+        values = X[column].to_numpy(dtype=np.float64)
+        features.append({
+            "name": column,
+            "kind": "numeric",
+            "integer": bool(np.all(np.mod(values, 1) == 0)),
+            "min": _to_python(X[column].min()),
+            "max": _to_python(X[column].max()),
+            "median": _to_python(X[column].median()),
+        })
+    return {"schema_version": SCHEMA_VERSION, "target": target, "features": features}
+
+def extend_feature_schema(schema, X, label_encoders):
+    """
+    Widen a schema to cover newly encoded training rows X: numeric ranges grow to include X and
+    categorical features take the categories of the (extended) encoders. Medians are kept.
+    """
+    features = []
+    for spec in schema["features"]:
+        spec = dict(spec)
+        column = spec["name"]
+        if spec["kind"] == "categorical" and column in label_encoders:
+            spec["categories"] = [str(category) for category in label_encoders[column].classes_]
+        elif spec["kind"] == "numeric" and "min" in spec and column in X.columns and len(X):
+            values = X[column].to_numpy(dtype=np.float64)
+            spec["integer"] = spec["integer"] and bool(np.all(np.mod(values, 1) == 0))
+            spec["min"] = min(spec["min"], _to_python(X[column].min()))
+            spec["max"] = max(spec["max"], _to_python(X[column].max()))
+        features.append(spec)
+    return {**schema, "features": features}
+
+def schema_from_model(model, label_encoders):
+    """
+    Minimal schema recovered from a fitted model and its encoders, for models trained before
+    schemas were written. Numeric features carry no training range.
+    """
+    features = []
+    for column in getattr(model, "feature_names_in_", []):
+        column = str(column)
+        if column in label_encoders:
+            categories = [str(category) for category in label_encoders[column].classes_]
+            features.append({"name": column, "kind": "categorical", "categories": categories})
+        else:
+            features.append({"name": column, "kind": "numeric"})
+    return {"schema_version": SCHEMA_VERSION, "target": None, "features": features}
+
+def save_feature_schema(schema, path):
+    with open(path + ".tmp", "w") as schema_file:
+        json.dump(schema, schema_file, indent=2)
+    os.replace(path + ".tmp", path)
+
+def load_feature_schema(path):
+    with open(path) as schema_file:
+        schema = json.load(schema_file)
+    if schema.get("schema_version") != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported feature schema version: {schema.get('schema_version')}")
+    return schema
+
+class PreprocessingPlan:
+    """
+    A feature schema compiled into a field-to-slot table.
+
+    Each accepted field name (as written in the schema, lowercase or uppercase) maps to
+    its column position and, for categorical features, a category-to-code dict. Other
+    casings are matched by lowercasing the key, like preprocess_batch. Unknown categories
+    (including lists and objects) and non-numeric values are encoded as `default`.
+    Missing features are also filled with `default` unless the plan is asked to be strict, in
+    which case MissingFeaturesError is raised. Each case is counted in `metrics` and logged at
+    debug level.
+    """
+
+    def __init__(self, schema, default=0):
+        self.schema = schema
+        self.features = schema["features"]
+        self.feature_names = [spec["name"] for spec in self.features]
+        self.n_features = len(self.features)
+        self.default = float(default)
+        self._complete = (1 << self.n_features) - 1
+
+        self._slots = {}
+        for position, spec in enumerate(self.features):
+            codes = None
+            if spec["kind"] == "categorical":
+                codes = {category: float(code) for code, category in enumerate(spec["categories"])}
+            name = spec["name"]
+            for key in (name, name.lower(), name.upper()):
+                self._slots[key] = (position, codes)
+
+    def check_features(self, feature_names):
+        """
+        Raise ValueError unless the schema lists exactly `feature_names`, in the same order.
+        """
+        if feature_names is not None and [str(name) for name in feature_names] != self.feature_names:
+            raise ValueError("Feature schema does not match the model's features.")
+
+    def _encode(self, record, row):
+        filled = 0
+        slots = self._slots
+        for key, value in record.items():
+            slot = slots.get(key)
+            if slot is None:
+                # Mixed-case keys such as "Loan_Amount"
+                slot = slots.get(key.lower()) if isinstance(key, str) else None
+                if slot is None:
+                    continue
+            position, codes = slot
+
+            if codes is None:
+                try:
+                    number = float(value)
+                except (TypeError, ValueError):
+                    logger.debug("Invalid value %r for '%s', using default.", value, key)
+                    metrics.increment("loan_invalid_value_total", feature=self.feature_names[position])
+                    number = self.default
+                if number != number:  # NaN
+                    number = self.default
+            else:
+                try:
+                    number = codes.get(value)
+                except TypeError:  # Unhashable JSON values (lists, objects)
+                    number = None
+                if number is None:
+                    number = codes.get(str(value))
+                    if number is None:
+                        logger.debug("Unknown value %r for '%s', using default.", value, key)
+                        metrics.increment("loan_unknown_category_total", feature=self.feature_names[position])
+                        number = self.default
+
+            row[position] = number
+            filled |= 1 << position
+
+        if filled == self._complete:
+            return None
+        missing = [name for position, name in enumerate(self.feature_names) if not filled >> position & 1]
+        for name in missing:
+            metrics.increment("loan_missing_feature_total", feature=name)
+        return missing
+
+    def transform_one(self, record, strict=False):
+        """
+        Encode one application (a dict) as a (1, n_features) float64 array.
+        """
+        return self.transform([record], strict)
+
+    def transform(self, records, strict=False):
+        """
+        Encode a list of application dicts as an (n, n_features) float64 array.
+        With strict=True, applications missing any feature raise MissingFeaturesError.
+        """
+        rows, missing = [], {}
+        for index, record in enumerate(records):
+            row = [self.default] * self.n_features
+            absent = self._encode(record, row)
+            if absent:
+                missing[index] = absent
+            rows.append(row)
+
+        if missing:
+            if strict:
+                raise MissingFeaturesError(missing)
+            for absent in missing.values():
+                logger.debug("Missing feature(s) %s, using default.", ", ".join(absent))
+        return np.array(rows, dtype=np.float64).reshape(len(records), self.n_features)
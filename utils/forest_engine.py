@@ -0,0 +1,292 @@
+import numpy as np
+
+# Batches at least this large are walked one tree at a time rather than all trees at once
+TREE_BY_TREE_MIN_ROWS = 2048
+
+# Batches at least this large are walked by sklearn's compiled tree code when sklearn is
+# installed; below it, NumPy traversal is faster and does not need to import sklearn
+COMPILED_TREES_MIN_ROWS = 32
+
+class FlatForest:
+    """
+    A tree ensemble flattened into contiguous node arrays.
+
+    All trees share one set of arrays (feature, threshold, left, right, value) and `roots`
+    holds the index of each tree's root node. Traversal advances every (sample, tree) pair
+    one level per step for the whole batch and drops pairs as soon as they reach a leaf.
+    Larger batches are walked by sklearn's compiled Tree.apply instead, on trees rebuilt from
+    these arrays on first use; leaf values still come from `value`, so results are identical.
+    The object exposes the classifier attributes the app relies on (predict, predict_proba,
+    classes_, feature_names_in_, feature_importances_) so it can stand in for the sklearn model.
+
+    Compact forests (see utils/compression.py) store nodes in depth-first preorder and pass
+    left=None: an internal node's left child is the next node, so only `right` is stored.
+    Their `value` may hold integers that `value_scale` turns back into probabilities.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, classes,
+                 cover=None, missing_left=None, feature_names=None, feature_importances=None,
+                 value_scale=1.0):
+        self.compact = left is None
+        if self.compact:
+            node_ids = np.arange(len(right), dtype=right.dtype)
+            left = np.where(right == node_ids, node_ids, node_ids + 1).astype(right.dtype)
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.value_scale = float(value_scale)
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = np.asarray(classes)
+        self.cover = cover
+        # Direction taken by NaN feature values at each node (sklearn >= 1.3); right otherwise
+        self.missing_left = np.zeros(len(feature), dtype=bool) if missing_left is None else missing_left
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        if feature_importances is not None:
+            self.feature_importances_ = np.asarray(feature_importances)
+
+        # Interleaved children (left, right) and a leaf mask, derived once for traversal
+        self._children = np.column_stack([left, right]).ravel()
+        self._is_leaf = left == np.arange(len(left), dtype=left.dtype)
+        # sklearn Tree objects for large batches: None until first needed, False if unavailable
+        self._compiled_trees = None
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """
+        Export a fitted sklearn forest classifier (e.g. RandomForestClassifier) into flat arrays.
+        """
+        if getattr(forest, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output forests can be flattened.")
+
+        features, thresholds, lefts, rights, values, covers, missing, roots = [], [], [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes, dtype=np.int32)
+            is_leaf = tree.children_left == -1
+
+            # Leaves loop back to themselves so extra traversal steps are no-ops
+            left = np.where(is_leaf, node_ids, tree.children_left).astype(np.int32) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right).astype(np.int32) + offset
+
+            # Same normalisation DecisionTreeClassifier.predict_proba applies to tree_.value
+            value = tree.value[:, 0, :forest.n_classes_].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value = value / normalizer
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold).astype(np.float64))
+            lefts.append(left)
+            rights.append(right)
+            values.append(value)
+            covers.append(tree.weighted_n_node_samples.astype(np.float64))
+            missing.append(np.asarray(getattr(tree, "missing_go_to_left", np.zeros(n_nodes)), dtype=bool) & ~is_leaf)
+            roots.append(offset)
+
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n_nodes
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            classes=forest.classes_,
+            cover=np.concatenate(covers),
+            missing_left=np.concatenate(missing),
+            feature_names=getattr(forest, "feature_names_in_", None),
+            feature_importances=getattr(forest, "feature_importances_", None),
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def n_features_in_(self):
+        if hasattr(self, "feature_names_in_"):
+            return len(self.feature_names_in_)
+        return int(self.feature.max()) + 1
+
+    @property
+    def nbytes(self):
+        # A compact forest's left children are derived, not stored
+        arrays = (self.feature, self.threshold, self.right, self.value, self.roots) + (() if self.compact else (self.left,))
+        return sum(array.nbytes for array in arrays)
+
+    def apply(self, X):
+        """
+        Return the leaf index reached in every tree, shape (n_samples, n_estimators).
+        """
+        return self._leaf_indices(X).T
+
+    def _leaf_indices(self, X):
+        """
+        Leaf index per tree and sample, tree-major: shape (n_estimators, n_samples).
+        """
+        # sklearn evaluates splits on float32 features against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+
+        if len(X) >= COMPILED_TREES_MIN_ROWS and self._get_compiled_trees():
+            return self._walk_compiled_trees(X)
+        if len(X) < TREE_BY_TREE_MIN_ROWS:
+            return self._walk_all_trees(X)
+        return self._walk_tree_by_tree(X)
+
+    def _get_compiled_trees(self):
+        if self._compiled_trees is None:
+            try:
+                self._compiled_trees = self._build_compiled_trees()
+            except (ImportError, ValueError, TypeError, KeyError):
+                # Missing or incompatible sklearn: keep using NumPy traversal
+                self._compiled_trees = False
+        return self._compiled_trees
+
+    def _build_compiled_trees(self):
+        """
+        Rebuild each tree as an sklearn Tree (the structure behind DecisionTreeClassifier.tree_)
+        so batches can be routed by its compiled apply(). Returns [(tree, first node index)].
+        """
+        from sklearn.tree._tree import NODE_DTYPE, Tree
+
+        bounds = np.append(self.roots, self.n_nodes).astype(np.int64)
+        if (np.diff(bounds) <= 0).any():
+            raise ValueError("Trees are not stored as consecutive node ranges.")
+
+        n_classes = np.array([len(self.classes_)], dtype=np.intp)
+        trees = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            leaf = self._is_leaf[start:stop]
+            nodes = np.zeros(stop - start, dtype=NODE_DTYPE)
+            # sklearn marks leaves with child -1 and feature/threshold -2
+            nodes["left_child"] = np.where(leaf, -1, self.left[start:stop].astype(np.int64) - start)
+            nodes["right_child"] = np.where(leaf, -1, self.right[start:stop].astype(np.int64) - start)
+            nodes["feature"] = np.where(leaf, -2, self.feature[start:stop])
+            nodes["threshold"] = np.where(leaf, -2.0, self.threshold[start:stop])
+            if "missing_go_to_left" in NODE_DTYPE.names:
+                nodes["missing_go_to_left"] = self.missing_left[start:stop]
+            tree = Tree(self.n_features_in_, n_classes, 1)
+            # Leaf values stay in self.value; the Tree only needs a correctly shaped placeholder
+            tree.__setstate__({"max_depth": self.max_depth, "node_count": stop - start, "nodes": nodes,
+                               "values": np.zeros((stop - start, 1, len(self.classes_)))})
+            trees.append((tree, start))
+        return trees
+
+    def _walk_compiled_trees(self, X):
+        """
+        Route the batch through each tree with sklearn's compiled traversal.
+        """
+        leaves = np.empty((self.n_estimators, len(X)), dtype=self.right.dtype)
+        for tree_index, (tree, start) in enumerate(self._compiled_trees):
+            np.add(tree.apply(X), start, out=leaves[tree_index], casting="unsafe")
+        return leaves
+
+    def _route(self, values, nodes, has_missing):
+        """
+        Move each node one level down given the feature values observed at it.
+        """
+        go_right = ~(values <= self.threshold.take(nodes))
+        if has_missing:
+            is_missing = np.isnan(values)
+            go_right[is_missing] = ~self.missing_left.take(nodes[is_missing])
+        return self._children.take(2 * nodes + go_right)
+
+    def _walk_all_trees(self, X):
+        """
+        Advance every (sample, tree) pair together; fewest Python steps, best for small batches.
+        """
+        n_samples, n_features = X.shape
+        flat_X = X.ravel()
+        has_missing = bool(np.isnan(flat_X).any())
+
+        # Only pairs still on an internal node stay active
+        leaves = np.tile(self.roots, n_samples)
+        row_offsets = np.repeat(np.arange(n_samples, dtype=np.int64) * n_features, self.n_estimators)
+        active = np.flatnonzero(~self._is_leaf.take(leaves))
+        nodes = leaves.take(active)
+        row_offsets = row_offsets.take(active)
+
+        while len(active):
+            nodes = self._route(flat_X.take(row_offsets + self.feature.take(nodes)), nodes, has_missing)
+            done = self._is_leaf.take(nodes)
+            leaves[active[done]] = nodes[done]
+            remaining = ~done
+            active, nodes, row_offsets = active[remaining], nodes[remaining], row_offsets[remaining]
+
+        return leaves.reshape(n_samples, self.n_estimators).T
+
+    def _walk_tree_by_tree(self, X):
+        """
+        Push the whole batch through one tree at a time; keeps the working set in cache for large batches.
+        """
+        n_samples = len(X)
+        # Feature-major copy so a (feature, sample) pair is one flat offset
+        columns = np.ascontiguousarray(X.T).ravel()
+        has_missing = bool(np.isnan(columns).any())
+        leaves = np.empty((self.n_estimators, n_samples), dtype=self.left.dtype)
+        # Offset of each node's split feature within `columns`, computed once per call
+        feature_offsets = self.feature.astype(np.int64) * n_samples
+
+        for tree_index, root in enumerate(self.roots):
+            tree_leaves = leaves[tree_index]
+            tree_leaves[:] = root
+            if self._is_leaf[root]:
+                continue
+
+            active = np.arange(n_samples, dtype=np.int64)
+            nodes = tree_leaves.copy()
+            while len(active):
+                values = columns.take(feature_offsets.take(nodes) + active)
+                nodes = self._route(values, nodes, has_missing)
+                done = self._is_leaf.take(nodes)
+                tree_leaves[active[done]] = nodes[done]
+                remaining = ~done
+                active, nodes = active[remaining], nodes[remaining]
+
+        return leaves
+
+    def predict_proba(self, X):
+        """
+        Average the leaf class probabilities over all trees, like RandomForestClassifier.predict_proba.
+        """
+        leaves = self._leaf_indices(X)
+        proba = np.zeros((leaves.shape[1], self.value.shape[1]), dtype=np.float64)
+        # Accumulate tree by tree, in the same order as sklearn, so results match bit for bit
+        for tree_leaves in leaves:
+            proba += self.value.take(tree_leaves, axis=0)
+        proba /= self.n_estimators
+        if self.value_scale != 1.0:
+            proba *= self.value_scale
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(self.predict_proba(X).argmax(axis=1))
+
+def compile_forest(model):
+    """
+    Return a FlatForest for sklearn forest classifiers, or the model unchanged if it cannot be flattened.
+    """
+    if isinstance(model, FlatForest):
+        return model
+    if model is None or not hasattr(model, "estimators_") or getattr(model, "n_outputs_", 1) != 1:
+        return model
+    if not all(hasattr(estimator, "tree_") for estimator in model.estimators_):
+        return model
+    return FlatForest.from_sklearn(model)
@@ -0,0 +1,126 @@
+"""
+Permutation importance computed on the held-out split saved by model_training.py.
+
+Each (feature, repeat) permutation is an independent task with its own seed, so tasks
+can be spread over a process pool and the result does not depend on the worker count.
+Results are written next to the model artifacts and tagged with the model fingerprint,
+so the Streamlit page only reads them.
+
+Recompute for the current model with:
+    python -m utils.importance
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.model_utils import HOLDOUT_PATH, preprocess_batch, registry
+
+IMPORTANCE_PATH = "assets/data/permutation_importance.json"
+TARGET_COLUMN = "loan_status"
+
+# Serial evaluation is faster than starting a pool for this many tasks or fewer
+MIN_PARALLEL_TASKS = 16
+
+# Model and held-out data held by each worker process, loaded once by _init_worker
+_worker_state = {}
+
+def load_holdout(label_encoders, feature_names, holdout_path=HOLDOUT_PATH):
+    """
+    Encoded feature matrix and labels of the held-out split.
+    """
+    holdout = pd.read_csv(holdout_path, skipinitialspace=True)
+    holdout.columns = [col.lower() for col in holdout.columns]
+    features = preprocess_batch(holdout, label_encoders, feature_names=feature_names)
+    labels = holdout[TARGET_COLUMN].astype(str).str.strip().to_numpy()
+    return features, labels
+
+def _permutation_score(model, features, labels, feature_index, repeat, random_state):
+    rng = np.random.default_rng([random_state, feature_index, repeat])
+    permuted = features.copy()
+    permuted[:, feature_index] = rng.permutation(permuted[:, feature_index])
+    return float(np.mean(model.predict(permuted) == labels))
+
+def _init_worker(version, holdout_path):
+    entry = registry.get(version)
+    features, labels = load_holdout(entry.label_encoders, entry.model.feature_names_in_, holdout_path)
+    _worker_state.update(model=entry.model, features=features, labels=labels)
+
+def _score_task(task):
+    feature_index, repeat, random_state = task
+    state = _worker_state
+    return _permutation_score(state["model"], state["features"], state["labels"], feature_index, repeat, random_state)
+
+def compute_permutation_importance(version="default", n_repeats=10, random_state=42,
+                                   max_workers=None, holdout_path=HOLDOUT_PATH):
+    """
+    Accuracy drop when each feature is shuffled on the held-out split, over n_repeats shuffles.
+    Feature x repeat tasks run on a process pool when there are enough of them.
+    """
+    entry = registry.get(version)
+    if entry.model is None:
+        raise RuntimeError("Model not loaded. Check if the model file exists.")
+
+    feature_names = list(entry.model.feature_names_in_)
+    features, labels = load_holdout(entry.label_encoders, feature_names, holdout_path)
+    baseline = float(np.mean(entry.model.predict(features) == labels))
+
+    tasks = [(feature_index, repeat, random_state)
+             for feature_index in range(len(feature_names)) for repeat in range(n_repeats)]
+    workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+
+    start = time.perf_counter()
+    if workers <= 1 or len(tasks) <= MIN_PARALLEL_TASKS:
+        scores = [_permutation_score(entry.model, features, labels, *task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(version, holdout_path)) as pool:
+            scores = list(pool.map(_score_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    elapsed = time.perf_counter() - start
+
+    drops = baseline - np.asarray(scores).reshape(len(feature_names), n_repeats)
+    return {
+        "model_fingerprint": entry.fingerprint,
+        "feature_names": feature_names,
+        "importances_mean": drops.mean(axis=1).tolist(),
+        "importances_std": drops.std(axis=1).tolist(),
+        "importances": drops.tolist(),
+        "baseline_accuracy": baseline,
+        "n_repeats": n_repeats,
+        "random_state": random_state,
+        "holdout_rows": int(len(labels)),
+        "compute_seconds": elapsed,
+        "computed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def save_permutation_importance(result, path=IMPORTANCE_PATH):
+    with open(path + ".tmp", "w") as result_file:
+        json.dump(result, result_file, indent=2)
+    os.replace(path + ".tmp", path)
+
+def load_permutation_importance(version="default", path=IMPORTANCE_PATH):
+    """
+    Precomputed importances for the current model, or None if missing or computed for another model.
+    """
+    try:
+        with open(path) as result_file:
+            result = json.load(result_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if result.get("model_fingerprint") != registry.get(version).fingerprint:
+        return None
+    return result
+
+def compute_and_save_importance(version="default", **kwargs):
+    result = compute_permutation_importance(version, **kwargs)
+    save_permutation_importance(result)
+    return result
+
+if __name__ == "__main__":
+    result = compute_and_save_importance()
+    print(f"✅ Permutation importance over {result['holdout_rows']} held-out rows "
+          f"computed in {result['compute_seconds']:.2f}s and saved to {IMPORTANCE_PATH}")
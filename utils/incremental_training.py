@@ -0,0 +1,324 @@
+"""
+Incremental retraining: new application rows are added to the forest as extra trees instead
+of refitting the whole history.
+
+The forest is refit with warm_start, which fits only the new trees, and only on the new rows,
+so a nightly update takes time in proportion to the new data. Label encoders keep their codes
+and append categories they have not seen, so existing trees keep their meaning. A manifest
+(assets/data/training_manifest.json) records every batch of training data: source file, row
+range and digest, the held-out share kept back from it, and the trees fitted on it. It is used
+to find the rows not trained on yet, and to rebuild the full training set so the incremental
+forest can be compared with a full retrain on the same held-out rows. It also records the options
+the served artifact is compressed with (utils/compression.py), so an incremental run compresses
+the updated forest the same way instead of serving it uncompressed.
+
+Sources are append-only: rows that were trained on must stay unchanged. Give each extract
+passed with --new-data its own file name, and keep the files if you use --compare-full.
+
+Run through model_training.py:
+    python model_training.py --incremental                    # rows appended to loan_data.csv
+    python model_training.py --incremental --new-data applications-2024-06-01.csv --compare-full
+"""
+import copy
+import hashlib
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+from utils.artifacts import read_manifest, save_model_artifact
+from utils.compression import compress_and_save, print_report
+from utils.feature_schema import extend_feature_schema, load_feature_schema, save_feature_schema
+from utils.importance import compute_and_save_importance, load_holdout
+from utils.model_utils import (DATA_PATH, ENCODER_PATH, FEATURE_SCHEMA_PATH, HOLDOUT_PATH, MODEL_ARTIFACT_DIR,
+                               MODEL_PATH, load_pickled_model_and_encoders)
+from utils.training import TARGET_COLUMN, load_training_data, train_model
+
+MANIFEST_PATH = "assets/data/training_manifest.json"
+MANIFEST_VERSION = 1
+
+# Share of every batch held out for evaluation, split as model_training.py splits the first batch
+HOLDOUT_SIZE = 0.2
+SPLIT_SEED = 42
+
+# Fewest trees added for a batch, however small
+MIN_NEW_TREES = 10
+
+def rows_digest(df):
+    """
+    Content digest of raw training rows, used to check that trained-on rows are unchanged.
+    """
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()[:16]
+
+def split_batch(df, test_size=HOLDOUT_SIZE, random_state=SPLIT_SEED):
+    """
+    (training rows, held-out rows) of one batch.
+    """
+    return train_test_split(df, test_size=test_size, random_state=random_state)
+
+def batch_entry(source, start, rows, trees, fit_seconds, train_rows, holdout_rows):
+    return {
+        "source": source,
+        "rows": [start, start + len(rows)],
+        "digest": rows_digest(rows),
+        "test_size": HOLDOUT_SIZE,
+        "split_seed": SPLIT_SEED,
+        "train_rows": int(train_rows),
+        "holdout_rows": int(holdout_rows),
+        "trees": [int(trees[0]), int(trees[1])],
+        "fit_seconds": fit_seconds,
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def start_manifest(source, rows, n_trees, params, fit_seconds, train_rows, holdout_rows):
+    """
+    Manifest for a forest trained from scratch on every row of `source` (what model_training.py does).
+    """
+    return {
+        "manifest_version": MANIFEST_VERSION,
+        "params": params,
+        "batches": [batch_entry(source, 0, rows, (0, n_trees), fit_seconds, train_rows, holdout_rows)],
+    }
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    with open(path + ".tmp", "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(path + ".tmp", path)
+
+def load_manifest(path=MANIFEST_PATH):
+    """
+    The training manifest, or None if the model was not trained by a version that writes one.
+    """
+    try:
+        with open(path) as manifest_file:
+            manifest = json.load(manifest_file)
+    except FileNotFoundError:
+        return None
+    if manifest.get("manifest_version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported training manifest version: {manifest.get('manifest_version')}")
+    return manifest
+
+def compression_options(manifest, artifact_dir=MODEL_ARTIFACT_DIR):
+    """
+    Keyword arguments of compress_and_save the served artifact was compressed with, or None if it
+    is not compressed. Artifacts compressed before the manifest recorded this are recognised by
+    their own metadata and compressed again with the same tolerance.
+    """
+    if manifest.get("compression"):
+        return manifest["compression"]
+    try:
+        settings = (read_manifest(artifact_dir).get("metadata") or {}).get("compression")
+    except (OSError, ValueError):
+        return None
+    return {"tolerance": settings["tolerance"], "n_trees": None, "max_depth": None} if settings else None
+
+def _read_source(source, cache):
+    if source not in cache:
+        cache[source] = load_training_data(source)
+    return cache[source]
+
+def read_batch(batch, cache=None):
+    """
+    Raw rows of a manifest batch. Raises ValueError if they changed since they were trained on.
+    """
+    df = _read_source(batch["source"], {} if cache is None else cache)
+    start, end = batch["rows"]
+    rows = df.iloc[start:end]
+    if len(rows) != end - start or rows_digest(rows) != batch["digest"]:
+        raise ValueError(f"Rows {start}-{end} of {batch['source']} changed since they were trained on; "
+                         f"retrain from scratch with model_training.py.")
+    return rows
+
+def find_new_rows(manifest, source, cache=None):
+    """
+    Rows of `source` that no batch has trained on yet, and the offset of the first one.
+    """
+    cache = {} if cache is None else cache
+    consumed = [batch for batch in manifest["batches"] if batch["source"] == source]
+    for batch in consumed:
+        read_batch(batch, cache)
+    start = max((batch["rows"][1] for batch in consumed), default=0)
+    return _read_source(source, cache).iloc[start:], start
+
+def extend_label_encoders(label_encoders, df):
+    """
+    Copies of the encoders with categories from df that they have not seen appended after the
+    existing ones, so the codes existing trees split on do not change.
+    Returns (encoders, {column: [new categories]}).
+    """
+    extended, added = {}, {}
+    for column, encoder in label_encoders.items():
+        encoder = copy.deepcopy(encoder)
+        if column in df.columns:
+            known = [str(category) for category in encoder.classes_]
+            new = sorted(set(df[column].astype(str)) - set(known))
+            if new:
+                # Object dtype: fixed-width string arrays would truncate longer new categories
+                encoder.classes_ = np.asarray(known + new, dtype=object)
+                added[column] = new
+        extended[column] = encoder
+    return extended, added
+
+def encode_rows(df, label_encoders, feature_names):
+    """
+    (X, y) for raw training rows, encoded with existing encoders and in the model's column order.
+    """
+    X = df.drop(columns=[TARGET_COLUMN])
+    X = X.assign(**{column: encoder.transform(X[column].astype(str))
+                    for column, encoder in label_encoders.items() if column in X.columns})
+    return X[list(feature_names)], df[TARGET_COLUMN]
+
+def trees_for_batch(manifest, train_rows, min_trees=MIN_NEW_TREES):
+    """
+    Trees to add for `train_rows` new training rows: as many trees per row as the current
+    forest has, so new rows carry about the same weight as old ones.
+    """
+    live = [batch for batch in manifest["batches"] if batch["trees"][1] > batch["trees"][0]]
+    trees = sum(batch["trees"][1] - batch["trees"][0] for batch in live)
+    rows = sum(batch["train_rows"] for batch in live)
+    return max(min_trees, int(round(trees * train_rows / max(rows, 1))))
+
+def add_trees(model, X, y, n_trees):
+    """
+    Fit n_trees more trees on (X, y) with warm_start on every core; existing trees are untouched.
+    """
+    classes = set(np.unique(y))
+    if classes != set(model.classes_):
+        raise ValueError(f"New training rows have classes {sorted(classes)}, the model has "
+                         f"{sorted(model.classes_)}; every batch needs examples of each class.")
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_trees, n_jobs=-1)
+    model.fit(X, y)
+    model.set_params(warm_start=False, n_jobs=None)
+    return model
+
+def retire_oldest_trees(model, manifest, max_trees):
+    """
+    Drop the oldest trees so at most max_trees remain, shifting the manifest's tree ranges.
+    Returns the number of trees dropped.
+    """
+    drop = len(model.estimators_) - max_trees
+    if drop <= 0:
+        return 0
+    model.estimators_ = model.estimators_[drop:]
+    model.n_estimators = len(model.estimators_)
+    for batch in manifest["batches"]:
+        start, end = batch["trees"]
+        batch["trees"] = [max(start - drop, 0), max(end - drop, 0)]
+    return drop
+
+def incremental_update(model, label_encoders, manifest, new_rows, source, start, n_trees=None, max_trees=None):
+    """
+    Add trees fitted on the training share of new_rows. `model` and `manifest` are updated in place.
+    Returns (extended label encoders, the manifest batch, encoded training rows, held-out raw rows).
+    """
+    train_rows, holdout_rows = split_batch(new_rows)
+    label_encoders, added = extend_label_encoders(label_encoders, new_rows)
+    X, y = encode_rows(train_rows, label_encoders, model.feature_names_in_)
+    n_trees = n_trees or trees_for_batch(manifest, len(X))
+
+    first_tree = len(model.estimators_)
+    fit_start = time.perf_counter()
+    add_trees(model, X, y, n_trees)
+    fit_seconds = time.perf_counter() - fit_start
+
+    batch = batch_entry(source, start, new_rows, (first_tree, first_tree + n_trees), fit_seconds,
+                        len(train_rows), len(holdout_rows))
+    batch["new_categories"] = added
+    manifest["batches"].append(batch)
+    batch["retired_trees"] = retire_oldest_trees(model, manifest, max_trees) if max_trees else 0
+    return label_encoders, batch, X, holdout_rows
+
+def compare_with_full_retrain(model, label_encoders, manifest):
+    """
+    Score the incremental forest and a forest refit from scratch (manifest parameters, every
+    batch's training rows) on every batch's held-out rows and on the newest batch's alone.
+    Returns a DataFrame with one row per model.
+    """
+    cache = {}
+    train_parts, holdout_parts = [], []
+    for batch in manifest["batches"]:
+        train, holdout = split_batch(read_batch(batch, cache), batch["test_size"], batch["split_seed"])
+        train_parts.append(train)
+        holdout_parts.append(holdout)
+
+    feature_names = model.feature_names_in_
+    X_train, y_train = encode_rows(pd.concat(train_parts), label_encoders, feature_names)
+    X_test, y_test = encode_rows(pd.concat(holdout_parts), label_encoders, feature_names)
+    X_newest, y_newest = encode_rows(holdout_parts[-1], label_encoders, feature_names)
+
+    fit_start = time.perf_counter()
+    full = train_model(X_train, y_train, manifest["params"])
+    full_seconds = time.perf_counter() - fit_start
+
+    newest = manifest["batches"][-1]
+    rows = []
+    for name, forest, seconds, fitted_rows in (("incremental", model, newest["fit_seconds"], newest["train_rows"]),
+                                               ("full retrain", full, full_seconds, len(X_train))):
+        rows.append({
+            "model": name,
+            "trees": len(forest.estimators_),
+            "rows_fitted": fitted_rows,
+            "fit_seconds": seconds,
+            "holdout_accuracy": forest.score(X_test, y_test),
+            "newest_batch_accuracy": forest.score(X_newest, y_newest),
+        })
+    return pd.DataFrame(rows)
+
+def run_incremental_training(new_data=None, n_trees=None, max_trees=None, compare_full=False):
+    """
+    Add trees for rows not trained on yet and save the model, encoders, schema, artifact,
+    held-out rows, permutation importance and manifest. With new_data=None, new rows are
+    those appended to the training CSV since the last run. A compressed artifact is replaced
+    by the updated forest compressed with the same options.
+    """
+    manifest = load_manifest()
+    if manifest is None:
+        raise SystemExit(f"No training manifest at {MANIFEST_PATH}. Run model_training.py once "
+                         f"without --incremental to train a base model and start one.")
+    model, label_encoders = load_pickled_model_and_encoders()
+    if model is None:
+        raise SystemExit("Model not loaded. Run model_training.py first.")
+
+    source = new_data or DATA_PATH
+    try:
+        new_rows, start = find_new_rows(manifest, source)
+        if len(new_rows) == 0:
+            print(f"✅ No new rows in {source}; the model is up to date.")
+            return None
+        label_encoders, batch, X_new, holdout_rows = incremental_update(
+            model, label_encoders, manifest, new_rows, source, start, n_trees=n_trees, max_trees=max_trees)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}") from None
+    print(f"Added {batch['trees'][1] - batch['trees'][0]} trees for {len(new_rows):,} new rows of {source} "
+          f"in {batch['fit_seconds']:.2f}s ({len(model.estimators_)} trees in total)")
+    for column, categories in batch["new_categories"].items():
+        print(f"New categories for '{column}': {', '.join(categories)}")
+    if batch["retired_trees"]:
+        print(f"Retired the {batch['retired_trees']} oldest trees to stay within {max_trees}")
+    compression = compression_options(manifest)
+    manifest["compression"] = compression
+
+    with open(MODEL_PATH, "wb") as model_file:
+        pickle.dump(model, model_file)
+    with open(ENCODER_PATH, "wb") as encoder_file:
+        pickle.dump(label_encoders, encoder_file)
+    save_manifest(manifest)
+
+    save_feature_schema(extend_feature_schema(load_feature_schema(FEATURE_SCHEMA_PATH), X_new, label_encoders),
+                        FEATURE_SCHEMA_PATH)
+    holdout_columns = pd.read_csv(HOLDOUT_PATH, nrows=0).columns
+    holdout_rows[holdout_columns].to_csv(HOLDOUT_PATH, mode="a", header=False, index=False)
+    save_model_artifact(model, label_encoders, MODEL_ARTIFACT_DIR, source_path=MODEL_PATH)
+    if compression:
+        print(f"Compressing the updated forest like the artifact it replaces ({compression})")
+        X_holdout, y_holdout = load_holdout(label_encoders, list(model.feature_names_in_), HOLDOUT_PATH)
+        print_report(*compress_and_save(model, label_encoders, X_holdout, y_holdout, **compression))
+    compute_and_save_importance()
+
+    if compare_full:
+        print(compare_with_full_retrain(model, label_encoders, manifest).to_string(index=False, float_format="%.4f"))
+    return batch
@@ -0,0 +1,205 @@
+"""
+Opt-in metrics for the scoring path: per-stage latency histograms and event counters,
+exported in the Prometheus text format.
+
+Instrumentation is off by default. Set LOAN_METRICS=1 (or call `metrics.enable()`) to turn it
+on. While disabled, `metrics.stage()` returns a shared no-op context manager and `increment`
+and `observe` return after one attribute check, so the hot path pays well under a microsecond.
+"""
+import bisect
+import os
+import threading
+import time
+
+# Upper bounds of the latency buckets, in seconds (1 µs to 2.5 s)
+LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+                   1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Upper bounds of the micro-batch size buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+METRIC_HELP = {
+    "loan_stage_seconds": "Time spent in each stage of the scoring path.",
+    "loan_unknown_category_total": "Categorical values not seen in training, encoded as the default.",
+    "loan_invalid_value_total": "Numeric fields that could not be parsed, encoded as the default.",
+    "loan_missing_feature_total": "Features missing from a request, encoded as the default.",
+    "loan_predictions_total": "Applications scored by predict_loan_status, by decision.",
+    "loan_request_seconds": "Scoring server request latency, by route.",
+    "loan_batch_size": "Applications per micro-batch scored by the scoring server.",
+}
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    __slots__ = ("metrics", "key", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.key = ("loan_stage_seconds", (("stage", name),))
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics._observe(self.key, time.perf_counter() - self.start, LATENCY_BUCKETS)
+        return False
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with a running sum, as exported to Prometheus.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q-quantile (inf if it is past the last bucket).
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+class Metrics:
+    """
+    Process-wide registry of counters and histograms, keyed on metric name and labels.
+    All methods are thread-safe.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def stage(self, name):
+        """
+        Context manager timing one stage into loan_stage_seconds{stage=name}.
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def increment(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        self._observe((name, tuple(sorted(labels.items()))), value, buckets)
+
+    def _observe(self, key, value, buckets):
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def counters(self):
+        """
+        One dict per counter series: metric, labels and value.
+        """
+        with self._lock:
+            return [{"metric": name, **dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())]
+
+    def stage_stats(self):
+        """
+        Per-stage call count, mean and bucketed p50/p99 in milliseconds.
+        """
+        with self._lock:
+            rows = []
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                if name != "loan_stage_seconds" or histogram.count == 0:
+                    continue
+                rows.append({
+                    "stage": dict(labels).get("stage"),
+                    "calls": histogram.count,
+                    "mean_ms": histogram.sum / histogram.count * 1000,
+                    "p50_ms_at_most": histogram.quantile(0.5) * 1000,
+                    "p99_ms_at_most": histogram.quantile(0.99) * 1000,
+                })
+            return rows
+
+    def prometheus_text(self):
+        """
+        All series in the Prometheus text exposition format (version 0.0.4).
+        """
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                       for _, value in pairs)
+            return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+        lines = []
+        with self._lock:
+            for metric_type, series in (("counter", self._counters), ("histogram", self._histograms)):
+                names = sorted({name for name, _ in series})
+                for name in names:
+                    if name in METRIC_HELP:
+                        lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+                    lines.append(f"# TYPE {name} {metric_type}")
+                    for (series_name, labels), value in sorted(series.items()):
+                        if series_name != name:
+                            continue
+                        if metric_type == "counter":
+                            lines.append(f"{name}{label_text(labels)} {value}")
+                            continue
+                        cumulative = 0
+                        for bound, count in zip(value.buckets + (float("inf"),), value.counts):
+                            cumulative += count
+                            le = "+Inf" if bound == float("inf") else repr(bound)
+                            lines.append(f"{name}_bucket{label_text(labels, [('le', le)])} {cumulative}")
+                        lines.append(f"{name}_sum{label_text(labels)} {value.sum!r}")
+                        lines.append(f"{name}_count{label_text(labels)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """
+        Write the Prometheus text to `path`, e.g. for node_exporter's textfile collector.
+        """
+        with open(path + ".tmp", "w") as metrics_file:
+            metrics_file.write(self.prometheus_text())
+        os.replace(path + ".tmp", path)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+# Shared by the scoring path, the scoring server and the prediction page's debug panel
+metrics = Metrics(enabled=os.getenv("LOAN_METRICS", "").lower() in ("1", "true", "yes"))
@@ -0,0 +1,163 @@
+"""
+Pooled, streaming access to an OpenAI-compatible chat API (Nebius AI Studio by default).
+
+One client, with its HTTP connection pool, is kept per (base_url, api_key) and reused by
+every message and session. Completed responses are cached on (base_url, model, prompt, settings),
+so a repeated question is answered without calling the API. Point NEBIUS_BASE_URL at any
+OpenAI-compatible server (e.g. a local stub) to run against it instead.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from openai import OpenAI
+    openai_available = True
+except ImportError:
+    OpenAI = None
+    openai_available = False
+
+NEBIUS_BASE_URL = os.getenv("NEBIUS_BASE_URL", "https://api.studio.nebius.com/v1/")
+SYSTEM_PROMPT = "You are an AI assistant that explains predictions made by a loan approval model."
+
+DEFAULT_SETTINGS = {"max_tokens": 512, "temperature": 0.6, "top_p": 0.9, "top_k": 50}
+
+# Clients kept alive at once; each holds its own connection pool
+MAX_CLIENTS = 8
+
+_clients = OrderedDict()
+_clients_lock = threading.Lock()
+
+def _key_digest(api_key):
+    # The pool is keyed on a digest so the raw key is not kept as a dictionary key
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+def get_client(api_key, base_url=NEBIUS_BASE_URL):
+    """
+    Shared OpenAI client for (base_url, api_key), created on first use.
+    """
+    if not openai_available:
+        raise RuntimeError("The 'openai' package is not installed. Please install it with 'pip install openai'.")
+
+    key = (base_url, _key_digest(api_key))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(base_url=base_url, api_key=api_key)
+            _clients[key] = client
+            # Evicted clients are not closed: another session may still be streaming through
+            # one. Its connection pool is released once the last reference is dropped.
+            while len(_clients) > MAX_CLIENTS:
+                _clients.popitem(last=False)
+        _clients.move_to_end(key)
+        return client
+
+class ResponseCache:
+    """
+    Bounded LRU/TTL cache of completed chat responses keyed on (endpoint, model, prompt, settings).
+    Prompts are compared after collapsing whitespace and case.
+    """
+
+    def __init__(self, maxsize=256, ttl=3600.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model, prompt, settings, base_url=NEBIUS_BASE_URL, system_prompt=SYSTEM_PROMPT):
+        normalized = " ".join(prompt.split()).lower()
+        return base_url, model, system_prompt, normalized, tuple(sorted(settings.items()))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and self._clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, response):
+        with self._lock:
+            self._entries[key] = (self._clock(), response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+response_cache = ResponseCache()
+
+def _request_kwargs(model, prompt, settings):
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    return {
+        "model": model,
+        "max_tokens": settings["max_tokens"],
+        "temperature": settings["temperature"],
+        "top_p": settings["top_p"],
+        "extra_body": {"top_k": settings["top_k"]},
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+    }
+
+def stream_chat(prompt, model, api_key, settings=None, base_url=NEBIUS_BASE_URL, cache=response_cache):
+    """
+    Start a chat completion and return an iterator of text chunks.
+
+    A cached answer is returned as a single chunk. Otherwise the request is sent
+    before this function returns, so authentication and connection errors are raised here
+    rather than mid-stream. The full response is cached once the stream has been consumed.
+    """
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    key = cache.make_key(model, prompt, settings, base_url) if cache is not None else None
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return iter([cached])
+
+    stream = get_client(api_key, base_url).chat.completions.create(stream=True, **_request_kwargs(model, prompt, settings))
+
+    def chunks():
+        parts = []
+        for event in stream:
+            if not event.choices:
+                continue
+            text = event.choices[0].delta.content
+            if text:
+                parts.append(text)
+                yield text
+        if parts and key is not None:
+            cache.put(key, "".join(parts))
+
+    return chunks()
+
+def describe_api_error(error):
+    """
+    Map an API exception to a (status, message) pair for display.
+    """
+    error_message = str(error)
+    if "auth" in error_message.lower() or "api key" in error_message.lower():
+        return ("⚠️ Authentication error", "Invalid API key. Please check and re-enter.")
+    elif "not found" in error_message.lower() or "404" in error_message:
+        return ("⚠️ API endpoint error", "Invalid API endpoint. Check the base URL.")
+    elif "connection" in error_message.lower():
+        return ("⚠️ Connection error", f"Could not connect to Nebius AI Studio: {error_message}")
+    else:
+        return ("⚠️ API error", f"An error occurred: {error_message}")
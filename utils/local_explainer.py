@@ -0,0 +1,284 @@
+"""
+Offline explanation engine for the chatbot's local mode; no LLM or network access needed.
+
+Everything an answer needs is precomputed once per model version:
+  * the TreeSHAP explainer for per-feature contributions to the approval probability
+  * per-feature dataset statistics (quantiles overall, medians for approved and rejected
+    applications, approval rate per category)
+  * a standardized float32 matrix of the applications the model approves, searched for
+    the approved applicant nearest to the one being explained
+  * the split thresholds used by utils.counterfactuals for the smallest change that flips a rejection
+Questions are routed by keywords to one of these lookups, so an answer takes milliseconds.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.bias_audit import APPROVED_LABEL, TARGET_COLUMN
+from utils.counterfactuals import get_counterfactual_generator
+from utils.importance import load_permutation_importance
+from utils.model_utils import (DATA_PATH, DEFAULT_VERSION, approval_class_index, get_preprocessing_plan,
+                               preprocess_batch, registry)
+from utils.tree_shap import explain_features, get_explainer
+
+FEATURE_LABELS = {
+    "no_of_dependents": "Number of dependents",
+    "income_annum": "Annual income",
+    "cibil_score": "CIBIL score",
+}
+
+# Words in a question that pick each feature
+FEATURE_ALIASES = {
+    "dependent": "no_of_dependents",
+    "children": "no_of_dependents",
+    "education": "education",
+    "graduate": "education",
+    "self employed": "self_employed",
+    "self-employed": "self_employed",
+    "employ": "self_employed",
+    "income": "income_annum",
+    "salary": "income_annum",
+    "loan amount": "loan_amount",
+    "amount": "loan_amount",
+    "loan term": "loan_term",
+    "tenure": "loan_term",
+    "duration": "loan_term",
+    "cibil": "cibil_score",
+    "credit": "cibil_score",
+    "residential": "residential_assets_value",
+    "commercial": "commercial_assets_value",
+    "luxury": "luxury_assets_value",
+    "bank": "bank_asset_value",
+}
+
+COUNTERFACTUAL_WORDS = ("what if", "what would", "how can", "how could", "how do i", "improve", "get approved",
+                        "change", "counterfactual", "instead", "need to", "should i")
+WHY_WORDS = ("why", "reason", "factor", "explain", "because", "rejected", "approved", "decision", "denied")
+
+TOP_FACTORS = 3
+MAX_CHANGES = 4
+
+# Relative to the feature's spread, smaller differences are not reported as changes
+MIN_CHANGE = 0.05
+
+def feature_label(name):
+    return FEATURE_LABELS.get(name, name.replace("_", " ").capitalize())
+
+class LocalExplainer:
+    """
+    Answers questions about one model version and, optionally, one application.
+    """
+
+    def __init__(self, version=DEFAULT_VERSION, data_path=DATA_PATH):
+        entry = registry.get(version)
+        if entry.model is None:
+            raise RuntimeError("Model not loaded. Check if the model file exists.")
+
+        self.version = version
+        self.fingerprint = entry.fingerprint
+        self.forest = entry.fast_model
+        self.plan = get_preprocessing_plan(version)
+        self.feature_names = self.plan.feature_names
+        self.specs = {spec["name"]: spec for spec in self.plan.features}
+        self.approval_index = approval_class_index(self.forest)
+
+        data = pd.read_csv(data_path, skipinitialspace=True)
+        data.columns = [col.lower() for col in data.columns]
+        features = preprocess_batch(data, entry.label_encoders, feature_names=self.feature_names)
+        approved = (data[TARGET_COLUMN].astype(str).str.strip() == APPROVED_LABEL).to_numpy()
+
+        # Dataset statistics, one row per feature
+        self.n_rows = len(features)
+        self.approval_rate = float(approved.mean())
+        self.quantiles = np.percentile(features, [0, 10, 50, 90, 100], axis=0)
+        self.approved_median = np.median(features[approved], axis=0)
+        self.rejected_median = np.median(features[~approved], axis=0)
+        self._sorted_columns = np.sort(features, axis=0)
+        self.category_rates = {}
+        for position, name in enumerate(self.feature_names):
+            if self.specs[name]["kind"] == "categorical":
+                codes = features[:, position].astype(np.int64)
+                counts = np.bincount(codes, minlength=len(self.specs[name]["categories"]))
+                approvals = np.bincount(codes, weights=approved, minlength=len(counts))
+                self.category_rates[name] = approvals / np.maximum(counts, 1)
+
+        # Counterfactual index: applications the model approves, standardized per feature
+        model_approved = self.forest.predict_proba(features).argmax(axis=1) == self.approval_index
+        spread = features.std(axis=0)
+        self.scale = np.where(spread > 0, spread, 1.0)
+        self.approved_rows = features[model_approved]
+        self.approved_index = (self.approved_rows / self.scale).astype(np.float32)
+
+        # Global importance for questions without an application
+        importance = load_permutation_importance(version)
+        if importance is not None:
+            self.global_importance = np.asarray(importance["importances_mean"])
+        else:
+            self.global_importance = np.asarray(getattr(self.forest, "feature_importances_", np.zeros(len(spread))))
+
+        # Build the TreeSHAP tables now rather than on the first question
+        self.expected_value = get_explainer(version).expected_value
+
+    def format_value(self, name, value):
+        spec = self.specs[name]
+        if spec["kind"] == "categorical":
+            categories = spec["categories"]
+            code = int(value)
+            return categories[code] if 0 <= code < len(categories) else str(value)
+        return f"{value:,.0f}" if float(value).is_integer() else f"{value:,.2f}"
+
+    def approval_probability(self, row):
+        return float(self.forest.predict_proba(row[np.newaxis, :])[0, self.approval_index])
+
+    def top_factors(self, row, n=TOP_FACTORS):
+        """
+        (feature index, SHAP contribution) of the n features that moved the probability most.
+        """
+        contributions = explain_features(row[np.newaxis, :], self.version)[0]
+        order = np.argsort(-np.abs(contributions))[:n]
+        return [(int(position), float(contributions[position])) for position in order]
+
+    def nearest_approved(self, row):
+        """
+        Closest application the model approves (L1 distance on standardized features).
+        Returns (that row, [(feature index, current value, approved value)] sorted by size of change).
+        """
+        if len(self.approved_index) == 0:
+            return None, []
+        scaled = (row / self.scale).astype(np.float32)
+        nearest = self.approved_rows[int(np.abs(self.approved_index - scaled).sum(axis=1).argmin())]
+        gaps = np.abs(nearest - row) / self.scale
+        changes = [(int(position), row[position], nearest[position])
+                   for position in np.argsort(-gaps) if gaps[position] > MIN_CHANGE]
+        return nearest, changes
+
+    def percentile_of(self, position, value):
+        column = self._sorted_columns[:, position]
+        return 100.0 * np.searchsorted(column, value, side="right") / len(column)
+
+    # Answers
+
+    def describe_prediction(self, row):
+        probability = self.approval_probability(row)
+        decision = "approves" if probability >= 0.5 else "rejects"
+        return f"The model **{decision}** this application (approval probability {probability:.0%})."
+
+    def answer_why(self, row):
+        lines = [self.describe_prediction(row), "", "Main factors behind this decision:"]
+        for position, contribution in self.top_factors(row):
+            name = self.feature_names[position]
+            direction = "raises" if contribution > 0 else "lowers"
+            lines.append(
+                f"- **{feature_label(name)}** = {self.format_value(name, row[position])} {direction} the approval "
+                f"probability by {abs(contribution) * 100:.0f} points (median for approved applications: "
+                f"{self.format_value(name, self.approved_median[position])})."
+            )
+        return "\n".join(lines)
+
+    def answer_counterfactual(self, row):
+        if self.approval_probability(row) >= 0.5:
+            return self.describe_prediction(row) + " No changes are needed for approval."
+
+        lines = [self.describe_prediction(row), ""]
+        smallest = get_counterfactual_generator(self.version).search(row)
+        if smallest["status"] == "found":
+            lines.append(f"Smallest change that gets it approved (approval probability "
+                         f"{smallest['counterfactual_probability']:.0%}):")
+            for change in smallest["changes"]:
+                name = change["feature"]
+                lines.append(f"- **{feature_label(name)}**: {self.format_value(name, change['from'])} → "
+                             f"{self.format_value(name, change['to'])}")
+            lines.append("")
+
+        nearest, changes = self.nearest_approved(row)
+        if nearest is None:
+            return "\n".join(lines + ["No approved applications are available to compare against."])
+
+        lines.append(f"The most similar approved application (approval probability "
+                     f"{self.approval_probability(nearest):.0%}) differs in:")
+        for position, current, target in changes[:MAX_CHANGES]:
+            name = self.feature_names[position]
+            lines.append(f"- **{feature_label(name)}**: {self.format_value(name, current)} → "
+                         f"{self.format_value(name, target)}")
+        return "\n".join(lines)
+
+    def answer_feature(self, name, row=None):
+        position = self.feature_names.index(name)
+        label = feature_label(name)
+        if name in self.category_rates:
+            rates = ", ".join(f"{category}: {rate:.0%}" for category, rate
+                              in zip(self.specs[name]["categories"], self.category_rates[name]))
+            text = f"**{label}** — approval rate by group in the {self.n_rows:,} training applications: {rates}."
+        else:
+            low, p10, median, p90, high = self.quantiles[:, position]
+            text = (
+                f"**{label}** ranges from {self.format_value(name, low)} to {self.format_value(name, high)} "
+                f"(median {self.format_value(name, median)}, 10–90% range {self.format_value(name, p10)}–"
+                f"{self.format_value(name, p90)}). Median for approved applications: "
+                f"{self.format_value(name, self.approved_median[position])}; for rejected: "
+                f"{self.format_value(name, self.rejected_median[position])}."
+            )
+        if row is not None:
+            text += f" This application: {self.format_value(name, row[position])}"
+            if name not in self.category_rates:
+                text += f" (at or above {self.percentile_of(position, row[position]):.0f}% of applications)"
+            text += "."
+        return text
+
+    def answer_overview(self):
+        order = np.argsort(-self.global_importance)[:TOP_FACTORS]
+        important = ", ".join(feature_label(self.feature_names[position]) for position in order)
+        return (f"The training data has {self.n_rows:,} applications, {self.approval_rate:.0%} of them approved. "
+                f"The features that matter most to the model overall are {important}.")
+
+    def answer(self, question, application=None):
+        """
+        Answer a free-text question, about `application` (a dict of raw fields) if given.
+        """
+        question = question.lower()
+        row = self.plan.transform_one(application)[0] if application else None
+        mentioned = list(dict.fromkeys(name for alias, name in FEATURE_ALIASES.items()
+                                       if alias in question and name in self.specs))
+
+        wants_change = any(word in question for word in COUNTERFACTUAL_WORDS)
+        wants_reason = any(word in question for word in WHY_WORDS)
+        if (wants_change or wants_reason) and row is None:
+            return ("Make a prediction on the 📊 Prediction page first, then ask about it here.\n\n"
+                    + self.answer_overview())
+
+        parts = []
+        if wants_change:
+            parts.append(self.answer_counterfactual(row))
+        elif wants_reason:
+            parts.append(self.answer_why(row))
+        parts.extend(self.answer_feature(name, row) for name in mentioned)
+        if not parts:
+            parts.append(self.describe_prediction(row) if row is not None else self.answer_overview())
+            parts.append("Ask *why* for the main factors, *what would change the decision* for the closest "
+                         "approved application, or about a feature such as the CIBIL score or loan amount.")
+        return "\n\n".join(parts)
+
+_explainers = {}
+_explainers_lock = threading.Lock()
+
+def get_local_explainer(version=DEFAULT_VERSION):
+    """
+    LocalExplainer for a registered model version, rebuilt only when the model fingerprint changes.
+    """
+    entry = registry.get(version)
+    with _explainers_lock:
+        cached = _explainers.get(version)
+        if cached is None or cached.fingerprint != entry.fingerprint:
+            cached = LocalExplainer(version)
+            _explainers[version] = cached
+        return cached
+
+def generate_local_response(user_input, application=None, version=DEFAULT_VERSION):
+    """
+    Answer a chatbot question offline from the model's own structure and the training data.
+    """
+    try:
+        return get_local_explainer(version).answer(user_input, application)
+    except Exception as e:
+        return f"❌ Could not generate a local explanation: {e}"
@@ -0,0 +1,125 @@
+import asyncio
+import time
+from collections import Counter
+
+class MicroBatcher:
+    """
+    Gather concurrent single-item requests on an asyncio event loop into micro-batches.
+
+    The first queued item opens a batch. The batch closes when it holds `max_batch_size`
+    items or `max_wait` seconds have passed, and is then handed to `batch_fn` (a list of
+    items in, a list of results out) on `executor`, so the event loop keeps accepting
+    requests. While a batch runs, the next one fills up in the queue. If a batch raises,
+    its items are retried one at a time, so only the failing item's caller gets the error.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=64, max_wait=0.002, executor=None):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = executor
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.batch_sizes = Counter()
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, item):
+        """
+        Queue one item and wait for its result; exceptions raised by batch_fn are re-raised here.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.executor, self.batch_fn, items)
+            except Exception as e:
+                self.errors += 1
+                if len(batch) == 1:
+                    self._settle(batch[0][1], error=e)
+                else:
+                    # One bad item must not fail the others: score them one at a time
+                    await self._run_one_by_one(loop, batch)
+                continue
+            finally:
+                self.busy_seconds += time.perf_counter() - start
+                self.batches += 1
+                self.items += len(batch)
+                self.batch_sizes[len(batch)] += 1
+
+            for (_, future), result in zip(batch, results):
+                self._settle(future, result=result)
+
+    async def _run_one_by_one(self, loop, batch):
+        for item, future in batch:
+            try:
+                results = await loop.run_in_executor(self.executor, self.batch_fn, [item])
+            except Exception as e:
+                self._settle(future, error=e)
+            else:
+                self._settle(future, result=results[0])
+
+    @staticmethod
+    def _settle(future, result=None, error=None):
+        # The client may have gone away while the batch was running
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "batch_errors": self.errors,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size_seen": max(self.batch_sizes) if self.batch_sizes else 0,
+            "busy_seconds": self.busy_seconds,
+            "pending": self.pending(),
+        }
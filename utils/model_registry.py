@@ -0,0 +1,141 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.forest_engine import compile_forest
+
+DEFAULT_VERSION = "default"
+
+class LoadedModel:
+    """
+    One loaded model version: the model, its label encoders, a flat-array copy for fast
+    single-row prediction and a fingerprint of the artifact files it was loaded from.
+    """
+
+    def __init__(self, name, model, label_encoders, fingerprint, signature):
+        self.name = name
+        self.model = model
+        self.label_encoders = label_encoders
+        self.fast_model = compile_forest(model)
+        self.fingerprint = fingerprint
+        self.signature = signature
+        self.loaded_at = time.time()
+        self.checked_at = self.loaded_at
+
+def _file_signature(paths):
+    """
+    Cheap change detector: (mtime, size) of every artifact file, None for missing files.
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as artifact:
+        for block in iter(lambda: artifact.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _file_fingerprint(paths, file_digest=_file_sha256):
+    """
+    Content hash of the artifact files, used as the model version for caches.
+    `file_digest(path)` returns the SHA-256 hex digest of one file.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode())
+        try:
+            digest.update(file_digest(path).encode())
+        except FileNotFoundError:
+            digest.update(b"<missing>")
+    return digest.hexdigest()[:16]
+
+class ModelRegistry:
+    """
+    Process-wide registry of named model versions.
+
+    Models are loaded lazily on first use and shared by every caller in the process
+    (all Streamlit pages and sessions). Artifact files are re-checked by mtime/size at
+    most every `check_interval` seconds and reloaded when their content hash changes,
+    e.g. after model_training.py rewrites them. At most `max_versions` versions stay
+    loaded; the least recently used one is evicted first. `file_digest` may return a digest
+    recorded elsewhere (e.g. in an artifact manifest) instead of reading the file.
+    """
+
+    def __init__(self, loader, max_versions=3, check_interval=1.0, file_digest=_file_sha256):
+        self._loader = loader
+        self._file_digest = file_digest
+        self.max_versions = max_versions
+        self.check_interval = check_interval
+        self._sources = {}
+        self._loaded = OrderedDict()
+        self._lock = threading.RLock()
+
+    def register(self, name, *paths):
+        """
+        Register (or re-point) a named version. `paths` are passed to the loader and watched
+        for changes; the files are not read until first use.
+        """
+        with self._lock:
+            self._sources[name] = paths
+            self._loaded.pop(name, None)
+
+    def versions(self):
+        with self._lock:
+            return list(self._sources)
+
+    def loaded_versions(self):
+        with self._lock:
+            return list(self._loaded)
+
+    def get(self, name=DEFAULT_VERSION):
+        """
+        Return the LoadedModel for `name`, loading or reloading it if needed.
+        """
+        with self._lock:
+            if name not in self._sources:
+                raise KeyError(f"Unknown model version: {name}")
+            paths = self._sources[name]
+
+            entry = self._loaded.get(name)
+            if entry is not None:
+                now = time.time()
+                if now - entry.checked_at >= self.check_interval:
+                    entry.checked_at = now
+                    signature = _file_signature(paths)
+                    if signature != entry.signature:
+                        # Files were touched; only reload if their content really changed
+                        if _file_fingerprint(paths, self._file_digest) != entry.fingerprint:
+                            entry = None
+                        else:
+                            entry.signature = signature
+
+            if entry is None:
+                entry = self._load(name, paths)
+
+            self._loaded[name] = entry
+            self._loaded.move_to_end(name)
+            while len(self._loaded) > self.max_versions:
+                self._loaded.popitem(last=False)
+            return entry
+
+    def _load(self, name, paths):
+        signature = _file_signature(paths)
+        model, label_encoders = self._loader(*paths)
+        return LoadedModel(name, model, label_encoders, _file_fingerprint(paths, self._file_digest), signature)
+
+    def evict(self, name):
+        with self._lock:
+            self._loaded.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self._loaded.clear()
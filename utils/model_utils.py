@@ -1,111 +1,318 @@
+import os
 import pickle
+import threading
 import pandas as pd
 import numpy as np
+from utils.artifacts import MANIFEST_NAME, file_sha256, is_artifact_current, load_model_artifact, source_sha256
+from utils.drift import drift_monitor
+from utils.feature_schema import PreprocessingPlan, load_feature_schema, schema_from_model
+from utils.instrumentation import metrics
+from utils.model_registry import DEFAULT_VERSION, ModelRegistry
+from utils.prediction_cache import prediction_cache
 
 # Paths to stored model and encoders
 MODEL_PATH = "assets/data/trained_model.pkl"
 ENCODER_PATH = "assets/data/label_encoders.pkl"
 
-def load_model_and_encoders():
+# Training dataset, also used for audits and dataset statistics
+DATA_PATH = "assets/data/loan_data.csv"
+
+# Raw rows of the held-out test split written by model_training.py
+HOLDOUT_PATH = "assets/data/holdout.csv"
+
+# Feature schema written by model_training.py (see utils/feature_schema.py)
+FEATURE_SCHEMA_PATH = "assets/data/feature_schema.json"
+
+# Memory-mappable artifact written alongside the pickles (see utils/artifacts.py)
+MODEL_ARTIFACT_DIR = "assets/data/model_artifact"
+ARTIFACT_MANIFEST_PATH = os.path.join(MODEL_ARTIFACT_DIR, MANIFEST_NAME)
+
+def load_model_and_encoders(model_path=MODEL_PATH, encoder_path=ENCODER_PATH, manifest_path=ARTIFACT_MANIFEST_PATH):
+    """
+    Load the trained model and label encoders from disk.
+    Uses the memory-mapped artifact when it is present and was exported from the current
+    pickled model, otherwise falls back to the pickles.
+    Prefer get_model_and_encoders(), which shares one cached copy across the process.
+    """
+    if manifest_path and os.path.exists(manifest_path):
+        artifact_dir = os.path.dirname(manifest_path)
+        try:
+            if is_artifact_current(artifact_dir, model_path):
+                return load_model_artifact(artifact_dir)
+            print(f"⚠️ Warning: Model artifact is out of date with {model_path}, loading the pickle instead.")
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Warning: Could not load model artifact ({e}), falling back to pickle.")
+
+    return load_pickled_model_and_encoders(model_path, encoder_path)
+
+def load_pickled_model_and_encoders(model_path=MODEL_PATH, encoder_path=ENCODER_PATH):
     """
-    Load the trained model and label encoders.
+    Load the trained model and label encoders from their pickle files.
     """
     model, label_encoders = None, {}
 
     # Load the trained model
     try:
-        with open(MODEL_PATH, "rb") as model_file:
+        with open(model_path, "rb") as model_file:
             model = pickle.load(model_file)
     except FileNotFoundError:
-        print(f"⚠️ Warning: Model file not found at {MODEL_PATH}")
+        print(f"⚠️ Warning: Model file not found at {model_path}")
 
     # Load label encoders
     try:
-        with open(ENCODER_PATH, "rb") as encoder_file:
+        with open(encoder_path, "rb") as encoder_file:
             label_encoders = pickle.load(encoder_file)
     except FileNotFoundError:
-        print(f"⚠️ Warning: Encoder file not found at {ENCODER_PATH}")
+        print(f"⚠️ Warning: Encoder file not found at {encoder_path}")
 
     return model, label_encoders
 
-# Load model and encoders at runtime
-model, label_encoders = load_model_and_encoders()
+def _model_file_digest(path):
+    # The artifact manifest records the pickle's digest with its size and mtime, so a cold
+    # start does not read the pickle just to fingerprint it
+    if path == MODEL_PATH:
+        return source_sha256(MODEL_ARTIFACT_DIR, path)
+    return file_sha256(path)
 
-def preprocess_input(input_data, label_encoders):
+# Process-wide registry: models are loaded on first use and shared by all pages and sessions
+registry = ModelRegistry(load_model_and_encoders, file_digest=_model_file_digest)
+registry.register(DEFAULT_VERSION, MODEL_PATH, ENCODER_PATH, ARTIFACT_MANIFEST_PATH)
+
+def get_model_and_encoders(version=DEFAULT_VERSION):
+    """
+    Return the shared (model, label_encoders) for a registered version, loading them lazily.
+    """
+    entry = registry.get(version)
+    return entry.model, entry.label_encoders
+
+def __getattr__(name):
+    # Keep `model_utils.model` / `model_utils.label_encoders` working without loading at import time
+    if name == "model":
+        return registry.get().model
+    if name == "label_encoders":
+        return registry.get().label_encoders
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Compiled preprocessing plans, keyed on version and rebuilt when the model fingerprint changes
+_plans = {}
+_plans_lock = threading.Lock()
+
+def _compile_plan(entry, schema_path):
+    feature_names = getattr(entry.model, "feature_names_in_", None)
+    try:
+        plan = PreprocessingPlan(load_feature_schema(schema_path))
+        plan.check_features(feature_names)
+        return plan
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Warning: Could not use feature schema ({e}), deriving it from the model.")
+        return PreprocessingPlan(schema_from_model(entry.model, entry.label_encoders))
+
+def get_preprocessing_plan(version=DEFAULT_VERSION, schema_path=FEATURE_SCHEMA_PATH):
+    """
+    Return the compiled PreprocessingPlan for a registered model version.
+    """
+    entry = registry.get(version)
+    with _plans_lock:
+        cached = _plans.get(version)
+        if cached is None or cached[0] != entry.fingerprint:
+            cached = (entry.fingerprint, _compile_plan(entry, schema_path))
+            _plans[version] = cached
+        return cached[1]
+
+def preprocess_input(input_data, label_encoders=None, version=DEFAULT_VERSION):
     """
     Preprocess user input to match model expectations.
-    Converts categorical values using label encoders and ensures numerical values are in proper format.
+    Encodes one application dict with the compiled feature schema and returns a (1, n_features) array.
+    `label_encoders` is accepted for backwards compatibility; the schema already holds the encodings.
     """
     try:
-        # Convert input dictionary to DataFrame
-        df = pd.DataFrame([input_data])
-        
-        # Ensure column names are lowercase for consistency
-        df.columns = [col.lower() for col in df.columns]
-        
-        # Process categorical columns
-        categorical_cols = ["gender", "married", "dependents", "education", "self_employed", "property_area"]
-        for col in categorical_cols:
-            if col in df.columns:
-                # Convert the value to string in case it's not already
-                df[col] = df[col].astype(str)
-                
-                # Check if the column has a corresponding encoder
-                if col in label_encoders:
-                    # Create a safe transformation function that handles unknown values
-                    def safe_transform(value, encoder, default=0):
-                        if value in encoder.classes_:
-                            return encoder.transform([value])[0]
-                        else:
-                            print(f"⚠️ Unknown value '{value}' for '{col}', using default.")
-                            return default
-                    
-                    # Apply the transformation to each value individually
-                    df[col] = df[col].apply(lambda x: safe_transform(x, label_encoders[col]))
-        
-        # Convert numeric columns
-        numeric_cols = ["applicant_income", "coapplicant_income", "loan_amount", "loan_amount_term", "credit_history"]
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors="coerce")
-        
-        # Fill missing values
-        df.fillna(0, inplace=True)
-        
-        # Ensure we have the right format for the model
-        # If model has feature_names_in_ attribute (sklearn 1.0+), use it to align columns
-        if hasattr(model, 'feature_names_in_'):
-            expected_cols = [col.lower() for col in model.feature_names_in_]
-            
-            # Add missing columns with zeros
-            for col in expected_cols:
-                if col not in df.columns:
-                    df[col] = 0
-            
-            # Reorder columns to match the model's expectations
-            df = df[expected_cols]
-        
-        # Convert to numpy array for prediction
-        return df.values
-        
+        with metrics.stage("preprocess"):
+            return get_preprocessing_plan(version).transform_one(input_data)
     except Exception as e:
         print(f"❌ Error in preprocessing: {str(e)}")
         raise  # Re-raise to see detailed error in the UI
 
+def is_approved(classifier, prediction):
+    """
+    True if a predicted class label means the loan is approved.
+    """
+    return prediction == classifier.classes_[approval_class_index(classifier)]
+
 def predict_loan_status(input_data):
     """
     Predict loan status based on user input.
+    With instrumentation enabled, the preprocess and forest stages and the whole call are timed.
     """
-    if model is None:
+    entry = registry.get()
+    if entry.model is None:
         return "⚠️ Model not loaded. Check if the model file exists."
 
     try:
-        processed_data = preprocess_input(input_data, label_encoders)
-        if processed_data is None:
-            return "⚠️ Invalid input data."
+        with metrics.stage("predict_loan_status"):
+            processed_data = preprocess_input(input_data, entry.label_encoders)
+            if processed_data is None:
+                return "⚠️ Invalid input data."
 
-        prediction = model.predict(processed_data)
-        return "✅ Approved" if prediction[0] == 1 else "❌ Rejected"
+            labels, _ = predict_features(processed_data, cache=prediction_cache)
+            approved = is_approved(entry.fast_model, labels[0])
+        metrics.increment("loan_predictions_total", decision="approved" if approved else "rejected")
+        return "✅ Approved" if approved else "❌ Rejected"
 
     except Exception as e:
-        return f"❌ Error in prediction: {str(e)}"
\ No newline at end of file
+        return f"❌ Error in prediction: {str(e)}"
+
+def build_category_lookups(label_encoders):
+    """
+    Precompute class-to-code lookup arrays for every label encoder.
+    Returns a dict mapping column name to (class index, code array) so a whole
+    column can be encoded with one vectorized lookup instead of per-value transforms.
+    """
+    lookups = {}
+    for col, encoder in label_encoders.items():
+        classes = np.asarray(encoder.classes_).astype(str)
+        codes = np.asarray(encoder.transform(encoder.classes_))
+        lookups[col.lower()] = (pd.Index(classes), codes)
+    return lookups
+
+def _batch_to_frame(data):
+    """
+    Convert a batch (DataFrame, list of dicts or NumPy structured array) into a DataFrame
+    with lowercase column names.
+    """
+    if isinstance(data, pd.DataFrame):
+        df = data
+    elif isinstance(data, np.ndarray) and data.dtype.names:
+        df = pd.DataFrame.from_records(data)
+        # Byte-string fields would otherwise be compared as "b'...'" against the encoder classes
+        for name in data.dtype.names:
+            if data.dtype[name].kind == "S":
+                df[name] = np.char.decode(data[name], "utf-8")
+    elif isinstance(data, (list, tuple)):
+        df = pd.DataFrame.from_records(list(data))
+    else:
+        raise TypeError(f"Unsupported batch type: {type(data).__name__}")
+
+    return df.rename(columns=lambda col: str(col).lower())
+
+def preprocess_batch(data, label_encoders, feature_names=None, default=0):
+    """
+    Preprocess a batch of applications into a model-ready feature matrix.
+    Categorical columns are encoded with precomputed lookup arrays, numeric columns are
+    coerced in one pass, and columns are aligned to the model's expected feature order.
+    """
+    with metrics.stage("batch_frame"):
+        df = _batch_to_frame(data)
+
+    if feature_names is None:
+        model = registry.get().model
+        if hasattr(model, "feature_names_in_"):
+            feature_names = model.feature_names_in_
+        else:
+            feature_names = df.columns
+    feature_names = [str(col).lower() for col in feature_names]
+
+    with metrics.stage("batch_encode"):
+        return _encode_frame(df, feature_names, build_category_lookups(label_encoders), default)
+
+def _encode_frame(df, feature_names, lookups, default):
+    """
+    Encode the feature_names columns of a lowercase-column DataFrame into a float64 matrix.
+    """
+    matrix = np.zeros((len(df), len(feature_names)), dtype=np.float64)
+
+    for position, col in enumerate(feature_names):
+        if col not in df.columns:
+            # Missing columns are zero-filled, matching preprocess_input
+            continue
+
+        if col in lookups:
+            classes, codes = lookups[col]
+            indices = classes.get_indexer(df[col].astype(str).to_numpy())
+            unknown = indices < 0
+            if unknown.any():
+                print(f"⚠️ {int(unknown.sum())} unknown value(s) for '{col}', using default.")
+                metrics.increment("loan_unknown_category_total", int(unknown.sum()), feature=col)
+            matrix[:, position] = np.where(unknown, default, codes[indices])
+        else:
+            values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            matrix[:, position] = np.nan_to_num(values, nan=0.0)
+
+    return matrix
+
+def approval_class_index(classifier):
+    """
+    Return the column of predict_proba that corresponds to an approved loan.
+    """
+    classes = list(getattr(classifier, "classes_", [0, 1]))
+    for label in ("Approved", 1):
+        if label in classes:
+            return classes.index(label)
+    return len(classes) - 1
+
+def predict_features(features, version=DEFAULT_VERSION, cache=None):
+    """
+    Predict already-encoded feature rows with a registered model's flat forest.
+    With a PredictionCache, only rows not seen for the current model version are predicted.
+    Returns (labels, approval_probabilities) as NumPy arrays in input order.
+    """
+    entry = registry.get(version)
+    if entry.model is None:
+        raise RuntimeError("Model not loaded. Check if the model file exists.")
+    forest = entry.fast_model
+    drift_monitor.observe(features)
+
+    def predict(rows):
+        with metrics.stage("forest"):
+            probabilities = forest.predict_proba(rows)
+        labels = np.asarray(forest.classes_).take(probabilities.argmax(axis=1))
+        return labels, probabilities[:, approval_class_index(forest)]
+
+    if cache is None:
+        return predict(np.atleast_2d(features))
+    return cache.predict(entry.fingerprint, features, predict)
+
+def predict_batch(data, classifier=None, encoders=None, cache=None):
+    """
+    Predict loan status for a whole batch of applications with a single predict_proba call.
+    Pass a PredictionCache as `cache` to reuse predictions for repeated applicants; it only
+    applies to the registry's model (classifier=None).
+    Returns (labels, approval_probabilities) as NumPy arrays in input order.
+    """
+    if cache is not None and classifier is None:
+        entry = registry.get()
+        features = preprocess_batch(data, encoders or entry.label_encoders,
+                                    feature_names=getattr(entry.model, "feature_names_in_", None))
+        if len(features) == 0:
+            return np.array([], dtype=object), np.array([], dtype=np.float64)
+        return predict_features(features, cache=cache)
+
+    if classifier is None or encoders is None:
+        entry = registry.get()
+        classifier = entry.model if classifier is None else classifier
+        encoders = entry.label_encoders if encoders is None else encoders
+    if classifier is None:
+        raise RuntimeError("Model not loaded. Check if the model file exists.")
+
+    features = preprocess_batch(data, encoders, feature_names=getattr(classifier, "feature_names_in_", None))
+    if len(features) == 0:
+        return np.array([], dtype=object), np.array([], dtype=np.float64)
+    drift_monitor.observe(features)
+
+    with metrics.stage("forest"):
+        probabilities = classifier.predict_proba(features)
+    labels = np.asarray(classifier.classes_).take(probabilities.argmax(axis=1))
+    return labels, probabilities[:, approval_class_index(classifier)]
+
+def predict_records(records, version=DEFAULT_VERSION, cache=None, strict=False):
+    """
+    Predict a list of application dicts with the compiled feature schema and the flat forest,
+    skipping the DataFrame path of predict_batch. Used for small, latency-sensitive batches.
+    With strict=True, applications missing features raise MissingFeaturesError instead of
+    being scored with defaults.
+    Returns (labels, approval_probabilities) as NumPy arrays in input order.
+    """
+    with metrics.stage("preprocess"):
+        features = get_preprocessing_plan(version).transform(records, strict)
+    if len(features) == 0:
+        return np.array([], dtype=object), np.array([], dtype=np.float64)
+    return predict_features(features, version, cache)
@@ -0,0 +1,100 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.model_utils import _batch_to_frame, get_model_and_encoders, predict_batch
+
+# Below this many rows per worker, process start-up and IPC cost more than they save
+MIN_ROWS_PER_WORKER = 20_000
+
+# Shards per worker, so a slow shard does not leave the other workers idle
+SHARDS_PER_WORKER = 4
+
+# Model and encoders held by each worker process, loaded once by _init_worker
+_worker_model = None
+_worker_encoders = None
+
+def _init_worker():
+    """
+    Load the model once when a worker process starts instead of pickling it with every task.
+    """
+    global _worker_model, _worker_encoders
+    _worker_model, _worker_encoders = get_model_and_encoders()
+
+    # Each worker is already one process per core; nested threading would oversubscribe
+    if hasattr(_worker_model, "n_jobs"):
+        _worker_model.n_jobs = 1
+
+def _score_shard(shard):
+    return predict_batch(shard, classifier=_worker_model, encoders=_worker_encoders)
+
+def choose_worker_count(n_rows, max_workers=None, min_rows_per_worker=MIN_ROWS_PER_WORKER):
+    """
+    Pick how many worker processes a batch of n_rows deserves.
+    Returns 1 when the batch is too small for parallel scoring to pay off.
+    """
+    available = os.cpu_count() or 1
+    if max_workers is not None:
+        available = min(available, max_workers)
+    return max(1, min(available, n_rows // max(1, min_rows_per_worker)))
+
+def _split_frame(df, n_shards):
+    bounds = np.linspace(0, len(df), n_shards + 1, dtype=int)
+    return [df.iloc[start:stop] for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+def _combine(results):
+    labels = np.concatenate([labels for labels, _ in results])
+    probabilities = np.concatenate([probabilities for _, probabilities in results])
+    return labels, probabilities
+
+class ParallelScorer:
+    """
+    Score batches across a pool of worker processes, each holding its own copy of the model.
+    The pool is started lazily and reused across calls; results are returned in input order
+    and match predict_batch exactly.
+    """
+
+    def __init__(self, max_workers=None, min_rows_per_worker=MIN_ROWS_PER_WORKER):
+        self.max_workers = max_workers
+        self.min_rows_per_worker = min_rows_per_worker
+        self._pool = None
+        self._pool_size = 0
+
+    def _get_pool(self, workers):
+        if self._pool is None or self._pool_size < workers:
+            self.close()
+            self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+            self._pool_size = workers
+        return self._pool
+
+    def predict(self, data):
+        df = _batch_to_frame(data)
+        workers = choose_worker_count(len(df), self.max_workers, self.min_rows_per_worker)
+        if workers <= 1:
+            return predict_batch(df)
+
+        pool = self._get_pool(workers)
+        # Executor.map yields results in submission order, so shards come back in input order
+        results = list(pool.map(_score_shard, _split_frame(df, workers * SHARDS_PER_WORKER)))
+        return _combine(results)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+            self._pool_size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def predict_batch_parallel(data, max_workers=None, min_rows_per_worker=MIN_ROWS_PER_WORKER):
+    """
+    Predict a batch across a temporary process pool, falling back to predict_batch for small batches.
+    Returns (labels, approval_probabilities) in input order.
+    """
+    with ParallelScorer(max_workers=max_workers, min_rows_per_worker=min_rows_per_worker) as scorer:
+        return scorer.predict(data)
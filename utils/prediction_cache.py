@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+class PredictionCache:
+    """
+    Bounded LRU cache of predictions keyed on the canonical encoded feature vector.
+
+    Entries belong to one model fingerprint at a time. Once a lookup or store arrives
+    with a different fingerprint (i.e. the registry reloaded changed artifacts), every
+    entry is dropped. Entries older than `ttl` seconds count as misses; ttl=None keeps
+    them until evicted. All methods are thread-safe.
+    """
+
+    def __init__(self, maxsize=10_000, ttl=600.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._fingerprint = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def row_key(row):
+        # Adding 0.0 folds -0.0 into 0.0 so equal vectors have equal bytes
+        return (np.asarray(row, dtype=np.float64) + 0.0).tobytes()
+
+    def _sync(self, fingerprint):
+        if fingerprint != self._fingerprint:
+            if self._entries:
+                self._entries.clear()
+                self.invalidations += 1
+            self._fingerprint = fingerprint
+
+    def get_many(self, fingerprint, keys):
+        """
+        Return {position: value} for the keys that have a live entry.
+        """
+        found = {}
+        now = self._clock()
+        with self._lock:
+            self._sync(fingerprint)
+            for position, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and self.ttl is not None and now - entry[0] > self.ttl:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                found[position] = entry[1]
+                self.hits += 1
+        return found
+
+    def put_many(self, fingerprint, keys, values):
+        now = self._clock()
+        with self._lock:
+            self._sync(fingerprint)
+            for key, value in zip(keys, values):
+                self._entries[key] = (now, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def predict(self, fingerprint, features, predict_fn):
+        """
+        Predict encoded rows, calling predict_fn(rows) -> (labels, approval_probabilities)
+        only for rows that are not cached. Returns the same pair for all rows, in input order.
+        """
+        features = np.atleast_2d(features)
+        keys = [self.row_key(row) for row in features]
+        found = self.get_many(fingerprint, keys)
+
+        labels = np.empty(len(features), dtype=object)
+        probabilities = np.empty(len(features), dtype=np.float64)
+        for position, (label, probability) in found.items():
+            labels[position] = label
+            probabilities[position] = probability
+
+        missing = [position for position in range(len(features)) if position not in found]
+        if missing:
+            # Rows repeated within the batch are predicted once
+            unique = {}
+            for position in missing:
+                unique.setdefault(keys[position], position)
+            computed_labels, computed_probabilities = predict_fn(features[list(unique.values())])
+            computed = dict(zip(unique, zip(computed_labels.tolist(), computed_probabilities.tolist())))
+            for position in missing:
+                labels[position], probabilities[position] = computed[keys[position]]
+            self.put_many(fingerprint, list(computed), list(computed.values()))
+        return labels, probabilities
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+# Process-wide cache shared by the prediction page, predict_loan_status and the scoring server
+prediction_cache = PredictionCache()
@@ -0,0 +1,68 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+class RenderTimer:
+    """
+    Process-wide record of how long each Streamlit page takes to render.
+
+    The last `window` render times are kept per page. If `log_path` is set, every render is
+    also appended to it as a JSON line ({"page", "ms", "at"}), so runs can be compared
+    when pages are added or changed.
+    """
+
+    def __init__(self, window=200, log_path=None):
+        self.window = window
+        self.log_path = log_path
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def time(self, page):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(page, time.perf_counter() - start)
+
+    def record(self, page, seconds):
+        with self._lock:
+            self._timings.setdefault(page, deque(maxlen=self.window)).append(seconds)
+            if self.log_path:
+                with open(self.log_path, "a") as log_file:
+                    log_file.write(json.dumps({"page": page, "ms": seconds * 1000, "at": time.time()}) + "\n")
+
+    def last_ms(self, page):
+        with self._lock:
+            timings = self._timings.get(page)
+            return timings[-1] * 1000 if timings else None
+
+    def stats(self):
+        """
+        Per-page render count and last/p50/p95/max render time in milliseconds.
+        """
+        with self._lock:
+            snapshot = {page: np.asarray(timings) * 1000 for page, timings in self._timings.items()}
+        return [
+            {
+                "page": page,
+                "renders": len(timings),
+                "last_ms": float(timings[-1]),
+                "p50_ms": float(np.percentile(timings, 50)),
+                "p95_ms": float(np.percentile(timings, 95)),
+                "max_ms": float(timings.max()),
+            }
+            for page, timings in snapshot.items()
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._timings.clear()
+
+# Set RENDER_TIMING_LOG to a file path to keep a log of every page render
+render_timer = RenderTimer(log_path=os.getenv("RENDER_TIMING_LOG"))
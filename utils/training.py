@@ -0,0 +1,208 @@
+"""
+Training pipeline shared by model_training.py: data loading, encoding, and a parallel
+cross-validated hyperparameter search.
+
+The search encodes the training split once and caches the float32 feature matrix on disk.
+Every (candidate, fold) fit is then an independent task on a process pool, and each worker
+memory-maps the cached matrix instead of re-encoding it or receiving it by pickle. Folds are
+evaluated in rounds. After `min_folds` rounds, a candidate whose mean score trails the best
+by more than `early_stopping_margin` is dropped without fitting its remaining folds.
+
+Every fit is seeded, so the report and the chosen parameters do not depend on the worker count.
+"""
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.preprocessing import LabelEncoder
+
+from utils.forest_engine import compile_forest
+
+TARGET_COLUMN = "loan_status"
+CATEGORICAL_COLUMNS = ["gender", "married", "dependents", "education", "self_employed", "property_area"]
+FEATURE_CACHE_DIR = "assets/data/feature_cache"
+SEARCH_REPORT_PATH = "assets/data/search_report.csv"
+
+DEFAULT_PARAM_GRID = {
+    "n_estimators": [50, 100, 200],
+    "max_depth": [None, 8, 16],
+    "min_samples_leaf": [1, 4],
+}
+
+# Rows timed per candidate for the single-row latency column of the report
+LATENCY_SAMPLE_ROWS = 200
+
+# Training matrix and folds held by each worker process, loaded once by _init_worker
+_worker_state = {}
+
+def load_training_data(data_path):
+    """
+    Read the training CSV with lowercase column names and without the loan_id column.
+    """
+    df = pd.read_csv(data_path)
+    if "loan_id" in df.columns:
+        df = df.drop(columns=["loan_id"])
+    df.columns = [col.lower() for col in df.columns]
+    return df
+
+def encode_features(df, categorical_columns=CATEGORICAL_COLUMNS):
+    """
+    Label-encode the categorical columns present in df.
+    Returns (X, y, label_encoders).
+    """
+    df = df.copy()
+    label_encoders = {}
+    for column in categorical_columns:
+        if column in df.columns:
+            le = LabelEncoder()
+            df[column] = le.fit_transform(df[column])
+            label_encoders[column] = le
+
+    X = df.drop(columns=[TARGET_COLUMN])
+    y = df[TARGET_COLUMN]
+    return X, y, label_encoders
+
+def cache_feature_matrix(X, y, cache_dir=FEATURE_CACHE_DIR):
+    """
+    Save X (as float32, the dtype the trees split on) and y to cache_dir under a content hash.
+    An existing entry is reused. Returns (features_path, labels_path).
+    """
+    features = np.ascontiguousarray(X, dtype=np.float32)
+    labels = np.asarray(y).astype(str)
+
+    digest = hashlib.sha256(features.tobytes())
+    digest.update("\n".join(labels).encode())
+    key = digest.hexdigest()[:12]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    paths = (os.path.join(cache_dir, f"features-{key}.npy"), os.path.join(cache_dir, f"labels-{key}.npy"))
+    for path, array in zip(paths, (features, labels)):
+        if not os.path.exists(path):
+            np.save(path + ".tmp.npy", array)
+            os.replace(path + ".tmp.npy", path)
+    return paths
+
+def _load_cached(features_path, labels_path):
+    return np.load(features_path, mmap_mode="r"), np.load(labels_path)
+
+def _fit_and_score(features, labels, folds, params, fold, random_state, measure_size):
+    train_index, test_index = folds[fold]
+    model = RandomForestClassifier(random_state=random_state, n_jobs=1, **params)
+
+    start = time.perf_counter()
+    model.fit(features[train_index], labels[train_index])
+    fit_seconds = time.perf_counter() - start
+
+    score = float(np.mean(model.predict(features[test_index]) == labels[test_index]))
+    result = {"fold": fold, "score": score, "fit_seconds": fit_seconds}
+
+    if measure_size:
+        # Size and latency of the engine that serves predictions, not of the sklearn object
+        forest = compile_forest(model)
+        sample = np.asarray(features[test_index[:LATENCY_SAMPLE_ROWS]])
+        timings = []
+        for row in sample:
+            start = time.perf_counter()
+            forest.predict_proba(row[np.newaxis, :])
+            timings.append(time.perf_counter() - start)
+        result.update(
+            n_nodes=int(len(forest.feature)),
+            model_bytes=int(forest.nbytes),
+            single_row_ms=float(np.median(timings) * 1000),
+        )
+    return result
+
+def _init_worker(features_path, labels_path, folds):
+    features, labels = _load_cached(features_path, labels_path)
+    _worker_state.update(features=features, labels=labels, folds=folds)
+
+def _run_task(task):
+    candidate, params, fold, random_state, measure_size = task
+    state = _worker_state
+    result = _fit_and_score(state["features"], state["labels"], state["folds"], params, fold, random_state, measure_size)
+    return candidate, result
+
+def hyperparameter_search(X, y, param_grid=DEFAULT_PARAM_GRID, n_folds=5, random_state=42,
+                          max_workers=None, min_folds=2, early_stopping_margin=0.01,
+                          cache_dir=FEATURE_CACHE_DIR):
+    """
+    Cross-validated grid search over RandomForestClassifier parameters, one fit per core.
+    Returns (best_params, report), where report has one row per candidate with its mean/std
+    score, folds evaluated, mean fit time, flattened model size and single-row latency.
+    """
+    features_path, labels_path = cache_feature_matrix(X, y, cache_dir)
+    features, labels = _load_cached(features_path, labels_path)
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=random_state)
+    folds = list(splitter.split(np.zeros(len(labels)), labels))
+
+    candidates = list(ParameterGrid(param_grid))
+    results = {index: [] for index in range(len(candidates))}
+    active = list(range(len(candidates)))
+    stopped_after = {}
+
+    workers = min(max_workers or os.cpu_count() or 1, len(candidates))
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(features_path, labels_path, folds))
+
+    try:
+        for fold in range(n_folds):
+            tasks = [(index, candidates[index], fold, random_state, fold == 0) for index in active]
+            if pool is None:
+                outcomes = [(index, _fit_and_score(features, labels, folds, params, fold_, seed, measure))
+                            for index, params, fold_, seed, measure in tasks]
+            else:
+                outcomes = list(pool.map(_run_task, tasks))
+            for index, result in outcomes:
+                results[index].append(result)
+
+            # Drop candidates that are clearly behind the current leader
+            if fold + 1 >= min_folds and fold + 1 < n_folds:
+                means = {index: np.mean([r["score"] for r in results[index]]) for index in active}
+                best = max(means.values())
+                for index in active:
+                    if means[index] < best - early_stopping_margin:
+                        stopped_after[index] = fold + 1
+                active = [index for index in active if index not in stopped_after]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    rows = []
+    for index, params in enumerate(candidates):
+        scores = [r["score"] for r in results[index]]
+        first = results[index][0]
+        rows.append({
+            **{f"param_{name}": value for name, value in params.items()},
+            "mean_score": float(np.mean(scores)),
+            "std_score": float(np.std(scores)),
+            "folds_evaluated": len(scores),
+            "stopped_early": index in stopped_after,
+            "mean_fit_seconds": float(np.mean([r["fit_seconds"] for r in results[index]])),
+            "n_nodes": first["n_nodes"],
+            "model_bytes": first["model_bytes"],
+            "single_row_ms": first["single_row_ms"],
+        })
+
+    report = pd.DataFrame(rows)
+    # Only candidates that ran every fold can win; ties go to the smaller model
+    finished = report[~report["stopped_early"]].sort_values(["mean_score", "model_bytes"], ascending=[False, True])
+    best_params = candidates[finished.index[0]]
+    report = report.sort_values(["stopped_early", "mean_score"], ascending=[True, False]).reset_index(drop=True)
+    return best_params, report
+
+def train_model(X, y, params=None, random_state=42):
+    """
+    Fit the final RandomForestClassifier on every core.
+    """
+    model = RandomForestClassifier(random_state=random_state, n_jobs=-1, **(params or {"n_estimators": 100}))
+    model.fit(X, y)
+    # Serving scales with processes (see utils/parallel_scoring.py), not with threads per model
+    model.set_params(n_jobs=None)
+    return model
@@ -0,0 +1,326 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from math import factorial
+
+import numpy as np
+
+from utils.forest_engine import compile_forest
+from utils.model_utils import approval_class_index, preprocess_batch, registry
+
+# Rows explained together; bounds the (nodes x rows) mask array and per-leaf lookups
+ROW_CHUNK = 256
+
+# Leaves with at most this many unique path features get a precomputed table over all
+# 2**k one-fraction patterns; wider leaves are evaluated with the polynomial form per row
+TABLE_MAX_SLOTS = 10
+
+# Upper bound on elements per intermediate array when building tables or evaluating wide leaves
+MAX_BLOCK_ELEMENTS = 1 << 21
+
+# Explanations kept per process, keyed on model fingerprint and encoded row
+DEFAULT_CACHE_SIZE = 10_000
+
+def _slot_contributions(one, zero, weights, leaf_value):
+    """
+    Each slot feature's SHAP contribution from each leaf, shape (n_rows, n_leaves, n_slots).
+    `one` is (n_rows, n_leaves, n_slots); `zero` and `weights` are (n_leaves, n_slots).
+    """
+    n_rows, n_leaves, n_slots = one.shape
+
+    # Coefficients of prod_j (z_j + o_j t), lowest degree first
+    poly = np.zeros((n_rows, n_leaves, n_slots + 1))
+    poly[:, :, 0] = 1.0
+    for slot in range(n_slots):
+        shifted = poly[:, :, :-1] * one[:, :, slot, np.newaxis]
+        poly *= zero[:, slot, np.newaxis]
+        poly[:, :, 1:] += shifted
+
+    contributions = np.empty((n_rows, n_leaves, n_slots))
+    for slot in range(n_slots):
+        z = zero[:, slot]
+        o = one[:, :, slot]
+
+        # o = 1: divide by (z + t) with synthetic division from the top coefficient down
+        quotient = poly[:, :, n_slots]
+        weighted_hot = weights[:, n_slots - 1] * quotient
+        for degree in range(n_slots - 1, 0, -1):
+            quotient = poly[:, :, degree] - z * quotient
+            weighted_hot += weights[:, degree - 1] * quotient
+
+        # o = 0: the factor is the constant z
+        weighted_cold = (poly[:, :, :n_slots] * weights).sum(axis=2) / z
+
+        contributions[:, :, slot] = np.where(o > 0, weighted_hot, weighted_cold) * (o - z) * leaf_value
+    return contributions
+
+class TreeExplainer:
+    """
+    Exact path-dependent TreeSHAP for a FlatForest, vectorized over rows and leaves.
+
+    For one leaf with k unique path features j (cover ratio z_j, and o_j = 1 if the row
+    satisfies every split on j along the path), the leaf's share of feature i's SHAP value is
+        v * (o_i - z_i) * sum_m w(m, k) * [t^m] prod_{j != i} (z_j + o_j t)
+    with w(m, k) = m! (k - m - 1)! / k!. This is what TreeSHAP's EXTEND/UNWIND compute.
+    A leaf's contributions depend on the row only through the bit pattern o, so for leaves
+    with small k they are tabulated once for all 2**k patterns. Patterns for every leaf are
+    found by pushing a per-row bitmask down all trees level by level, so each split is
+    evaluated once per row and explaining a row is a table lookup per leaf.
+    """
+
+    def __init__(self, model, class_index=None):
+        self.forest = compile_forest(model)
+        if self.forest is None or not hasattr(self.forest, "roots"):
+            raise TypeError("TreeExplainer needs a tree forest model.")
+        if self.forest.cover is None:
+            raise ValueError("Forest has no node cover; re-export it with FlatForest.from_sklearn.")
+
+        self.class_index = approval_class_index(self.forest) if class_index is None else class_index
+        self.n_features = self.forest.n_features_in_
+        leaves_by_width = self._index_paths()
+        self.groups = [self._build_group(k, leaves) for k, leaves in sorted(leaves_by_width.items()) if k]
+
+    def _index_paths(self):
+        """
+        Walk every tree once. For each non-root node, record how entering it updates the
+        pattern bitmask; for each leaf, record its value and per-slot features and cover ratios.
+        Slots are numbered by first appearance along the path, so they agree on shared prefixes.
+        """
+        forest = self.forest
+        n_nodes = forest.n_nodes
+        scale = 1.0 / forest.n_estimators
+
+        parent = np.zeros(n_nodes, dtype=np.int64)
+        depth = np.zeros(n_nodes, dtype=np.int64)
+        is_left = np.zeros(n_nodes, dtype=bool)
+        slot_bit = np.zeros(n_nodes, dtype=np.int64)
+        new_bit = np.zeros(n_nodes, dtype=np.int64)
+
+        leaves_by_width = {}
+        expected_value = 0.0
+
+        for root in forest.roots:
+            root = int(root)
+            root_cover = forest.cover[root]
+            # (node, slot of each path feature, path features in slot order, zero fraction per slot)
+            stack = [(root, {}, [], [])]
+            while stack:
+                node, slot_of, slot_features, zero = stack.pop()
+                if forest.left[node] == node:
+                    value = forest.value[node, self.class_index] * forest.value_scale * scale
+                    expected_value += value * forest.cover[node] / root_cover
+                    leaves_by_width.setdefault(len(slot_features), []).append((node, value, slot_features, zero))
+                    continue
+
+                node_feature = int(forest.feature[node])
+                is_new = node_feature not in slot_of
+                slot = len(slot_of) if is_new else slot_of[node_feature]
+                child_slot_of = {**slot_of, node_feature: slot} if is_new else slot_of
+                child_features = slot_features + [node_feature] if is_new else slot_features
+
+                for child, goes_left in ((int(forest.left[node]), True), (int(forest.right[node]), False)):
+                    ratio = forest.cover[child] / forest.cover[node]
+                    child_zero = zero + [ratio] if is_new else zero[:slot] + [zero[slot] * ratio] + zero[slot + 1:]
+                    parent[child], depth[child], is_left[child] = node, depth[node] + 1, goes_left
+                    slot_bit[child] = 1 << slot
+                    new_bit[child] = (1 << slot) if is_new else 0
+                    stack.append((child, child_slot_of, child_features, child_zero))
+
+        self.expected_value = expected_value
+        widest = max(leaves_by_width)
+        self._mask_dtype = np.int32 if widest < 31 else np.int64
+
+        # Non-root nodes grouped by depth, for level-by-level mask propagation
+        order = np.argsort(depth, kind="stable")
+        boundaries = np.searchsorted(depth[order], np.arange(1, depth.max() + 2))
+        self._levels = []
+        for start, stop in zip(boundaries[:-1], boundaries[1:]):
+            nodes = order[start:stop]
+            self._levels.append((nodes, parent[nodes], is_left[nodes],
+                                 slot_bit[nodes].astype(self._mask_dtype), new_bit[nodes].astype(self._mask_dtype)))
+        return leaves_by_width
+
+    def _build_group(self, k, leaves):
+        """
+        Arrays for leaves sharing the same number k of unique path features,
+        plus their pattern table when k is small enough.
+        """
+        n_leaves = len(leaves)
+        group = {
+            "k": k,
+            "leaf_node": np.array([node for node, _, _, _ in leaves], dtype=np.int64),
+            "leaf_value": np.array([value for _, value, _, _ in leaves]),
+            "zero": np.array([zero for _, _, _, zero in leaves], dtype=np.float64),
+            "weights": np.tile([factorial(size) * factorial(k - size - 1) / factorial(k) for size in range(k)], (n_leaves, 1)),
+        }
+
+        # Scatters flattened (leaf, slot) contributions onto features with one matrix product
+        slot_feature = np.array([features for _, _, features, _ in leaves], dtype=np.int64)
+        feature_map = np.zeros((n_leaves * k, self.n_features))
+        feature_map[np.arange(n_leaves * k), slot_feature.ravel()] = 1.0
+        group["feature_map"] = feature_map
+
+        if k <= TABLE_MAX_SLOTS:
+            group["table"] = self._pattern_table(group)
+        return group
+
+    def _pattern_table(self, group):
+        """
+        Contributions for every one-fraction pattern: table[leaf, pattern, slot].
+        """
+        k = group["k"]
+        patterns = (np.arange(1 << k)[:, np.newaxis] >> np.arange(k)) & 1
+        n_leaves = len(group["leaf_value"])
+        table = np.empty((n_leaves, 1 << k, k))
+
+        block = max(1, MAX_BLOCK_ELEMENTS // ((1 << k) * (k + 1)))
+        for start in range(0, n_leaves, block):
+            leaves = slice(start, start + block)
+            n_block = len(group["leaf_value"][leaves])
+            one = np.broadcast_to(patterns[:, np.newaxis, :], (1 << k, n_block, k)).astype(np.float64)
+            contributions = _slot_contributions(one, group["zero"][leaves], group["weights"][leaves], group["leaf_value"][leaves])
+            table[leaves] = contributions.transpose(1, 0, 2)
+        return table
+
+    def _path_masks(self, rows):
+        """
+        masks[node, row]: bit s is set if the row follows every split on slot s's feature
+        on the path from the root to the node. Node-major, so each level updates whole rows.
+        """
+        forest = self.forest
+        # Split decision of every node for every row, evaluated once
+        values = rows.T[forest.feature]
+        go_left = values <= forest.threshold[:, np.newaxis]
+        missing = np.isnan(values)
+        if missing.any():
+            go_left = np.where(missing, forest.missing_left[:, np.newaxis], go_left)
+
+        masks = np.zeros((forest.n_nodes, len(rows)), dtype=self._mask_dtype)
+        for nodes, parents, is_left, slot_bit, new_bit in self._levels:
+            followed = go_left[parents] == is_left[:, np.newaxis]
+            masks[nodes] = (masks[parents] | new_bit[:, np.newaxis]) & ~(slot_bit[:, np.newaxis] * ~followed)
+        return masks
+
+    def shap_values(self, X):
+        """
+        SHAP values of the approval probability, shape (n_samples, n_features).
+        Each row satisfies expected_value + values.sum() == predict_proba(row)[class_index].
+        """
+        # Splits compare float32 features, as in sklearn and FlatForest
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+
+        values = np.zeros((len(X), self.n_features))
+        for row_start in range(0, len(X), ROW_CHUNK):
+            rows = X[row_start:row_start + ROW_CHUNK]
+            masks = self._path_masks(rows)
+            for group in self.groups:
+                contributions = self._group_contributions(masks[group["leaf_node"]].T, group)
+                values[row_start:row_start + ROW_CHUNK] += contributions.reshape(len(rows), -1) @ group["feature_map"]
+        return values
+
+    @staticmethod
+    def _group_contributions(patterns, group):
+        if "table" in group:
+            return group["table"][np.arange(patterns.shape[1]), patterns]
+
+        one = ((patterns[:, :, np.newaxis] >> np.arange(group["k"])) & 1).astype(np.float64)
+        contributions = np.empty(one.shape)
+        block = max(1, MAX_BLOCK_ELEMENTS // (len(patterns) * (group["k"] + 1)))
+        for start in range(0, one.shape[1], block):
+            leaves = slice(start, start + block)
+            contributions[:, leaves] = _slot_contributions(
+                one[:, leaves], group["zero"][leaves], group["weights"][leaves], group["leaf_value"][leaves]
+            )
+        return contributions
+
+class ExplanationCache:
+    """
+    Bounded LRU cache of per-row SHAP values keyed on (model fingerprint, hash of the encoded row).
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def row_key(fingerprint, row):
+        digest = hashlib.blake2b(np.ascontiguousarray(row, dtype=np.float64).tobytes(), digest_size=16)
+        return fingerprint, digest.hexdigest()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            for index, key in enumerate(keys):
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[index] = self._entries[key]
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, keys, values):
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+explanation_cache = ExplanationCache()
+_explainers = {}
+_explainers_lock = threading.Lock()
+
+def get_explainer(version="default"):
+    """
+    TreeExplainer for a registered model version, rebuilt only when the model fingerprint changes.
+    """
+    entry = registry.get(version)
+    with _explainers_lock:
+        cached = _explainers.get(version)
+        if cached is None or cached[0] != entry.fingerprint:
+            cached = (entry.fingerprint, TreeExplainer(entry.fast_model))
+            _explainers[version] = cached
+        return cached[1]
+
+def explain_features(features, version="default", cache=explanation_cache):
+    """
+    SHAP values for already-encoded feature rows; cached rows are not recomputed.
+    """
+    features = np.atleast_2d(np.asarray(features, dtype=np.float64))
+    entry = registry.get(version)
+    keys = [cache.row_key(entry.fingerprint, row) for row in features]
+
+    found = cache.get_many(keys)
+    values = np.empty((len(features), features.shape[1]))
+    for index, row_values in found.items():
+        values[index] = row_values
+
+    missing = [index for index in range(len(features)) if index not in found]
+    if missing:
+        computed = get_explainer(version).shap_values(features[missing])
+        values[missing] = computed
+        cache.put_many([keys[index] for index in missing], computed)
+    return values
+
+def explain_batch(data, version="default", cache=explanation_cache):
+    """
+    Per-applicant explanations for a batch of raw applications.
+    Returns (feature_names, shap_values, expected_value) for the approval probability.
+    """
+    entry = registry.get(version)
+    feature_names = list(entry.model.feature_names_in_)
+    features = preprocess_batch(data, entry.label_encoders, feature_names=feature_names)
+    return feature_names, explain_features(features, version, cache), get_explainer(version).expected_value
@@ -0,0 +1,30 @@
+"""
+Streamlit cache helpers keyed on the model version.
+
+The registry fingerprint (a content hash of the model files) is passed to every cached
+function as an explicit argument. Streamlit hashes a short string instead of the model,
+and a retrained model gets fresh cache entries without any manual clearing.
+"""
+import streamlit as st
+
+from utils.model_registry import DEFAULT_VERSION
+from utils.model_utils import registry
+
+def model_version(version=DEFAULT_VERSION):
+    """
+    Fingerprint of the model currently served for `version`.
+    """
+    return registry.get(version).fingerprint
+
+@st.cache_resource(max_entries=3, show_spinner="Loading model…")
+def _loaded_model(version, fingerprint):
+    return registry.get(version)
+
+def get_loaded_model(version=DEFAULT_VERSION):
+    """
+    LoadedModel for `version`, shared by all sessions and reruns until the model files change.
+    """
+    return _loaded_model(version, model_version(version))
+
+# st.fragment reruns only the decorated function on its own widget events (Streamlit >= 1.37)
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)